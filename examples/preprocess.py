@@ -47,3 +47,14 @@ building = prepb.make_common_index(building)
 # could use nilmtk.stats.electricity.single.periods_with_sufficient_samples ?
 
 # plot_missing_samples_using_bitmap(building.utility.electric)
+
+# Alternatively, steps 1-4 can be run as a single pipeline, which fuses the
+# per-channel steps, can run channels in parallel and caches its result:
+#
+# from nilmtk.preprocessing.pipeline import (Pipeline, SumSplitSupplies,
+#     Downsample, FillApplianceGaps, DropMissingMains, MakeCommonIndex)
+# pipeline = Pipeline([SumSplitSupplies(), Downsample(rule='1T'),
+#                      FillApplianceGaps(), DropMissingMains(),
+#                      MakeCommonIndex()],
+#                     cache_directory='/tmp/nilmtk_cache', n_jobs=4)
+# building = pipeline.run(dataset.buildings[1])
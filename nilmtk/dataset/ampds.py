@@ -71,8 +71,8 @@ class AMPDS(DataSet):
         self.building = Building()
         self.buildings[1] = self.building
 
-    def load_hdf5(self, directory):
-        super(AMPDS, self).load_hdf5(directory)
+    def load_hdf5(self, directory, **kwargs):
+        super(AMPDS, self).load_hdf5(directory, **kwargs)
 
     def read_electricity_csv_and_standardize(self, csv_path):
         # Loading appliance
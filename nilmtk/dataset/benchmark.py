@@ -0,0 +1,111 @@
+"""Benchmark HDF5 compression codecs on a sample of a dataset.
+
+Example
+-------
+>>> from nilmtk.dataset.benchmark import benchmark_compression
+>>> print(benchmark_compression(dataset))
+"""
+
+from __future__ import print_function, division
+import os
+import time
+import shutil
+import tempfile
+import pandas as pd
+from nilmtk.building import Building
+from nilmtk.dataset.dataset import DataSet
+
+# (complib, complevel) options compared by default
+DEFAULT_CODECS = [('zlib', 9), ('zlib', 1), ('blosc', 9), ('blosc', 5),
+                  ('blosc', 1), ('lzo', 1), ('bzip2', 9), (None, 0)]
+
+BYTES_PER_MB = 1E6
+
+
+def _codec_available(complib):
+    import tables
+    return complib is None or tables.which_lib_version(complib) is not None
+
+
+def sample_dataset(dataset, n_rows=100000):
+    """Returns a copy of `dataset` containing only the first `n_rows` rows
+    of each mains and appliance channel."""
+    sample = DataSet()
+    sample.metadata = dict(dataset.metadata)
+    for building_number, building in dataset.buildings.iteritems():
+        sample_building = Building()
+        electric = building.utility.electric
+        sample_electric = sample_building.utility.electric
+        for dict_name in ['mains', 'appliances']:
+            sample_dict = getattr(sample_electric, dict_name)
+            for channel_name, df in getattr(electric, dict_name).iteritems():
+                sample_dict[channel_name] = df.iloc[:n_rows]
+        sample.buildings[building_number] = sample_building
+    return sample
+
+
+def benchmark_compression(dataset, codecs=DEFAULT_CODECS, n_rows=100000,
+                          n_jobs=1):
+    """Measures write throughput, read throughput and compression ratio
+    of `DataSet.export` for each codec, on a sample of `dataset`.
+
+    Parameters
+    ----------
+    dataset : nilmtk.dataset.DataSet
+
+    codecs : list of (complib, complevel) tuples, optional
+        Codecs not available in this PyTables build are skipped.
+
+    n_rows : int, optional
+        Number of rows of each channel to use.
+
+    n_jobs : int, optional
+        Passed to `DataSet.export`.
+
+    Returns
+    -------
+    pandas.DataFrame indexed by (complib, complevel) with columns:
+        write_MB_per_sec, read_MB_per_sec : float
+            Throughput in terms of uncompressed, in-memory megabytes.
+        compression_ratio : float
+            Uncompressed bytes / bytes on disk.
+    """
+    sample = sample_dataset(dataset, n_rows)
+    uncompressed_bytes = sum(
+        len(df) * (8 + sum(dtype.itemsize for dtype in df.dtypes))
+        for building in sample.buildings.values()
+        for dict_name in ['mains', 'appliances']
+        for df in getattr(building.utility.electric, dict_name).values())
+
+    results = []
+    for complib, complevel in codecs:
+        if not _codec_available(complib):
+            print("Skipping", complib, "because it is not available")
+            continue
+        directory = tempfile.mkdtemp()
+        try:
+            compression = {'mains': (complib, complevel),
+                           'appliances': (complib, complevel)}
+            t0 = time.time()
+            sample.export(directory, compression=compression, n_jobs=n_jobs)
+            write_secs = time.time() - t0
+
+            t0 = time.time()
+            DataSet().load_hdf5(directory)
+            read_secs = time.time() - t0
+
+            disk_bytes = os.path.getsize(os.path.join(directory, 'dataset.h5'))
+        finally:
+            shutil.rmtree(directory)
+
+        uncompressed_mb = uncompressed_bytes / BYTES_PER_MB
+        results.append({'complib': complib,
+                        'complevel': complevel,
+                        'write_MB_per_sec': uncompressed_mb / write_secs,
+                        'read_MB_per_sec': uncompressed_mb / read_secs,
+                        'compression_ratio': uncompressed_bytes / disk_bytes})
+
+    results = pd.DataFrame(results)
+    if len(results) > 0:
+        results = results.set_index(['complib', 'complevel'])
+    return results
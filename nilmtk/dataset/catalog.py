@@ -0,0 +1,180 @@
+"""A catalog describing every channel in a nilmtk HDF5 store.
+
+`DataSet.export` writes the catalog as `catalog.json` next to
+`dataset.h5`.  The catalog has one entry per channel and can be queried
+without opening any data.  Each entry is a dict with these keys:
+
+    key : string
+        The key of the channel in the HDF5 store,
+        e.g. '/1/utility/electric/appliances/fridge/1'
+    building : int
+    dict_name : {'mains', 'appliances'}
+    name, instance : appliance name and instance (None for mains)
+    split, meter : mains split and meter (None for appliances)
+    measurements : list of column names, as JSON lists
+    n_rows : int
+    start, end : ISO 8601 strings
+    timezone : string or None
+    sample_period : float or None.  Seconds.
+    dtype : string
+    nbytes : int.  Size of the channel in memory.
+    compact : bool.  True if only change points are stored.  See
+        `nilmtk.preprocessing.electricity.single.change_points`.
+"""
+
+from __future__ import print_function, division
+import os
+import json
+import pandas as pd
+from nilmtk.sensors.electricity import MainsName, ApplianceName
+from nilmtk.sensors.electricity import Measurement, DualSupply
+from nilmtk.stats.electricity.single import get_sample_period
+from nilmtk.exceptions import TooFewSamplesError
+
+CATALOG_FILENAME = 'catalog.json'
+
+
+def hdf5_key(building_number, dict_name, channel_name):
+    """Returns the key used to store a channel in nilmtk's HDF5 format.
+
+    Parameters
+    ----------
+    building_number : int
+    dict_name : {'mains', 'appliances'}
+    channel_name : MainsName or ApplianceName
+
+    Returns
+    -------
+    key : string, e.g. '/1/utility/electric/mains/1/1'
+    """
+    return '/%d/utility/electric/%s/%s/%d' % (
+        building_number, dict_name, channel_name[0], channel_name[1])
+
+
+def column_from_json(column):
+    """Converts a column name read from JSON back into a
+    Measurement or DualSupply namedtuple."""
+    if isinstance(column, list):
+        if isinstance(column[0], list):
+            return DualSupply(Measurement(*column[0]), column[1])
+        return Measurement(*column)
+    return column
+
+
+def catalog_entry(building_number, dict_name, channel_name, df,
+                  compact=False):
+    """Summarises a single channel.
+
+    Parameters
+    ----------
+    building_number : int
+    dict_name : {'mains', 'appliances'}
+    channel_name : MainsName or ApplianceName
+    df : pandas.DataFrame
+        The full (not compacted) channel.
+    compact : boolean, optional
+        Whether the channel is stored as change points.
+
+    Returns
+    -------
+    dict.  See the module docstring for a description of each key.
+    """
+    entry = {'key': hdf5_key(building_number, dict_name, channel_name),
+             'building': building_number,
+             'dict_name': dict_name,
+             'name': None, 'instance': None, 'split': None, 'meter': None,
+             'measurements': list(df.columns),
+             'n_rows': len(df),
+             'start': None, 'end': None,
+             'timezone': None,
+             'sample_period': None,
+             'dtype': ','.join(sorted(set(str(dtype) for dtype in df.dtypes))),
+             'nbytes': int(len(df) *
+                           (8 + sum(dtype.itemsize for dtype in df.dtypes))),
+             'compact': compact}
+
+    if dict_name == 'mains':
+        entry['split'], entry['meter'] = channel_name
+    else:
+        entry['name'], entry['instance'] = channel_name
+
+    if len(df) > 0:
+        entry['start'] = df.index[0].isoformat()
+        entry['end'] = df.index[-1].isoformat()
+        if df.index.tz is not None:
+            entry['timezone'] = str(df.index.tz)
+        try:
+            entry['sample_period'] = float(get_sample_period(df))
+        except TooFewSamplesError:
+            pass
+
+    return entry
+
+
+def channel_name_from_entry(entry):
+    """Returns the MainsName or ApplianceName described by a catalog entry."""
+    if entry['dict_name'] == 'mains':
+        return MainsName(int(entry['split']), int(entry['meter']))
+    else:
+        return ApplianceName(entry['name'], int(entry['instance']))
+
+
+def start_and_end_from_entry(entry):
+    """Returns [start, end] pd.Timestamps described by a catalog entry."""
+    timestamps = []
+    for field in ['start', 'end']:
+        timestamp = pd.Timestamp(entry[field])
+        if entry['timezone']:
+            timestamp = timestamp.tz_convert(entry['timezone'])
+        timestamps.append(timestamp)
+    return timestamps
+
+
+def merge_catalog_entries(old_entry, new_entry):
+    """Returns the catalog entry for a channel made by appending the
+    rows described by `new_entry` to the channel described by
+    `old_entry`."""
+    entry = dict(new_entry)
+    entry['n_rows'] = old_entry['n_rows'] + new_entry['n_rows']
+    entry['nbytes'] = old_entry['nbytes'] + new_entry['nbytes']
+    entry['compact'] = old_entry.get('compact', False)
+    if old_entry['n_rows'] > 0:
+        entry['start'] = old_entry['start']
+        entry['timezone'] = old_entry['timezone']
+        if old_entry['sample_period'] is not None:
+            entry['sample_period'] = old_entry['sample_period']
+    return entry
+
+
+def write_catalog(directory, entries):
+    """Writes a list of catalog entries to `directory/catalog.json`."""
+    with open(os.path.join(directory, CATALOG_FILENAME), 'w') as catalog_fp:
+        catalog_fp.write(json.dumps(list(entries)))
+
+
+def read_catalog_entries(directory):
+    """Returns the list of catalog entries (dicts, exactly as stored in
+    JSON) in `directory/catalog.json`, or an empty list if there is no
+    catalog."""
+    filename = os.path.join(directory, CATALOG_FILENAME)
+    if not os.path.isfile(filename):
+        return []
+    with open(filename, 'r') as catalog_fp:
+        return json.loads(catalog_fp.read())
+
+
+def load_catalog(directory):
+    """Loads `directory/catalog.json`.
+
+    Returns
+    -------
+    pandas.DataFrame with one row per channel and one column per catalog
+    field, or None if `directory` does not contain a catalog.
+    """
+    if not os.path.isfile(os.path.join(directory, CATALOG_FILENAME)):
+        return None
+    entries = read_catalog_entries(directory)
+    for entry in entries:
+        entry['measurements'] = [column_from_json(column)
+                                 for column in entry['measurements']]
+    return pd.DataFrame(entries)
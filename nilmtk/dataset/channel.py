@@ -0,0 +1,279 @@
+"""Lazy, out-of-core access to single channels stored in nilmtk's HDF5 format."""
+
+from __future__ import print_function, division
+import pandas as pd
+from nilmtk.utils import DEFAULT_CHUNKSIZE, chunks_with_boundaries
+from nilmtk.dataset.catalog import start_and_end_from_entry
+from nilmtk.preprocessing.electricity.single import expand_change_points
+from nilmtk.preprocessing.electricity.single import expand_change_point_chunks
+
+
+def create_time_query(start, end):
+    if start is not None and end is not None:
+        lower_bound = pd.Term(
+            'index', '>', pd.Timestamp(start))
+        upper_bound = pd.Term(
+            'index', '<', pd.Timestamp(end))
+        query = [lower_bound, upper_bound]
+    elif start is None:
+        upper_bound = pd.Term(
+            'index', '<', pd.Timestamp(end))
+        query = [upper_bound]
+    else:
+        lower_bound = pd.Term(
+            'index', '>', pd.Timestamp(start))
+        query = [lower_bound]
+    return query
+
+
+def is_compact(catalog_entry):
+    """True if `catalog_entry` says only change points are stored."""
+    if catalog_entry is None:
+        return False
+    return bool(catalog_entry.get('compact', False))
+
+
+def _compact_sample_period(catalog_entry):
+    sample_period = catalog_entry['sample_period']
+    if pd.isnull(sample_period):
+        raise ValueError("Can't expand {} because the catalog has no"
+                         " sample period for it".format(catalog_entry['key']))
+    return sample_period
+
+
+def _compact_end(catalog_entry, end):
+    """Returns the time (int nanoseconds) up to which a compact channel
+    should be expanded: the end of the channel or, if earlier, just
+    before `end`."""
+    channel_end = start_and_end_from_entry(catalog_entry)[1].value
+    if end is None:
+        return channel_end
+    return min(channel_end, pd.Timestamp(end).value - 1)
+
+
+def _after(df, start):
+    """Rows of `df` after `start`, like the '>' in `create_time_query`."""
+    if start is None:
+        return df
+    return df[df.index.asi8 > pd.Timestamp(start).value]
+
+
+def select_channel(store, key, start=None, end=None, columns=None,
+                   catalog_entry=None):
+    """Reads a channel from an open HDFStore.
+
+    Channels which the catalog says are stored as change points are
+    expanded back onto their regular sample grid, so callers always get
+    regularly sampled data.  The change point preceding `start` is read
+    too, so that the first expanded samples have the right values.
+
+    Parameters
+    ----------
+    store : pd.HDFStore
+    key : string
+    start, end : string or datetime, optional
+    columns : list of Measurements, optional
+    catalog_entry : dict or pandas.Series, optional
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if not is_compact(catalog_entry):
+        if start is None and end is None and columns is None:
+            return store[key]
+        where = None
+        if start is not None or end is not None:
+            where = create_time_query(start, end)
+        return store.select(key, where=where, columns=columns)
+
+    where = None if end is None else create_time_query(None, end)
+    df = store.select(key, where=where, columns=columns)
+    df = expand_change_points(df, _compact_sample_period(catalog_entry),
+                              end=_compact_end(catalog_entry, end))
+    return _after(df, start)
+
+
+class HDF5Channel(object):
+
+    """Proxy for a single mains / appliance channel in an HDF5 store.
+
+    No data is read from disk until the channel is accessed.  `load()`
+    pushes column and time-range selections down into `HDFStore.select`
+    so only the requested data is read.  Any other attribute access
+    (e.g. `channel.index` or `channel[measurement]`) loads the whole
+    channel (within `start` and `end`) once and then delegates to the
+    loaded DataFrame.
+
+    Attributes
+    ----------
+    filename : string
+        Full path to the HDF5 file.
+
+    key : string
+        The key of this channel in the HDF5 store,
+        e.g. '/1/utility/electric/mains/1/1'
+
+    start, end : string or datetime, optional
+        Default time range to use when loading this channel.
+
+    catalog_entry : dict or pandas.Series, optional
+        Summary metadata for this channel from the dataset's catalog.
+        If available then `sample_period` and `get_start_and_end`
+        are answered without reading any data.
+        See `nilmtk.dataset.catalog`.
+    """
+
+    def __init__(self, filename, key, start=None, end=None,
+                 catalog_entry=None):
+        self.filename = filename
+        self.key = key
+        self.start = start
+        self.end = end
+        self.catalog_entry = catalog_entry
+        self._dataframe = None
+
+    @property
+    def sample_period(self):
+        """Sample period in seconds from the catalog, or None if unknown."""
+        if self.catalog_entry is None:
+            return None
+        sample_period = self.catalog_entry['sample_period']
+        if pd.isnull(sample_period):
+            return None
+        return sample_period
+
+    @property
+    def compact(self):
+        """True if the catalog says only change points are stored.
+        Compact channels are expanded when they are loaded."""
+        return is_compact(self.catalog_entry)
+
+    def get_start_and_end(self):
+        """Returns [start, end] pd.Timestamps of this channel.  Uses the
+        catalog if possible, otherwise reads the data."""
+        if (self.catalog_entry is not None and self.start is None and
+                self.end is None and self.catalog_entry['n_rows'] > 0):
+            return start_and_end_from_entry(self.catalog_entry)
+        index = self.dataframe.index
+        return [index[0], index[-1]]
+
+    def _query(self, start=None, end=None):
+        if start is None:
+            start = self.start
+        if end is None:
+            end = self.end
+        if start is None and end is None:
+            return None
+        return create_time_query(start, end)
+
+    def load(self, columns=None, start=None, end=None):
+        """Read this channel from disk.
+
+        Parameters
+        ----------
+        columns : list of Measurements, optional
+            Only load these columns.  If None then load all columns.
+
+        start, end : string or datetime, optional
+            If provided then override `self.start` and `self.end`.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        if start is None:
+            start = self.start
+        if end is None:
+            end = self.end
+        store = pd.HDFStore(self.filename, mode='r')
+        try:
+            df = select_channel(store, self.key, start, end, columns,
+                                self.catalog_entry)
+        finally:
+            store.close()
+        return df
+
+    def iter_chunks(self, columns=None, chunksize=DEFAULT_CHUNKSIZE,
+                    start=None, end=None, expand=True):
+        """Iterate over this channel in bounded-size chunks read straight
+        from the HDF5 table.
+
+        Parameters
+        ----------
+        columns : list of Measurements, optional
+            Only load these columns.  If None then load all columns.
+
+        chunksize : int, optional
+            Maximum number of rows per chunk.
+
+        start, end : string or datetime, optional
+            If provided then override `self.start` and `self.end`.
+
+        expand : boolean, optional
+            Defaults to True.  If True and this channel is stored as
+            change points then expand each chunk back onto a regular
+            grid of `sample_period` seconds.  Chunks are expanded lazily
+            so each expanded chunk can be larger than `chunksize`.
+            If False then compact channels yield their raw change points.
+
+        Returns
+        -------
+        generator of pandas.DataFrames, each with `previous_timestamp`
+        and `previous_sample` attributes.
+
+        See Also
+        --------
+        nilmtk.utils.chunks_with_boundaries
+        """
+        expand = expand and self.compact
+        if expand:
+            # Read from the start of the channel so that the change
+            # point preceding `start` is available.
+            if start is None:
+                start = self.start
+            if end is None:
+                end = self.end
+            query = None if end is None else create_time_query(None, end)
+        else:
+            query = self._query(start, end)
+        store = pd.HDFStore(self.filename, mode='r')
+        try:
+            chunks = store.select(self.key, where=query, columns=columns,
+                                  iterator=True, chunksize=chunksize)
+            chunks = chunks_with_boundaries(chunks)
+            if expand:
+                chunks = expand_change_point_chunks(
+                    chunks, _compact_sample_period(self.catalog_entry),
+                    end=_compact_end(self.catalog_entry, end))
+                chunks = chunks_with_boundaries(
+                    _after(chunk, start) for chunk in chunks)
+            for chunk in chunks:
+                yield chunk
+        finally:
+            store.close()
+
+    @property
+    def dataframe(self):
+        """The whole channel (within `start` and `end`), loaded on first
+        access and then kept in memory."""
+        if self._dataframe is None:
+            self._dataframe = self.load()
+        return self._dataframe
+
+    def __getattr__(self, name):
+        # Only called if normal attribute lookup fails.  Don't delegate
+        # private attributes, otherwise copying and pickling recurse.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.dataframe, name)
+
+    def __getitem__(self, key):
+        return self.dataframe[key]
+
+    def __len__(self):
+        return len(self.dataframe)
+
+    def __repr__(self):
+        return ('HDF5Channel(filename={!r}, key={!r}, start={!r}, end={!r})'
+                .format(self.filename, self.key, self.start, self.end))
@@ -0,0 +1,107 @@
+"""Checkpoints which make long dataset conversions resumable.
+
+A checkpoint is a small JSON file, `checkpoint.json`, stored beside
+`dataset.h5`.  It records:
+
+    progress : dict
+        Converter-specific description of the work which has been
+        committed, e.g. {'file': 'appliance_group_data-1a.csv', 'chunk': 41}
+        or {'buildings': ['house_1', 'house_2']}
+    nrows : dict
+        Maps each HDF5 key to the number of rows committed to it.
+
+If a conversion is interrupted then any rows written after the last
+commit are rolled back (using `nrows`) before resuming from `progress`,
+so no rows are duplicated.
+"""
+
+from __future__ import print_function, division
+import os
+import json
+
+CHECKPOINT_FILENAME = 'checkpoint.json'
+
+
+def nrows_in_store(store):
+    """Returns a dict mapping every key in the table-format HDFStore
+    `store` to its number of rows."""
+    return dict((key, store.get_storer(key).nrows) for key in store.keys())
+
+
+class Checkpoint(object):
+
+    """Records the progress of a conversion in `directory/checkpoint.json`.
+
+    Attributes
+    ----------
+    filename : string
+        Full path of the checkpoint file.
+
+    progress : dict
+        The progress recorded by the last `commit`.  Empty if nothing has
+        been committed.
+
+    nrows : dict
+        Maps HDF5 keys to the number of rows committed.
+    """
+
+    def __init__(self, directory):
+        self.filename = os.path.join(directory, CHECKPOINT_FILENAME)
+        self.progress = {}
+        self.nrows = {}
+        if self.exists:
+            with open(self.filename, 'r') as fp:
+                state = json.loads(fp.read())
+            self.progress = state['progress']
+            self.nrows = state['nrows']
+
+    @property
+    def exists(self):
+        return os.path.isfile(self.filename)
+
+    def commit(self, progress, nrows, store=None):
+        """Records that all work up to `progress` is safely on disk.
+
+        Parameters
+        ----------
+        progress : dict
+            JSON-serialisable description of the work done so far.
+        nrows : dict
+            Maps HDF5 keys to number of rows written so far.
+        store : pd.HDFStore, optional
+            If provided then this store is flushed before the checkpoint
+            is written.
+        """
+        if store is not None:
+            store.flush()
+        self.progress = progress
+        self.nrows = dict(nrows)
+
+        # Write to a temporary file and rename it so that the
+        # checkpoint file is never left half-written.
+        temp_filename = self.filename + '.tmp'
+        with open(temp_filename, 'w') as fp:
+            fp.write(json.dumps({'progress': self.progress,
+                                 'nrows': self.nrows}))
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.rename(temp_filename, self.filename)
+
+    def rollback(self, store):
+        """Removes every row which was written to `store` after the last
+        commit.  Keys which were not committed at all are removed."""
+        for key in store.keys():
+            committed_rows = self.nrows.get(key, 0)
+            if committed_rows == 0:
+                print("Removing uncommitted", key)
+                store.remove(key)
+            elif store.get_storer(key).nrows > committed_rows:
+                print("Rolling back", key, "to", committed_rows, "rows")
+                store.remove(key, start=committed_rows)
+
+    def remove(self):
+        """Deletes the checkpoint file, e.g. once a conversion is complete."""
+        if self.exists:
+            os.remove(self.filename)
+        self.progress = {}
+        self.nrows = {}
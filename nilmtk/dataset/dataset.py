@@ -3,39 +3,267 @@ import os
 import json
 import copy
 import sys
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 from matplotlib.dates import SEC_PER_DAY
 from nilmtk.building import Building
+from nilmtk.dataset.channel import select_channel, HDF5Channel
+from nilmtk.dataset.catalog import load_catalog, write_catalog, catalog_entry
+from nilmtk.dataset.catalog import hdf5_key, channel_name_from_entry
+from nilmtk.dataset.catalog import read_catalog_entries, merge_catalog_entries
+from nilmtk.dataset.catalog import CATALOG_FILENAME
+from nilmtk.dataset import native
+from nilmtk.dataset.checkpoint import Checkpoint, nrows_in_store
 from nilmtk.sensors.electricity import MainsName
+from nilmtk.sensors.electricity import CircuitName
 from nilmtk.sensors.electricity import ApplianceName
 from nilmtk.sensors.electricity import Measurement
 from nilmtk.sensors.electricity import DualSupply
 from nilmtk.sensors.electricity import get_two_dataframes_of_dualsupply
-from nilmtk.utils import summary_stats_string
+from nilmtk.utils import summary_stats_string, effective_n_jobs
 from nilmtk.stats.electricity.building import proportion_of_energy_submetered
 from nilmtk.stats.electricity.building import get_dropout_rates
 from nilmtk.stats.electricity.single import get_uptime
+from nilmtk.preprocessing.electricity.single import change_points
 from nilmtk.stats.electricity.building import proportion_of_time_where_more_energy_submetered
 
 """Base class for all datasets."""
 
+# (complib, complevel) used by `DataSet.export` for each channel type
+# unless told otherwise
+DEFAULT_COMPRESSION = ('zlib', 9)
 
-def create_time_query(start, end):
-    if start is not None and end is not None:
-        lower_bound = pd.Term(
-            'index', '>', pd.Timestamp(start))
-        upper_bound = pd.Term(
-            'index', '<', pd.Timestamp(end))
-        query = [lower_bound, upper_bound]
-    elif start is None:
-        upper_bound = pd.Term(
-            'index', '<', pd.Timestamp(end))
-        query = [upper_bound]
+
+def _parse_electric_key(key):
+    """Parses a key from a nilmtk HDF5 store.
+
+    Parameters
+    ----------
+    key : string
+        e.g. '/1/utility/electric/mains/1/1',
+        '/1/utility/electric/appliances/fridge/1' or
+        '/1/utility/electric/circuits/sockets/1/1'
+
+    Returns
+    -------
+    (building_number, dict_name, channel_name) or None if `key`
+    does not describe a mains, circuit or appliance channel.
+    building_number : string
+    dict_name : {'mains', 'circuits', 'appliances'}
+    channel_name : MainsName, CircuitName or ApplianceName
+    """
+    parts = key.split("/")
+    if len(parts) not in [7, 8] or parts[2:4] != ['utility', 'electric']:
+        return None
+    building_number, dict_name = parts[1], parts[4]
+    if dict_name == 'mains' and len(parts) == 7:
+        channel_name = MainsName(int(parts[5]), int(parts[6]))
+    elif dict_name == 'appliances' and len(parts) == 7:
+        channel_name = ApplianceName(parts[5], int(parts[6]))
+    elif dict_name == 'circuits' and len(parts) == 8:
+        channel_name = CircuitName(parts[5], int(parts[6]), int(parts[7]))
     else:
-        lower_bound = pd.Term(
-            'index', '>', pd.Timestamp(start))
-        query = [lower_bound]
-    return query
+        return None
+    return building_number, dict_name, channel_name
+
+
+def _last_stored_timestamp(store, key):
+    """Returns the timestamp of the last row stored under `key` in the
+    table `store`, or None if the table is empty."""
+    n_rows = store.get_storer(key).nrows
+    if n_rows == 0:
+        return None
+    return store.select(key, start=n_rows - 1).index[-1]
+
+
+def _is_regular(index, sample_period, previous_timestamp=None):
+    """True if `index` (preceded by `previous_timestamp`, if given) is
+    sampled exactly every `sample_period` seconds, in which case its
+    change points can be expanded back into exactly the same index."""
+    if sample_period is None or pd.isnull(sample_period):
+        return False
+    timestamps = index.asi8
+    if previous_timestamp is not None:
+        timestamps = np.concatenate([[previous_timestamp.value], timestamps])
+    step = int(round(sample_period * 1E9))
+    return bool((np.diff(timestamps) == step).all())
+
+
+def _prepare_channel_for_export(task):
+    """Summarises a channel for the catalog and, if required, finds its
+    change points.  Run in a worker thread by `DataSet.export`.
+
+    Only regularly sampled channels are compacted, because the
+    timestamps of irregularly sampled data can't be recovered from its
+    change points.  Other channels are stored in full.
+
+    Parameters
+    ----------
+    task : tuple of (building_number, dict_name, channel_name, df,
+                     compact, compact_tolerance, old_entry,
+                     previous_timestamp)
+        `old_entry` and `previous_timestamp` describe the stored channel
+        which `df` will be appended to, or are None.
+
+    Returns
+    -------
+    building_number, dict_name, channel_name, df_to_write, catalog_entry
+
+    Raises
+    ------
+    ValueError if irregularly sampled data would be appended to a
+    compact channel.
+    """
+    (building_number, dict_name, channel_name, df,
+     compact, compact_tolerance, old_entry, previous_timestamp) = task
+    entry = catalog_entry(building_number, dict_name, channel_name, df,
+                          compact=compact)
+    if compact:
+        sample_period = entry['sample_period']
+        if old_entry is not None and old_entry['sample_period'] is not None:
+            sample_period = old_entry['sample_period']
+        if _is_regular(df.index, sample_period, previous_timestamp):
+            df = change_points(df, compact_tolerance)
+        elif old_entry is None:
+            print("Storing", channel_name, "of building", building_number,
+                  "in full because it is not regularly sampled")
+            entry['compact'] = False
+        else:
+            raise ValueError("Can't append irregularly sampled data to"
+                             " compact channel " + entry['key'])
+    return building_number, dict_name, channel_name, df, entry
+
+
+def _compression_kwargs(complib, complevel):
+    """Returns the keyword arguments for HDFStore.put / append which
+    compress a single node with `complib` at `complevel`."""
+    if complib is None or complevel == 0:
+        return {}
+    return {'complib': complib, 'complevel': complevel}
+
+
+def _write_csv_channel(args, rows_per_block=100000):
+    """Writes a single channel in nilmtk's CSV format.
+
+    The output is identical to
+    `df.to_csv(filename, float_format='%.2f', index_label='timestamp')`
+    with the index converted to integer epoch seconds and the columns
+    renamed to `column_names`.  But, instead of formatting every cell
+    separately, each block of rows is formatted with a single string
+    formatting operation.  Channels which pandas would format
+    differently (NaNs, non-numeric columns or column names which
+    need quoting) are written by pandas.
+
+    Parameters
+    ----------
+    args : tuple of (filename, df, column_names)
+
+    Returns
+    -------
+    filename
+    """
+    filename, df, column_names = args
+    timestamps = (df.index.asi8 / 1e9).astype(np.int64)
+
+    column_formats = []
+    for dtype in df.dtypes:
+        if dtype.kind == 'f':
+            column_formats.append('%.2f')
+        elif dtype.kind in 'iu':
+            column_formats.append('%d')
+        else:
+            column_formats = None
+            break
+    needs_quoting = any(char in name for name in column_names
+                        for char in ',"\n')
+    if (column_formats is None or needs_quoting or
+            df.isnull().values.any()):
+        temp = df.copy()
+        temp.index = timestamps
+        temp.columns = column_names
+        temp.to_csv(filename, float_format='%.2f', index_label="timestamp")
+        return filename
+
+    row_format = ','.join(['%d'] + column_formats) + '\n'
+    with open(filename, 'w') as fh:
+        fh.write(','.join(['timestamp'] + column_names) + '\n')
+        for block_start in range(0, len(df), rows_per_block):
+            block_end = min(block_start + rows_per_block, len(df))
+            block = np.empty((block_end - block_start, len(column_names) + 1),
+                             dtype=object)
+            block[:, 0] = timestamps[block_start:block_end]
+            for i, (_, series) in enumerate(df.iteritems()):
+                block[:, i + 1] = series.values[block_start:block_end]
+            fh.write((row_format * len(block)) % tuple(block.ravel()))
+    return filename
+
+
+def _load_building_in_worker(args):
+    """Loads a single building from a raw dataset in a worker process.
+
+    Float32 channels are written to `temp_directory` in nilmtk's native
+    format and removed from the building, so only the (small) remainder
+    of the building has to be pickled back to the parent process.
+
+    Parameters
+    ----------
+    args : tuple of (dataset_class, root_directory, building_name,
+                     load_kwargs, temp_directory)
+
+    Returns
+    -------
+    list of (building_key, building, path) tuples, one for each building
+    added to `dataset.buildings` by `load_building`.  Load the channels
+    in `path` with `nilmtk.dataset.native.load_electricity`.
+    """
+    (dataset_class, root_directory, building_name,
+     load_kwargs, temp_directory) = args
+    dataset = dataset_class()
+    dataset.load_building(root_directory, building_name, **load_kwargs)
+    buildings = []
+    for building_key, building in dataset.buildings.iteritems():
+        path = tempfile.mkdtemp(dir=temp_directory)
+        electric = building.utility.electric
+        channels = [(dict_name, channel_name)
+                    for dict_name in native.ELECTRICITY_DICTS
+                    for channel_name, df in getattr(electric, dict_name).iteritems()
+                    if native.is_native(df)]
+        native.export_electricity(electric, path, channels)
+        for dict_name, channel_name in channels:
+            del getattr(electric, dict_name)[channel_name]
+        buildings.append((building_key, building, path))
+    return buildings
+
+
+def _load_building_from_hdf5(args):
+    """Loads a single building in a worker process.
+
+    Parameters
+    ----------
+    args : tuple of (building_number, filename, channels, start, end)
+        `channels` is a list of (dict_name, channel_name, key,
+        catalog_entry) tuples.
+
+    Returns
+    -------
+    building_number, channels
+        `channels` is a list of (dict_name, channel_name, DataFrame) tuples.
+    """
+    building_number, filename, channels_to_load, start, end = args
+    store = pd.HDFStore(filename, mode='r')
+    channels = []
+    try:
+        for dict_name, channel_name, key, entry in channels_to_load:
+            df = select_channel(store, key, start, end, catalog_entry=entry)
+            channels.append((dict_name, channel_name, df))
+    finally:
+        store.close()
+    return building_number, channels
 
 
 class DataSet(object):
@@ -74,13 +302,20 @@ class DataSet(object):
             The geo location of the research institution.  Used as a fall back
             if geo location isn't available for any individual building.
 
+    catalog : pandas.DataFrame or None
+        One row per channel describing the channels in the HDF5 store
+        this DataSet was loaded from (or exported to).  None if no catalog
+        is available.  See `nilmtk.dataset.catalog`.
+
     """
 
     def __init__(self):
         self.buildings = {}
         self.metadata = {}
+        self.catalog = None
 
-    def load(self, root_directory, buildings_to_load=None, **args):
+    def load(self, root_directory, buildings_to_load=None, n_jobs=1,
+             temp_directory=None, **args):
         """Load dataset into memory
         
         Parameters
@@ -89,6 +324,18 @@ class DataSet(object):
         buildings_to_load : list of strings, optional
             Use the native dataset names. e.g. 'house_1' for REDD.
             If none then load all buildings in the dataset.
+        n_jobs : int, optional
+            Defaults to 1.  The number of worker processes used to load
+            buildings concurrently.  -1 means use all CPUs.  Each worker
+            writes the float32 channels of its building to a temporary
+            directory in nilmtk's native format (see
+            `nilmtk.dataset.native`), which are then memory-mapped by
+            this process instead of being pickled.
+        temp_directory : string, optional
+            Where workers write buildings.  Defaults to a new directory
+            in the system's temporary directory.  On POSIX systems the
+            files are unlinked as soon as they are mapped.  Elsewhere
+            they are left in place.
         **args : optional
             named arguments to pass to load_building
         """
@@ -96,10 +343,104 @@ class DataSet(object):
         if buildings_to_load:
             building_names = (set(building_names)
                               .intersection(set(buildings_to_load)))
-        for building in building_names:
-            self.load_building(root_directory, building, **args)
 
-    def load_hdf5(self, directory, building_nums=None, time_map=None):
+        n_jobs = effective_n_jobs(n_jobs)
+        if n_jobs == 1:
+            for building in building_names:
+                self.load_building(root_directory, building, **args)
+            return
+
+        remove_temp_directory = temp_directory is None and os.name == 'posix'
+        if temp_directory is None:
+            temp_directory = tempfile.mkdtemp(prefix='nilmtk-')
+        tasks = [(self.__class__, root_directory, building_name, args,
+                  temp_directory) for building_name in building_names]
+        pool = Pool(n_jobs)
+        try:
+            for buildings in pool.imap_unordered(_load_building_in_worker,
+                                                 tasks):
+                for building_key, building, path in buildings:
+                    native.load_electricity(path, building.utility.electric)
+                    if os.name == 'posix':
+                        shutil.rmtree(path)
+                    self.buildings[building_key] = building
+        finally:
+            pool.close()
+            pool.join()
+            if remove_temp_directory:
+                shutil.rmtree(temp_directory, ignore_errors=True)
+
+    def convert_to_hdf5(self, root_directory, output_directory,
+                        buildings_to_load=None, resume=True, **args):
+        """Converts a raw dataset to nilmtk's HDF5 format one building at
+        a time, so that only one building is in memory at once.
+
+        Progress is committed to a `checkpoint.json` file beside
+        `dataset.h5` after each building (see `nilmtk.dataset.checkpoint`).
+        If the conversion is interrupted then re-running it rolls back
+        any rows written after the last commit and carries on from the
+        next building, without duplicating rows.  The checkpoint is
+        removed once the conversion is complete.
+
+        `self.buildings` is empty afterwards.  Use `load_hdf5` to load
+        the converted dataset.
+
+        Parameters
+        ----------
+        root_directory : string
+        output_directory : string
+        buildings_to_load : list of strings, optional
+            Use the native dataset names. e.g. 'house_1' for REDD.
+            If none then convert all buildings in the dataset.
+        resume : boolean, optional
+            Defaults to True.  If False then ignore any checkpoint and
+            start again.
+        **args : optional
+            named arguments to pass to load_building
+        """
+        building_names = self.load_building_names(root_directory)
+        if buildings_to_load:
+            building_names = [name for name in building_names
+                              if name in buildings_to_load]
+
+        if not os.path.exists(output_directory):
+            os.makedirs(output_directory)
+        path_h5 = os.path.join(output_directory, 'dataset.h5')
+        checkpoint = Checkpoint(output_directory)
+        if resume and checkpoint.exists:
+            buildings_done = checkpoint.progress['buildings']
+            print("Resuming.  Buildings already converted:", buildings_done)
+            store = pd.HDFStore(path_h5, mode='a')
+            try:
+                checkpoint.rollback(store)
+            finally:
+                store.close()
+            mode = 'a'
+        else:
+            checkpoint.remove()
+            buildings_done = []
+            mode = 'w'
+
+        for building_name in building_names:
+            if building_name in buildings_done:
+                continue
+            self.buildings = {}
+            self.load_building(root_directory, building_name, **args)
+            self.export(output_directory, mode=mode)
+            mode = 'a'
+            buildings_done.append(building_name)
+            store = pd.HDFStore(path_h5, mode='r')
+            try:
+                nrows = nrows_in_store(store)
+            finally:
+                store.close()
+            checkpoint.commit({'buildings': buildings_done}, nrows)
+
+        self.buildings = {}
+        checkpoint.remove()
+
+    def load_hdf5(self, directory, building_nums=None, time_map=None,
+                  lazy=False, n_jobs=1):
         """Imports dataset from HDF5 store into NILMTK object
 
         Parameters
@@ -113,20 +454,42 @@ class DataSet(object):
 
         time_map : dict, optional 
             building number: (start, end) time to query
+
+        lazy : boolean, optional
+            Defaults to False.  If True then no data is loaded into memory.
+            Instead, each value of the `mains` and `appliances` dicts is an
+            `HDF5Channel` which only reads from the store when accessed.
+            Use `Electricity.load_channels` to push column and time-range
+            selections down into the store.
+
+        n_jobs : int, optional
+            Defaults to 1.  The number of worker processes used to load
+            buildings concurrently.  Each worker opens its own read-only
+            store.  -1 means use all CPUs.  Ignored if `lazy` is True.
         """
         # Load metadata if exists
         if os.path.isfile(os.path.join(directory, 'metadata.json')):
             with open(os.path.join(directory, 'metadata.json'), 'r') as metadata_fp:
                 self.metadata = json.loads(metadata_fp.read())
-        store = pd.HDFStore(
-            os.path.join(directory, 'dataset.h5'))
+        filename = os.path.join(directory, 'dataset.h5')
         self.buildings = {}
 
-        # Finding all keys stored in the HDF5 store
-        keys = store.keys()
+        # Find all channels.  Use the catalog if it exists, which saves
+        # us from opening the store at all in lazy mode.
+        self.catalog = load_catalog(directory)
+        store = None
+        if self.catalog is None:
+            store = pd.HDFStore(filename, mode='r')
+            channels = [_parse_electric_key(key) + (key, None)
+                        for key in store.keys()
+                        if _parse_electric_key(key) is not None]
+        else:
+            channels = [(str(entry['building']), entry['dict_name'],
+                         channel_name_from_entry(entry), entry['key'], entry)
+                        for _, entry in self.catalog.iterrows()]
 
         # Finding the buildings
-        building_numbers = list(set([key.split("/")[1] for key in keys]))
+        building_numbers = list(set([channel[0] for channel in channels]))
 
         # Only use building nums the users asked for
         if building_nums:
@@ -134,88 +497,71 @@ class DataSet(object):
             building_numbers = list(
                 set(building_numbers).intersection(set(building_nums)))
 
-        # Loading the structured information for each building
+        # Create a new building for each building number and find
+        # the channels which belong to each building
+        channels_per_building = {}
         for building_number in building_numbers:
+            self.buildings[int(building_number)] = Building()
+            channels_per_building[building_number] = []
+        for channel in channels:
+            if channel[0] in channels_per_building:
+                channels_per_building[channel[0]].append(channel[1:])
+
+        def get_time_range(building_number):
+            if time_map is None:
+                return None, None
+            return time_map.get(int(building_number), (None, None))
+
+        n_jobs = effective_n_jobs(n_jobs)
+        if n_jobs > 1 and not lazy:
+            # Each worker process opens its own read-only store
+            if store is not None:
+                store.close()
+            jobs = [(building_number, filename,
+                     channels_per_building[building_number]) +
+                    tuple(get_time_range(building_number))
+                    for building_number in building_numbers]
+            pool = Pool(processes=n_jobs)
+            try:
+                for building_number, channels in pool.imap_unordered(
+                        _load_building_from_hdf5, jobs):
+                    electric = self.buildings[int(building_number)].utility.electric
+                    for dict_name, channel_name, df in channels:
+                        getattr(electric, dict_name)[channel_name] = df
+            finally:
+                pool.close()
+                pool.join()
+            return
 
-            # Create a new building and add it to buildings
-            b = Building()
-            self.buildings[int(building_number)] = b
-
-            # Find the keys which start with this particular building
-            keys_building = [
-                key for key in keys if key.split("/")[1] == building_number]
-
-            # Loading utilites
-            keys_utilities = [
-                key for key in keys_building if "utility" in key]
-
-            # Load electric if len(keys_utilities)>0
-
-            if len(keys_utilities) > 0:
-                # Load electric
-                keys_electric = [
-                    key for key in keys_utilities if "electric" in key]
-
-                # Loading mains
-                keys_mains = [
-                    key for key in keys_electric if "mains" in key]
-
-                if len(keys_mains) > 0:
-                    b.utility.electric.mains = {}
-                    for key in keys_mains:
-                        mains_split = int(key.split("/")[-2])
-                        mains_meter = int(key.split("/")[-1])
-                        mains_name = MainsName(mains_split, mains_meter)
-
-                        if time_map is None:
-                            b.utility.electric.mains[
-                                mains_name] = store[key]
-
-                        else:
-                            if int(building_number) in time_map.keys():
-
-                                start, end = time_map[int(building_number)]
-                                query = create_time_query(start, end)
-
-                            else:
-                                query = []
-
-                            b.utility.electric.mains[
-                                mains_name] = store.select(key, query)
-
-                # Loading appliances
-                keys_appliances = [
-                    key for key in keys_electric if "appliances" in key]
-
-                if len(keys_appliances) > 0:
-                    b.utility.electric.appliances = {}
-                    for key in keys_appliances:
-                        appliance_name = key.split("/")[-2]
-                        appliance_instance = int(key.split("/")[-1])
-                        appliance_name = ApplianceName(
-                            appliance_name, appliance_instance)
-                        if time_map is None:
-                            b.utility.electric.appliances[
-                                appliance_name] = store[key]
-                        else:
-                            if int(building_number) in time_map.keys():
-                                start, end = time_map[int(building_number)]
-                                query = create_time_query(start, end)
-                            else:
-                                query = []
-
-                            b.utility.electric.appliances[
-                                appliance_name] = store.select(key, query)
+        # Loading the structured information for each building
+        for building_number, channels_building in channels_per_building.iteritems():
+            start, end = get_time_range(building_number)
+            electric = self.buildings[int(building_number)].utility.electric
+            for dict_name, channel_name, key, entry in channels_building:
+                if lazy:
+                    channel = HDF5Channel(filename, key, start, end,
+                                          catalog_entry=entry)
+                else:
+                    if store is None:
+                        store = pd.HDFStore(filename, mode='r')
+                    channel = select_channel(store, key, start, end,
+                                             catalog_entry=entry)
+                getattr(electric, dict_name)[channel_name] = channel
 
         # Closing the store
-        store.close()
+        if store is not None:
+            store.close()
 
-    def export_csv(self, directory):
+    def export_csv(self, directory, n_jobs=1):
         """Exports dataset in nilmtk standard on-disk CSV format.
 
         Parameters
         ----------
         directory : Complete path where to export the data
+
+        n_jobs : int, optional
+            Defaults to 1.  Number of worker processes used to write
+            channels concurrently.  -1 means use all CPUs.
         """
 
         # Mapping from {Appliance/Mains/Circuit}Name to CSV name
@@ -250,7 +596,8 @@ class DataSet(object):
 
         def create_path_df(building_number, df_name, df, df_type, column):
             """Creates corresponding path in the nilmtk folder hierarchy for df,
-             if the path does not exist. Also, saves the dataset in epoch unix
+             if the path does not exist.  Returns the arguments for
+             `_write_csv_channel` which saves the dataset in epoch unix
              timestamped CSVs. CSV name correpsond to namedtuple_map
 
             Parameters
@@ -267,16 +614,11 @@ class DataSet(object):
                 directory, folder_path_map[df_type](building_number))
             if not os.path.exists(dir_path):
                 os.makedirs(dir_path)
-            temp = df.copy()
-            temp.index = (df.index.astype(int) / 1e9).astype(int)
-            temp.rename(columns=column_mapping[column], inplace=True)
-            temp.to_csv(os.path.join(dir_path, namedtuple_map[df_type
-                                                              ](df_name)),
-                        float_format='%.2f',
-                        index_label="timestamp")
+            return (os.path.join(dir_path, namedtuple_map[df_type](df_name)),
+                    df, [column_mapping[column](col) for col in df.columns])
 
+        tasks = []
         for building_number in self.buildings:
-            print("Writing data for building %d" % (building_number))
             building = self.buildings[building_number]
             utility = building.utility
             electric = utility.electric
@@ -284,24 +626,38 @@ class DataSet(object):
             appliances = electric.appliances
             circuits = electric.circuits
             for main_name, main_df in mains.iteritems():
-                create_path_df(building_number, main_name,
-                               main_df, 'mains', 'single')
+                tasks.append(create_path_df(building_number, main_name,
+                                            main_df, 'mains', 'single'))
 
             for appliance_name, appliance_df in appliances.iteritems():
                 if isinstance(appliance_df.columns[0], DualSupply):
-                    create_path_df(
+                    tasks.append(create_path_df(
                         building_number, appliance_name, appliance_df,
-                        'appliances', 'dual')
+                        'appliances', 'dual'))
                 else:
-                    create_path_df(
+                    tasks.append(create_path_df(
                         building_number, appliance_name, appliance_df,
-                        'appliances', 'single')
+                        'appliances', 'single'))
 
             for circuit_name, circuit_df in circuits.iteritems():
-                create_path_df(building_number, circuit_name, circuit_df,
-                               'circuit', 'single')
-
-    def export(self, directory, format='HDF5', compact=False):
+                tasks.append(create_path_df(building_number, circuit_name,
+                                            circuit_df, 'circuits', 'single'))
+
+        n_jobs = effective_n_jobs(n_jobs)
+        if n_jobs > 1:
+            pool = Pool(n_jobs)
+            try:
+                for filename in pool.imap_unordered(_write_csv_channel, tasks):
+                    print("Written", filename)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for task in tasks:
+                print("Written", _write_csv_channel(task))
+
+    def export(self, directory, format='HDF5', compact=False,
+               compact_tolerance=0, mode='w', compression=None, n_jobs=1):
         """Export dataset to disk as HDF5.
 
         Parameters
@@ -313,40 +669,230 @@ class DataSet(object):
             `REDD+` or `HDF5`
 
         compact : boolean, optional
-            Defaults to false.  If True then only save change points.
+            Defaults to false.  If True then only save change points of
+            regularly sampled appliance channels (mains, and appliances
+            whose samples aren't exactly `sample_period` apart, are
+            always saved in full).  The catalog records which channels
+            are compact and `load_hdf5` expands them back onto their
+            sample grid when they are loaded.  See
+            `nilmtk.preprocessing.electricity.single.change_points`.
+
+        compact_tolerance : float, optional
+            Defaults to 0, in which case compact channels load exactly
+            as they were exported.  Only used if `compact` is True.
+            Changes of up to `compact_tolerance` are not saved.
+
+        mode : {'w', 'a'}, optional
+            Defaults to 'w', which replaces any existing `dataset.h5`.
+            If 'a' then append to an existing export: new buildings and
+            new channels are added, and only the rows of existing
+            channels which are newer than the last stored row are
+            appended.  Existing rows are never rewritten.  Metadata is
+            merged into the existing `metadata.json`.  Channels which
+            were exported compactly stay compact.
+
+        compression : dict, optional
+            Maps 'mains' and 'appliances' to a (complib, complevel) tuple
+            used to compress channels of that type, e.g.
+            {'mains': ('blosc', 5), 'appliances': ('zlib', 9)}.
+            complib can be any codec supported by PyTables ('zlib',
+            'blosc', 'lzo', 'bzip2') or None for no compression.
+            Missing entries default to ('zlib', 9).
+            See `nilmtk.dataset.benchmark` to compare codecs.
+
+        n_jobs : int, optional
+            Defaults to 1.  Number of threads used to prepare channels
+            (summarising them for the catalog and finding change points)
+            while this thread writes prepared channels to the store.
+            Writing, and hence compression, stays serial because
+            HDFStore is not thread-safe; only the 'blosc' codec
+            compresses each write with up to `n_jobs` threads (the
+            previous blosc setting is restored afterwards).  -1 means
+            use all CPUs.
+
+        Also writes `catalog.json` which describes every channel.  See
+        `nilmtk.dataset.catalog`.
         """
+        if mode not in ['w', 'a']:
+            raise ValueError("`mode` must be 'w' or 'a'")
+
         if not os.path.exists(directory):
             os.makedirs(directory)
 
         # Store metadata
-        with open(os.path.join(directory, 'metadata.json'), 'w') as metadata_fp:
-            metadata_fp.write(json.dumps(self.metadata))
+        metadata_filename = os.path.join(directory, 'metadata.json')
+        metadata = {}
+        if mode == 'a' and os.path.isfile(metadata_filename):
+            with open(metadata_filename, 'r') as metadata_fp:
+                metadata = json.loads(metadata_fp.read())
+        metadata.update(self.metadata)
+        with open(metadata_filename, 'w') as metadata_fp:
+            metadata_fp.write(json.dumps(metadata))
 
         # Delete older dataset.h5 file if it exists
         path_h5 = os.path.join(directory, 'dataset.h5')
-        if os.path.isfile(path_h5):
+        if mode == 'w' and os.path.isfile(path_h5):
             print("Removing older HDF5 file")
             os.remove(path_h5)
 
-        store = pd.HDFStore(path_h5, complevel=9, complib='zlib')
+        # Existing catalog entries, keyed by HDF5 key
+        catalog = OrderedDict()
+        if mode == 'a':
+            for entry in read_catalog_entries(directory):
+                catalog[entry['key']] = entry
+
+        if compression is None:
+            compression = {}
+        n_jobs = effective_n_jobs(n_jobs)
+
+        store = pd.HDFStore(path_h5, mode='a')
+        existing_keys = set(store.keys())
+        # Compact channels can only be expanded if the catalog says
+        # they are compact
+        if compact and any(_parse_electric_key(key) is not None and
+                           key not in catalog for key in existing_keys):
+            store.close()
+            raise ValueError("Can't append compact channels to a store"
+                             " which was exported without a catalog")
+
+        # Find what needs writing.  Appending needs to read from the
+        # store so do it here, before any threads start.
+        tasks = []
         for building_number in self.buildings:
-            print("Writing data for %d" % (building_number))
             building = self.buildings[building_number]
             utility = building.utility
             electric = utility.electric
-            mains = electric.mains
-            for main in mains:
+            for dict_name in ['mains', 'appliances']:
+                for channel_name, df in getattr(electric, dict_name).iteritems():
+                    key = hdf5_key(building_number, dict_name, channel_name)
+                    old_entry = catalog.get(key)
+                    previous_timestamp = None
+                    if key in existing_keys:
+                        previous_timestamp = _last_stored_timestamp(store, key)
+                        if previous_timestamp is not None:
+                            df = df[df.index > previous_timestamp]
+                        if len(df) == 0:
+                            continue
+                    if old_entry is None:
+                        compact_channel = compact and dict_name == 'appliances'
+                    else:
+                        compact_channel = old_entry.get('compact', False)
+                    tasks.append((building_number, dict_name, channel_name,
+                                  df, compact_channel, compact_tolerance,
+                                  old_entry, previous_timestamp))
+
+        # Prepare channels in a pool of threads and write them from
+        # this thread, in order.  HDFStore is not thread-safe.
+        pool = None
+        previous_blosc_threads = None
+        if n_jobs > 1:
+            import tables
+            pool = ThreadPool(n_jobs)
+            previous_blosc_threads = tables.set_blosc_max_threads(n_jobs)
+        try:
+            if pool is None:
+                prepared_channels = (_prepare_channel_for_export(task)
+                                     for task in tasks)
+            else:
+                prepared_channels = pool.imap(_prepare_channel_for_export,
+                                              tasks)
+            previous_building_number = None
+            for building_number, dict_name, channel_name, df, entry in prepared_channels:
+                if building_number != previous_building_number:
+                    print("Writing data for %d" % (building_number))
+                    previous_building_number = building_number
+                key = hdf5_key(building_number, dict_name, channel_name)
+                complib, complevel = compression.get(dict_name,
+                                                     DEFAULT_COMPRESSION)
+                compression_kwargs = _compression_kwargs(complib, complevel)
+                if key in existing_keys:
+                    store.append(key, df, **compression_kwargs)
+                    if key in catalog:
+                        entry = merge_catalog_entries(catalog[key], entry)
+                else:
+                    store.put(key, df, table=True, **compression_kwargs)
+                catalog[key] = entry
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            store.close()
+            if previous_blosc_threads is not None:
+                tables.set_blosc_max_threads(previous_blosc_threads)
+
+        # If we appended to a store which was exported without a catalog
+        # then we can't describe the channels we didn't touch, and an
+        # incomplete catalog would hide them from `load_hdf5`.
+        uncatalogued = [existing_key for existing_key in existing_keys
+                        if _parse_electric_key(existing_key) is not None and
+                        existing_key not in catalog]
+        if uncatalogued:
+            print("Not writing catalog because %d existing channels have no"
+                  " catalog entry" % len(uncatalogued))
+            catalog_filename = os.path.join(directory, CATALOG_FILENAME)
+            if os.path.isfile(catalog_filename):
+                os.remove(catalog_filename)
+            self.catalog = None
+            return
+
+        write_catalog(directory, catalog.values())
+        self.catalog = load_catalog(directory)
+
+    def export_memmap(self, directory):
+        """Export dataset to disk in nilmtk's native, memory-mappable format.
+
+        Each channel is stored as a raw int64 timestamp array and a
+        float32 array of values.  See `nilmtk.dataset.native`.
 
-                store.put('/%d/utility/electric/mains/%d/%d/' %
-                          (building_number, main.split, main.meter),
-                          mains[main], table=True)
-            appliances = electric.appliances
-            for appliance in appliances:
-                store.put('%d/utility/electric/appliances/%s/%d/' %
-                          (building_number, appliance.name,
-                           appliance.instance),
-                          appliances[appliance], table=True)
-        store.close()
+        Parameters
+        ----------
+        directory : str
+            Output directory
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # Store metadata
+        with open(os.path.join(directory, 'metadata.json'), 'w') as metadata_fp:
+            metadata_fp.write(json.dumps(self.metadata))
+
+        for building_number, building in self.buildings.iteritems():
+            print("Writing data for %d" % (building_number))
+            native.export_building(
+                building,
+                os.path.join(directory, 'building_%d' % building_number))
+
+    def load_memmap(self, directory, building_nums=None, mode='c'):
+        """Load a dataset written by `export_memmap`.
+
+        No data is copied into memory.  Each channel is a DataFrame backed
+        by `numpy.memmap` arrays, so pages are only read from disk when
+        they are accessed and are shared with any other process which
+        maps the same files.
+
+        Parameters
+        ----------
+        directory : str
+            Directory written by `export_memmap`
+
+        building_nums : list of ints, optional
+            Building numbers to load
+
+        mode : {'c', 'r'}, optional
+            Defaults to 'c' (copy-on-write): loaded DataFrames can be
+            modified in memory without modifying the files on disk.
+            'r' makes the DataFrames read-only.
+        """
+        # Load metadata if exists
+        if os.path.isfile(os.path.join(directory, 'metadata.json')):
+            with open(os.path.join(directory, 'metadata.json'), 'r') as metadata_fp:
+                self.metadata = json.loads(metadata_fp.read())
+
+        self.buildings = {}
+        for building_number, path in native.building_directories(directory).iteritems():
+            if building_nums and building_number not in building_nums:
+                continue
+            self.buildings[building_number] = native.load_building(path, mode=mode)
 
     # This will be overridden by each subclass
     def load_building_names(self, root_directory):
@@ -415,7 +961,61 @@ class DataSet(object):
 
         return stats
 
-    def describe(self, fh=sys.stdout):
+    def describe_catalog(self):
+        """Returns a string describing the dataset using only the catalog,
+        hence no data needs to be loaded.
+
+        Describes every channel in the HDF5 store, including buildings
+        and time ranges which were not loaded (e.g. because of the
+        `building_nums` or `time_map` arguments to `load_hdf5`)."""
+        catalog = self.catalog
+        n_appliances = []
+        durations = []
+        for building_number, entries in catalog.groupby('building'):
+            n_appliances.append((entries['dict_name'] == 'appliances').sum())
+            start = pd.to_datetime(entries['start']).min()
+            end = pd.to_datetime(entries['end']).max()
+            durations.append((end - start).total_seconds() / SEC_PER_DAY)
+
+        s = ''
+        s += 'METADATA:\n'
+        for key, value in self.metadata.iteritems():
+            s += '  {} = {}\n'.format(key, value)
+        s += '\n'
+        s += 'NUMBER OF BUILDINGS: {:d}\n\n'.format(len(n_appliances))
+        s += 'NUMBER OF APPLIANCES PER BUILDING:\n'
+        s += summary_stats_string(n_appliances)
+        s += '\n'
+        s += 'DURATION PER BUILDING (DAYS):\n'
+        s += summary_stats_string(durations)
+        s += '\n'
+        s += 'SAMPLE PERIOD PER CHANNEL (SECONDS):\n'
+        s += summary_stats_string(catalog['sample_period'].dropna())
+        s += '\n'
+        s += 'NUMBER OF CHANNELS: {:d}\n'.format(len(catalog))
+        s += 'NUMBER OF ROWS: {:d}\n'.format(int(catalog['n_rows'].sum()))
+        s += 'SIZE IN MEMORY (MB): {:.1f}\n'.format(
+            catalog['nbytes'].sum() / 1E6)
+
+        return s
+
+    def describe(self, fh=sys.stdout, use_catalog=False):
+        """Writes a description of the dataset to `fh`.
+
+        Parameters
+        ----------
+        fh : file, optional
+            Defaults to sys.stdout
+        use_catalog : boolean, optional
+            Defaults to False.  If True and a catalog is available then
+            describe the whole HDF5 store using only the catalog (which is
+            very fast because no data is loaded) instead of describing
+            the loaded buildings.  See `describe_catalog`.
+        """
+        if use_catalog and self.catalog is not None:
+            fh.write(self.describe_catalog())
+            return
+
         # Prepare string representation of stats
         stats = self.descriptive_stats()
 
@@ -1,13 +1,20 @@
 from __future__ import print_function, division
+import os
+import json
 import pandas as pd
 import numpy as np
+from collections import defaultdict, deque
+from multiprocessing import Pool
 from os.path import join
-from datetime import datetime
-from pytz import UTC
 from sys import stderr
 from nilmtk.dataset import DataSet
 from nilmtk.building import Building
+from nilmtk.utils import effective_n_jobs, line_aligned_byte_ranges
+from nilmtk.utils import read_byte_range, offset_after_lines
+from nilmtk.dataset.catalog import hdf5_key, CATALOG_FILENAME
+from nilmtk.dataset.checkpoint import Checkpoint
 from nilmtk.sensors.electricity import Measurement, MainsName, CircuitName
+from nilmtk.sensors.electricity import ApplianceName
 
 """
 TODO
@@ -47,6 +54,7 @@ HES notes
 FILENAMES = ['appliance_group_data-{}.csv'.format(s) for s in
              ['1a','1b','1c','1d','2','3']]
 CHUNKSIZE = 1E5 # number of rows
+BYTES_PER_RANGE = 2**26 # size of each range parsed by a worker process
 COL_NAMES = ['interval id', 'house id', 'appliance code', 'date',
              'data', 'time']
 LAST_PWR_COLUMN = 250
@@ -57,24 +65,142 @@ CIRCUIT_CODES = range(208, 218) + [222]
 E_MEASUREMENT = Measurement('energy', 'active')
 
 
-def datetime_converter(s):
+def channel_for_appliance_code(appliance_code):
+    """Maps a HES appliance code to a nilmtk channel.
+
+    Returns
+    -------
+    (dict_name, channel_name) or None for temperature channels (which
+    nilmtk doesn't import yet).
+    dict_name : {'mains', 'circuits', 'appliances'}
+    channel_name : MainsName, CircuitName or ApplianceName
+    """
+    if appliance_code in MAINS_CODES:
+        split = MAINS_CODES.index(appliance_code) + 1
+        return 'mains', MainsName(split=split, meter=1)
+    elif appliance_code in CIRCUIT_CODES:
+        split = CIRCUIT_CODES.index(appliance_code) + 1
+        return 'circuits', CircuitName(name='sockets', split=split, meter=1)
+    elif appliance_code in TEMPERATURE_CODES:
+        return None # TODO
+    else:
+        # TODO convert HES appliance codes to nilmtk names
+        return 'appliances', ApplianceName(name=appliance_code, instance=1)
+
+
+def _split_chunk(chunk):
+    """Splits a chunk of a HES CSV file into channels.
+
+    Returns
+    -------
+    generator of (house_id, dict_name, channel_name, DataFrame) tuples
     """
+    # Parse all dates at once
+    datetimes = pd.to_datetime(chunk['date'] + ' ' + chunk['time'])
+
+    # Data is either tenths of a Wh or tenths of a degree
+    data = (chunk['data'].values * 10).astype(np.float32)
+
+    # Positions of the rows of each channel
+    groups = chunk.groupby(['house id', 'appliance code']).indices
+    for (house_id, appliance_code), positions in groups.iteritems():
+        channel = channel_for_appliance_code(appliance_code)
+        if channel is None:
+            continue
+        dict_name, channel_name = channel
+        index = pd.DatetimeIndex(datetimes.values[positions], tz='UTC')
+        df = pd.DataFrame(data=data[positions], index=index,
+                          columns=[E_MEASUREMENT])
+        yield house_id, dict_name, channel_name, df
+
+
+def _parse_byte_range(args):
+    """Parses a line-aligned byte range of a HES CSV file in a worker
+    process.
+
     Parameters
     ----------
-    s : int
-        of the form 2011-02-02 14:48:00
+    args : tuple of (filename, start, end)
 
     Returns
     -------
-    datetime
+    list of (house_id, dict_name, channel_name, DataFrame) tuples
     """
-    # 0123456789012345678
-    # 2011-02-02 14:48:00
-    # the code below is ~8 times faster 
-    # than datetime.strptime(s, '%Y-%m-%d %H:%M:%S')
-    return datetime(year=int(s[0:4]), month=int(s[5:7]), day=int(s[8:10]),
-                    hour=int(s[11:13]), minute=int(s[14:16]), 
-                    second=int(s[17:19]), tzinfo=UTC)
+    filename, start, end = args
+    chunk = pd.read_csv(read_byte_range(filename, start, end),
+                        names=COL_NAMES, index_col=False)
+    return list(_split_chunk(chunk))
+
+
+def iter_split_chunks(filename, max_chunks=None, n_jobs=1,
+                      bytes_per_range=BYTES_PER_RANGE, first_chunk=0):
+    """Parses a HES CSV file chunk by chunk.
+
+    Parameters
+    ----------
+    filename : string
+    max_chunks : int, optional
+        Only parse the first `max_chunks * CHUNKSIZE` rows of the file,
+        whatever `n_jobs` is.
+    n_jobs : int, optional
+        If 1 then read `CHUNKSIZE` rows at a time in this process.
+        Otherwise parse line-aligned ranges of `bytes_per_range` bytes in
+        a pool of `n_jobs` processes.  At most `2 * n_jobs` ranges are
+        parsed ahead of the consumer, so memory stays bounded even if
+        the consumer is slower than the workers.  -1 means use all CPUs.
+    bytes_per_range : int, optional
+    first_chunk : int, optional
+        Skip chunks before this one (e.g. when resuming).  Skipped rows
+        are not parsed.
+
+    Returns
+    -------
+    generator of lists of (house_id, dict_name, channel_name, DataFrame)
+    tuples, one list per chunk, in file order.
+    """
+    n_jobs = effective_n_jobs(n_jobs)
+    if n_jobs == 1:
+        reader = pd.read_csv(filename, names=COL_NAMES, index_col=False,
+                             chunksize=CHUNKSIZE,
+                             skiprows=int(first_chunk * CHUNKSIZE))
+        for chunk_i, chunk in enumerate(reader, first_chunk):
+            if max_chunks is not None and chunk_i >= max_chunks:
+                break
+            yield list(_split_chunk(chunk))
+        return
+
+    file_size = None
+    if max_chunks is not None:
+        file_size = offset_after_lines(filename, int(max_chunks * CHUNKSIZE))
+    ranges = line_aligned_byte_ranges(filename, bytes_per_range, file_size)
+    pool = Pool(n_jobs)
+    pending = deque()
+    finished = False
+    try:
+        for start, end in ranges[first_chunk:]:
+            pending.append(pool.apply_async(_parse_byte_range,
+                                            ((filename, start, end),)))
+            if len(pending) >= 2 * n_jobs:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        finished = True
+    finally:
+        # Don't wait for the rest of the file to be parsed if the
+        # consumer stopped early or something went wrong
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+
+
+def _hdf5_key(house_id, dict_name, channel_name):
+    if dict_name == 'circuits':
+        return '/%d/utility/electric/circuits/%s/%d/%d' % (
+            house_id, channel_name.name, channel_name.split, channel_name.meter)
+    return hdf5_key(house_id, dict_name, channel_name)
+
 
 def load_list_of_house_ids(data_dir):
     """Returns a list of house IDs in HES (ints)."""
@@ -123,7 +249,40 @@ class HES(DataSet):
             'timezone': 'Europe/London'
         }
 
-    def load(self, data_dir, max_chunks=None):
+    def load(self, data_dir, max_chunks=None, output_directory=None,
+             n_jobs=1, resume=True):
+        """
+        Parameters
+        ----------
+        data_dir : string
+        max_chunks : int, optional
+            Only load the first `max_chunks * CHUNKSIZE` rows of each
+            file.
+        output_directory : string, optional
+            If provided then stream each chunk straight into
+            `output_directory/dataset.h5` (in nilmtk's HDF5 format, which
+            can be loaded with `load_hdf5`) instead of keeping data in
+            memory, so memory usage stays flat no matter how many houses
+            are loaded.  Circuits are stored under
+            '/<house>/utility/electric/circuits/<name>/<split>/<meter>'.
+            Any `catalog.json` in `output_directory` is removed.
+        n_jobs : int, optional
+            Defaults to 1.  If greater than 1 then split each file into
+            line-aligned byte ranges and parse them in this many worker
+            processes.  Results are merged in file order, so the output
+            is identical to parsing in a single process.  -1 means use
+            all CPUs.
+        resume : boolean, optional
+            Defaults to True.  Only used with `output_directory`.  After
+            each chunk is written, progress is committed to a
+            `checkpoint.json` file beside `dataset.h5` (see
+            `nilmtk.dataset.checkpoint`).  If a previous conversion was
+            interrupted then roll back any uncommitted rows and carry on
+            from the last committed chunk.  If False then start again.
+            `n_jobs` must be 1 in both runs or greater than 1 in both
+            runs because chunks are defined differently.  The checkpoint
+            is removed once the conversion is complete.
+        """
         # load list of houses
         house_ids = load_list_of_house_ids(data_dir)
         for house_id in house_ids:
@@ -133,78 +292,97 @@ class HES(DataSet):
 
         houses_loaded = set()
 
-        for filename in FILENAMES:
-            # Load appliance energy data chunk-by-chunk
-            full_filename = join(data_dir, filename)
-            print('loading', full_filename)
-            try:
-                reader = pd.read_csv(full_filename, names=COL_NAMES, 
-                                     index_col=False, chunksize=CHUNKSIZE)
-            except IOError as e:
-                print(e, file=stderr)
-                continue
-
-            # Process each chunks
-            chunk_i = 0
-            for chunk in reader:
-                if max_chunks is not None and chunk_i >= max_chunks:
-                    break
-
-                print('processing chunk', chunk_i, 'of', filename)
-                # Convert date and time columns to np.datetime64 objects
-                dt = chunk['date'] + ' ' + chunk['time']
-                del chunk['date']
-                del chunk['time']
-                chunk['datetime'] = dt.apply(datetime_converter)
-
-                # Data is either tenths of a Wh or tenths of a degree
-                chunk['data'] *= 10
-                chunk['data'] = chunk['data'].astype(np.float32)
-
-                # Process each house in chunk
-                houses_in_chunk = chunk['house id'].unique() #TODO: use groupby?!?
-                houses_loaded = houses_loaded.union(set(houses_in_chunk))
-                for house_id in houses_in_chunk:
-                    self._process_house_in_chunk(house_id, chunk)
-
-                chunk_i += 1
-        print('houses with some data loaded:', houses_loaded)
+        # Maps (house_id, dict_name, channel_name) to list of DataFrames.
+        # Only used if we're not writing to an HDFStore.
+        channel_chunks = defaultdict(list)
+
+        # How chunks are defined, so we don't resume with different chunks
+        if effective_n_jobs(n_jobs) == 1:
+            chunking = 'rows:%d' % CHUNKSIZE
+        else:
+            chunking = 'bytes:%d' % BYTES_PER_RANGE
+        first_file_i, first_chunk = 0, 0
 
-    def _process_house_in_chunk(self, house_id, chunk):
-        building = self.buildings[house_id]
-        electric = building.utility.electric
-        house_data = chunk[chunk['house id'] == house_id]
-        appliances_in_house_chunk = house_data['appliance code'].unique()
-        for appliance_code in appliances_in_house_chunk:
-            # TODO: do this using Pandas groupby???
-            appliance_data = house_data[house_data['appliance code'] == 
-                                        appliance_code]
-            data = appliance_data['data'].values
-            index = appliance_data['datetime']
-            df = pd.DataFrame(data=data, index=index,
-                              columns=[E_MEASUREMENT])
-
-            is_temperature = False
-            if appliance_code in MAINS_CODES:
-                dict_ = electric.mains
-                split = MAINS_CODES.index(appliance_code) + 1
-                key = MainsName(split=split, meter=1)
-            elif appliance_code in CIRCUIT_CODES:
-                dict_ = electric.circuits
-                split = CIRCUIT_CODES.index(appliance_code) + 1
-                key = CircuitName(name='sockets', split=split, meter=1)
-            elif appliance_code in TEMPERATURE_CODES:
-                is_temperature = True
-                # TODO
+        if output_directory is None:
+            store = None
+        else:
+            if not os.path.exists(output_directory):
+                os.makedirs(output_directory)
+            with open(join(output_directory, 'metadata.json'), 'w') as metadata_fp:
+                metadata_fp.write(json.dumps(self.metadata))
+            checkpoint = Checkpoint(output_directory)
+            if resume and checkpoint.exists:
+                if checkpoint.progress['chunking'] != chunking:
+                    raise ValueError("Can't resume a conversion which used"
+                                     " chunks of " +
+                                     checkpoint.progress['chunking'] +
+                                     " with chunks of " + chunking)
+                first_file_i = checkpoint.progress['file_i']
+                first_chunk = checkpoint.progress['chunk']
+                print('Resuming from chunk', first_chunk, 'of',
+                      FILENAMES[first_file_i] if first_file_i < len(FILENAMES)
+                      else 'the end')
+                store = pd.HDFStore(join(output_directory, 'dataset.h5'),
+                                    mode='a', complevel=9, complib='zlib')
+                checkpoint.rollback(store)
             else:
-                dict_ = electric.appliances
-                key = appliance_code # TODO use nilmtk ApplianceNames
-
-            if not is_temperature:
-                try:
-                    dict_[key].append(df)
-                except KeyError:
-                    dict_[key] = df
+                checkpoint.remove()
+                store = pd.HDFStore(join(output_directory, 'dataset.h5'),
+                                    mode='w', complevel=9, complib='zlib')
+            nrows = dict(checkpoint.nrows)
+
+            # A catalog left by `DataSet.export` doesn't describe the
+            # channels written here, so `load_hdf5` would ignore them
+            catalog_filename = join(output_directory, CATALOG_FILENAME)
+            if os.path.isfile(catalog_filename):
+                os.remove(catalog_filename)
+
+        try:
+            for file_i, filename in enumerate(FILENAMES):
+                if file_i < first_file_i:
+                    continue
+                # Load appliance energy data chunk-by-chunk
+                full_filename = join(data_dir, filename)
+                print('loading', full_filename)
+                if not os.path.isfile(full_filename):
+                    print('File does not exist:', full_filename, file=stderr)
+                    continue
+
+                if file_i > first_file_i:
+                    first_chunk = 0
+                chunks = iter_split_chunks(full_filename, max_chunks=max_chunks,
+                                           n_jobs=n_jobs,
+                                           first_chunk=first_chunk)
+                for chunk_i, channels in enumerate(chunks, first_chunk):
+                    print('processing chunk', chunk_i, 'of', filename)
+                    for house_id, dict_name, channel_name, df in channels:
+                        houses_loaded.add(house_id)
+                        if store is None:
+                            channel_chunks[(house_id, dict_name,
+                                            channel_name)].append(df)
+                        else:
+                            key = _hdf5_key(house_id, dict_name, channel_name)
+                            store.append(key, df)
+                            nrows[key] = nrows.get(key, 0) + len(df)
+                    if store is not None:
+                        checkpoint.commit({'chunking': chunking,
+                                           'file_i': file_i,
+                                           'chunk': chunk_i + 1},
+                                          nrows, store=store)
+        finally:
+            if store is not None:
+                store.close()
+
+        if store is not None:
+            checkpoint.remove()
+
+        for (house_id, dict_name, channel_name), dfs in channel_chunks.iteritems():
+            if house_id not in self.buildings:
+                self.buildings[house_id] = Building()
+                self.buildings[house_id].metadata['original_name'] = house_id
+            electric = self.buildings[house_id].utility.electric
+            getattr(electric, dict_name)[channel_name] = pd.concat(dfs).sort_index()
+        print('houses with some data loaded:', houses_loaded)
 
     def load_building(self, filename, building_name):
         raise NotImplementedError
@@ -3,6 +3,7 @@ iAWE Dataset Loader
 """
 
 
+import numpy as np
 import pandas as pd
 
 from nilmtk.dataset import DataSet
@@ -12,14 +13,24 @@ from nilmtk.sensors.electricity import Measurement
 from nilmtk.sensors.electricity import ApplianceName
 from nilmtk.sensors.electricity import MainsName
 import os
-import MySQLdb
 import pandas.io.sql as psql
 
-mysql_conn = {}
-mysql_conn['jplug'] = MySQLdb.connect(
-    user='root', passwd='password', db='jplug')
-mysql_conn['smart'] = MySQLdb.connect(
-    user='root', passwd='password', db='smart_meter')
+# Default credentials for the local MySQL databases
+MYSQL_USER = 'root'
+MYSQL_PASSWORD = 'password'
+DATABASES = {'jplug': 'jplug', 'smart': 'smart_meter'}
+
+# Data after this UNIX timestamp was collected by other experiments
+END_TIMESTAMP = 1381069800
+
+# Local time range of the dataset
+START_DATE = '2013-06-07'
+END_DATE = '2014-01-01'
+
+# Number of rows fetched from the database per round trip
+FETCH_CHUNKSIZE = 100000
+
+JPLUG_COLUMNS = ['active_power', 'voltage']
 
 jplug_mapping = {
 
@@ -52,29 +63,164 @@ column_mapping = {
 }
 
 
-def query_database_jplug(self, jplug):
-    query = 'select active_power,voltage,timestamp from jplug_data where mac="%s";' % (
-        jplug)
-    data = psql.frame_query(query, mysql_conn['jplug'])
-    data = data[data.timestamp < 1381069800]
-    data.timestamp = data.timestamp.astype('int')
-    data.drop_duplicates(cols='timestamp', take_last=True, inplace=True)
-    data.index = pd.to_datetime(
-        (data.timestamp.values * 1E9).astype(int), utc=True)
-    data = data.drop('timestamp', 1)
+def connect(database):
+    """Connects to one of the iAWE MySQL databases.
+
+    MySQLdb is only imported here so that the rest of this module (and
+    any DB-API connection, e.g. from sqlite3) can be used without it.
+
+    Parameters
+    ----------
+    database : {'jplug', 'smart'}
+    """
+    import MySQLdb
+    return MySQLdb.connect(user=MYSQL_USER, passwd=MYSQL_PASSWORD,
+                           db=DATABASES[database])
+
+
+def _server_side_cursor(connection):
+    """Returns a cursor which streams rows from the server.  MySQLdb's
+    default cursor would buffer the entire result set client-side."""
+    if type(connection).__module__.startswith('MySQLdb'):
+        import MySQLdb.cursors
+        return connection.cursor(MySQLdb.cursors.SSCursor)
+    return connection.cursor()
+
+
+def _fetch_jplug_rows(connection, macs, chunksize):
+    """Runs a single query for all `macs`, ordered by (mac, timestamp),
+    and fetches the result `chunksize` rows at a time.
+
+    Returns
+    -------
+    macs : np.ndarray of objects
+    timestamps : np.ndarray of int64 UNIX timestamps
+    values : np.ndarray of float64, one column per `JPLUG_COLUMNS`.
+        NULLs become NaN.
+    """
+    # Parameter placeholders differ between DB-API drivers so the
+    # (trusted) MAC addresses are inlined into the query.
+    query = ("select mac, timestamp, {columns} from jplug_data"
+             " where mac in ({macs}) and timestamp < {end}"
+             " order by mac, timestamp"
+             .format(columns=', '.join(JPLUG_COLUMNS),
+                     macs=', '.join("'{}'".format(mac) for mac in macs),
+                     end=END_TIMESTAMP))
+    mac_chunks = []
+    timestamp_chunks = []
+    value_chunks = []
+    cursor = _server_side_cursor(connection)
+    try:
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(chunksize)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            mac_chunks.append(np.array(columns[0], dtype=object))
+            timestamp_chunks.append(np.array(columns[1], dtype=np.float64))
+            value_chunks.append(np.array(columns[2:], dtype=np.float64).T)
+    finally:
+        cursor.close()
 
-    data = data.tz_convert(self.metadata['timezone'])
-    # Get the data starting from June 7, 2013
-    data = data[pd.Timestamp('2013-06-07'):pd.Timestamp('2014-01-01')]
-    data = data.dropna()
-    data = data.astype('float32')
-    return data
+    if not mac_chunks:
+        return (np.empty(0, dtype=object), np.empty(0, dtype=np.int64),
+                np.empty((0, len(JPLUG_COLUMNS)), dtype=np.float64))
+    return (np.concatenate(mac_chunks),
+            np.concatenate(timestamp_chunks).astype(np.int64),
+            np.concatenate(value_chunks))
+
+
+def load_jplugs(connection, timezone, mapping=None, chunksize=FETCH_CHUNKSIZE):
+    """Loads every jPlug channel with one query.
+
+    Rows are split into channels, de-duplicated (keeping the last row for
+    each timestamp), cropped to `START_DATE`:`END_DATE` and stripped of
+    NaNs in a single vectorised pass over all jPlugs.
+
+    Parameters
+    ----------
+    connection : DB-API connection
+        To a database holding a `jplug_data` table with columns
+        mac, timestamp, active_power and voltage.
+    timezone : string
+    mapping : dict, optional
+        Maps MAC addresses to ApplianceNames.  Defaults to `jplug_mapping`.
+        Appliances measured by several jPlugs (at different times) are
+        merged into one channel.
+    chunksize : int, optional
+        Number of rows to fetch per round trip.
+
+    Returns
+    -------
+    dict mapping ApplianceNames to DataFrames
+    """
+    if mapping is None:
+        mapping = jplug_mapping
+    macs, timestamps, values = _fetch_jplug_rows(
+        connection, sorted(mapping.keys()), chunksize)
+    n_rows = len(macs)
+
+    # Rows are ordered by (mac, timestamp) so both the first row of each
+    # jPlug and any duplicate timestamps are adjacent.
+    new_mac = np.ones(n_rows, dtype=bool)
+    new_mac[1:] = macs[1:] != macs[:-1]
+    last_of_timestamp = np.ones(n_rows, dtype=bool)
+    last_of_timestamp[:-1] = (new_mac[1:] |
+                              (timestamps[1:] != timestamps[:-1]))
+
+    timestamps = timestamps * np.int64(10 ** 9)
+    start_ns = pd.Timestamp(START_DATE, tz=timezone).value
+    end_ns = pd.Timestamp(END_DATE, tz=timezone).value
+    keep = (last_of_timestamp &
+            (timestamps >= start_ns) & (timestamps <= end_ns) &
+            ~np.isnan(values).any(axis=1))
+    macs = macs[keep]
+    timestamps = timestamps[keep]
+    values = values[keep].astype(np.float32)
+
+    # Split into one slice per jPlug, then group slices by appliance
+    boundaries = np.flatnonzero(macs[1:] != macs[:-1]) + 1
+    starts = np.concatenate([[0], boundaries])
+    ends = np.concatenate([boundaries, [len(macs)]])
+    slices = dict((appliance, []) for appliance in set(mapping.values()))
+    for start, end in zip(starts, ends):
+        if end > start:
+            slices[mapping[macs[start]]].append(slice(start, end))
+
+    columns = [column_mapping[column] for column in JPLUG_COLUMNS]
+    appliances = {}
+    for appliance, appliance_slices in slices.iteritems():
+        appliance_slices = appliance_slices or [slice(0, 0)]
+        appliance_timestamps = np.concatenate(
+            [timestamps[s] for s in appliance_slices])
+        appliance_values = np.concatenate(
+            [values[s] for s in appliance_slices])
+        if len(appliance_slices) > 1:
+            order = np.argsort(appliance_timestamps, kind='mergesort')
+            appliance_timestamps = appliance_timestamps[order]
+            appliance_values = appliance_values[order]
+        index = pd.to_datetime(appliance_timestamps, utc=True)
+        appliances[appliance] = pd.DataFrame(
+            appliance_values, columns=columns,
+            index=index.tz_convert(timezone))
+    return appliances
 
 
 class IAWE(DataSet):
 
-    def __init__(self):
+    """
+    Parameters
+    ----------
+    jplug_connection, smart_meter_connection : DB-API connections, optional
+        Connections to the jPlug and smart meter databases.  If not given
+        then the local MySQL databases are connected to when loading.
+    """
+
+    def __init__(self, jplug_connection=None, smart_meter_connection=None):
         super(IAWE, self).__init__()
+        self.connections = {'jplug': jplug_connection,
+                            'smart': smart_meter_connection}
         self.metadata = {
             'name': 'iAWE',
             'urls': ['http://www.energy.iiitd.edu.in/iawe'],
@@ -88,13 +234,18 @@ class IAWE(DataSet):
         self.add_mains()
         self.add_appliances()
 
-    def load_hdf5(self, directory):
-        super(IAWE, self).load_hdf5(directory)
+    def load_hdf5(self, directory, **kwargs):
+        super(IAWE, self).load_hdf5(directory, **kwargs)
+
+    def _connection(self, database):
+        if self.connections[database] is None:
+            self.connections[database] = connect(database)
+        return self.connections[database]
 
     def add_mains(self):
         query = 'select W1, W2, f, VLN, timestamp from smart_meter_data;'
-        data = psql.frame_query(query, mysql_conn['smart'])
-        data = data[data.timestamp < 1381069800]
+        data = psql.frame_query(query, self._connection('smart'))
+        data = data[data.timestamp < END_TIMESTAMP]
         data.timestamp = data.timestamp.astype('int')
         data.drop_duplicates(cols='timestamp', take_last=True, inplace=True)
         data.index = pd.to_datetime(
@@ -102,7 +253,7 @@ class IAWE(DataSet):
         data = data.drop('timestamp', 1)
         data = data.sort_index()
         data = data.tz_convert(self.metadata['timezone'])
-        data = data[pd.Timestamp('2013-06-07'):pd.Timestamp('2014-01-01')]
+        data = data[pd.Timestamp(START_DATE):pd.Timestamp(END_DATE)]
         data = data.dropna()
         data = data.astype('float32')
 
@@ -116,30 +267,10 @@ class IAWE(DataSet):
         self.building.utility.electric.mains[
             MainsName(2, 1)].rename(columns=lambda x: column_mapping[x], inplace=True)
 
-    def add_appliances(self):
-
-        self.building.utility.electric.appliances = {}
-        for jplug in jplug_mapping:
-            print(jplug_mapping[jplug])
-            if jplug_mapping[jplug] not in self.building.utility.electric.appliances.keys():
-                self.building.utility.electric.appliances[
-                    jplug_mapping[jplug]] = query_database_jplug(self, jplug)
-
-            # Needed for appliances which are measured using multiple jPlugs at
-            # different times
-            else:
-                self.building.utility.electric.appliances[jplug_mapping[jplug]] = pd.concat(
-                    [self.building.utility.electric.appliances[jplug_mapping[jplug]], query_database_jplug(self, jplug)])
-
-            # Sort values
-            self.building.utility.electric.appliances[
-                jplug_mapping[jplug]] = self.building.utility.electric.appliances[
-                jplug_mapping[jplug]].sort_index()
-
-        # Renaming measurements of columns
-        for appliance in self.building.utility.electric.appliances.keys():
-            self.building.utility.electric.appliances[appliance] = self.building.utility.electric.appliances[
-                appliance].rename(columns=lambda x: column_mapping[x])
+    def add_appliances(self, chunksize=FETCH_CHUNKSIZE):
+        self.building.utility.electric.appliances = load_jplugs(
+            self._connection('jplug'), self.metadata['timezone'],
+            chunksize=chunksize)
 
         # Adding motor data which was collected using Current Cost
         df = pd.read_csv('/home/nipun/Copy/motor_data_complete.csv',
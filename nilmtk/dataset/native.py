@@ -0,0 +1,194 @@
+"""nilmtk's native, memory-mapped on-disk format.
+
+Each channel is stored in its own directory as raw binary arrays:
+
+    timestamps.int64 : UTC timestamps in nanoseconds, shape (n_rows,)
+    values.float32 : one column per measurement, shape (n_rows, n_columns),
+        C-order
+    channel.json : the channel name, column names, number of rows and
+        timezone
+
+Loading a channel maps these files into memory with `numpy.memmap` and
+wraps them in a DataFrame without copying the values.  Several processes
+which load the same channels share one copy in the OS page cache, and
+there is nothing to parse or decompress.  Channels are mapped
+copy-on-write, so modifying a loaded DataFrame never modifies the files.
+
+A dataset is laid out like nilmtk's CSV format:
+
+    <directory>/metadata.json
+    <directory>/building_<n>/metadata.json
+    <directory>/building_<n>/utility/electric/<mains|circuits|appliances>/<channel>/
+"""
+
+from __future__ import print_function, division
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+from nilmtk.building import Building
+from nilmtk.sensors.electricity import MainsName, CircuitName, ApplianceName
+from nilmtk.dataset.catalog import column_from_json
+
+ELECTRICITY_DICTS = ['mains', 'circuits', 'appliances']
+CHANNEL_NAME_TYPES = {'mains': MainsName,
+                      'circuits': CircuitName,
+                      'appliances': ApplianceName}
+TIMESTAMPS_FILENAME = 'timestamps.int64'
+VALUES_FILENAME = 'values.float32'
+CHANNEL_METADATA_FILENAME = 'channel.json'
+
+
+def write_channel(path, df, channel_name=None, extra_metadata=None):
+    """Writes a single channel in the native format.
+
+    Parameters
+    ----------
+    path : string
+        Directory to write to.  Created if it does not exist.
+    df : pandas.DataFrame
+        Values are converted to float32.
+    channel_name : MainsName, CircuitName or ApplianceName, optional
+    extra_metadata : dict, optional
+        Any extra (JSON-serialisable) fields to store in channel.json
+    """
+    if not os.path.exists(path):
+        os.makedirs(path)
+    df.index.asi8.astype(np.int64).tofile(
+        os.path.join(path, TIMESTAMPS_FILENAME))
+    np.ascontiguousarray(df.values, dtype=np.float32).tofile(
+        os.path.join(path, VALUES_FILENAME))
+
+    metadata = {'channel_name': channel_name,
+                'columns': list(df.columns),
+                'n_rows': len(df),
+                'timezone': None if df.index.tz is None else str(df.index.tz)}
+    if extra_metadata:
+        metadata.update(extra_metadata)
+    with open(os.path.join(path, CHANNEL_METADATA_FILENAME), 'w') as fp:
+        fp.write(json.dumps(metadata))
+
+
+def read_channel_metadata(path):
+    """Returns the dict stored in `path/channel.json`."""
+    with open(os.path.join(path, CHANNEL_METADATA_FILENAME), 'r') as fp:
+        return json.loads(fp.read())
+
+
+def read_channel(path, mode='c'):
+    """Maps a single channel into memory.
+
+    Parameters
+    ----------
+    path : string
+        Directory written by `write_channel`.
+    mode : {'c', 'r'}, optional
+        Passed to `numpy.memmap`.  Defaults to 'c' (copy-on-write).
+
+    Returns
+    -------
+    pandas.DataFrame whose values are backed by the file on disk.
+    """
+    metadata = read_channel_metadata(path)
+    columns = [column_from_json(column) for column in metadata['columns']]
+    n_rows = metadata['n_rows']
+    if n_rows == 0:
+        # numpy.memmap can't map empty files
+        timestamps = np.empty(0, dtype=np.int64)
+        values = np.empty((0, len(columns)), dtype=np.float32)
+    else:
+        timestamps = np.memmap(os.path.join(path, TIMESTAMPS_FILENAME),
+                               dtype=np.int64, mode=mode, shape=(n_rows,))
+        values = np.memmap(os.path.join(path, VALUES_FILENAME),
+                           dtype=np.float32, mode=mode,
+                           shape=(n_rows, len(columns)))
+
+    index = pd.DatetimeIndex(timestamps.view('M8[ns]'))
+    if metadata['timezone'] is not None:
+        index = index.tz_localize('UTC').tz_convert(metadata['timezone'])
+    return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+
+def _channel_directory(channel_name):
+    """Directory name for a channel, e.g. 'fridge_1' or '1_1'."""
+    return '_'.join(str(field) for field in channel_name)
+
+
+def is_native(df):
+    """True if `df` can be written by `write_channel` without changing
+    its dtypes, i.e. if every column is float32."""
+    return all(dtype == np.float32 for dtype in df.dtypes)
+
+
+def export_electricity(electric, path, channels=None):
+    """Writes electricity channels to `path/utility/electric/`.
+
+    Parameters
+    ----------
+    electric : nilmtk.sensors.electricity.Electricity
+    path : string
+    channels : list of (dict_name, channel_name) tuples, optional
+        Only write these channels.  Defaults to all channels.
+    """
+    if channels is None:
+        channels = [(dict_name, channel_name)
+                    for dict_name in ELECTRICITY_DICTS
+                    for channel_name in getattr(electric, dict_name)]
+    for dict_name, channel_name in channels:
+        channel_path = os.path.join(path, 'utility', 'electric', dict_name,
+                                    _channel_directory(channel_name))
+        write_channel(channel_path, getattr(electric, dict_name)[channel_name],
+                      channel_name)
+
+
+def load_electricity(path, electric, mode='c'):
+    """Maps all channels written by `export_electricity` into memory and
+    adds them to `electric`."""
+    for dict_name in ELECTRICITY_DICTS:
+        dict_path = os.path.join(path, 'utility', 'electric', dict_name)
+        if not os.path.isdir(dict_path):
+            continue
+        for channel_dir in sorted(os.listdir(dict_path)):
+            channel_path = os.path.join(dict_path, channel_dir)
+            channel_name = read_channel_metadata(channel_path)['channel_name']
+            channel_name = CHANNEL_NAME_TYPES[dict_name](*channel_name)
+            getattr(electric, dict_name)[channel_name] = read_channel(
+                channel_path, mode=mode)
+
+
+def export_building(building, path):
+    """Writes all electricity channels of `building` to `path`."""
+    if not os.path.exists(path):
+        os.makedirs(path)
+    with open(os.path.join(path, 'metadata.json'), 'w') as fp:
+        fp.write(json.dumps(building.metadata, default=str))
+    export_electricity(building.utility.electric, path)
+
+
+def load_building(path, mode='c'):
+    """Maps all channels written by `export_building` into memory.
+
+    Returns
+    -------
+    nilmtk.building.Building
+    """
+    building = Building()
+    metadata_filename = os.path.join(path, 'metadata.json')
+    if os.path.isfile(metadata_filename):
+        with open(metadata_filename, 'r') as fp:
+            building.metadata = json.loads(fp.read())
+    load_electricity(path, building.utility.electric, mode=mode)
+    return building
+
+
+def building_directories(directory):
+    """Returns a dict mapping building numbers (ints) to directories
+    inside a dataset written in the native format."""
+    pattern = re.compile('building_([0-9]+)$')
+    directories = {}
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match and os.path.isdir(os.path.join(directory, name)):
+            directories[int(match.group(1))] = os.path.join(directory, name)
+    return directories
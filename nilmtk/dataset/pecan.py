@@ -19,7 +19,10 @@ TODOS
 4. Handle Gen
 """
 
+from __future__ import print_function, division
+import numpy as np
 import pandas as pd
+from multiprocessing.pool import ThreadPool
 from nilmtk.dataset import DataSet
 from nilmtk.building import Building
 from nilmtk.utils import get_immediate_subdirectories
@@ -27,7 +30,16 @@ from nilmtk.sensors.electricity import Measurement
 from nilmtk.sensors.electricity import ApplianceName
 from nilmtk.sensors.electricity import MainsName
 import os
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+
+# Power is recorded in kW (or kVA); nilmtk uses W (or VA)
+KW_TO_W = 1e3
+
+MAINS_COLUMNS = {'use [kW]': (Measurement('power', 'active'), KW_TO_W),
+                 'LEG1V [V]': (Measurement('voltage', ''), 1)}
+
+# TODO: See what to do with these columns
+DROPPED_COLUMNS = ['LEG2V [V]', 'gen [kW]', 'Grid [kW]', 'Grid* [kVA]']
 
 # Mapping between appliances actual name
 appliance_name_mapping = {
@@ -75,6 +87,73 @@ appliance_name_mapping = {
 }
 
 
+# Schema maps are cached by column names because most spreadsheets share
+# the same header
+_schema_maps = {}
+
+
+def _standard_column_name(column):
+    """e.g. 'Air1 [kW]' -> 'air1_active', 'Refrigerator1* [kVA]' ->
+    'refrigerator1_apparent'"""
+    return (column.lower().replace(" ", "_")
+            .replace("[kw]", "active").replace("[kva]", "apparent")
+            .replace("*", ""))
+
+
+def schema_map(columns):
+    """Precomputes how to convert the columns of a Pecan spreadsheet into
+    nilmtk channels.
+
+    Mains power and voltage become MainsName(1, 1).  Every other column
+    is named '<appliance><n> [kW]' or '<appliance><n> [kVA]'; appliances
+    are numbered, in column order, by their standard name.  Columns of
+    unknown appliances are dropped.
+
+    Parameters
+    ----------
+    columns : list of strings
+
+    Returns
+    -------
+    list of (dict_name, channel_name, positions, measurements, scales)
+    tuples where `dict_name` is 'mains' or 'appliances', `positions` are
+    indices into `columns` and `scales` convert each column to nilmtk's
+    units.
+    """
+    columns = tuple(columns)
+    if columns in _schema_maps:
+        return _schema_maps[columns]
+
+    mains = ([], [], [])
+    appliances = OrderedDict()
+    for position, column in enumerate(columns):
+        if column in MAINS_COLUMNS:
+            measurement, scale = MAINS_COLUMNS[column]
+            for field, value in zip(mains, (position, measurement, scale)):
+                field.append(value)
+        elif column not in DROPPED_COLUMNS:
+            appliance, measurement_type = (
+                _standard_column_name(column).split("_")[:2])
+            if appliance[:-1] in appliance_name_mapping:
+                appliances.setdefault(appliance, []).append(
+                    (position, Measurement('power', measurement_type)))
+
+    schema = [('mains', MainsName(1, 1)) + mains]
+    appliance_count = defaultdict(int)
+    for appliance, fields in appliances.iteritems():
+        appliance_name = appliance_name_mapping[appliance[:-1]]
+        appliance_count[appliance_name] += 1
+        positions, measurements = zip(*fields)
+        schema.append(('appliances',
+                       ApplianceName(appliance_name,
+                                     appliance_count[appliance_name]),
+                       list(positions), list(measurements),
+                       [KW_TO_W] * len(positions)))
+
+    _schema_maps[columns] = schema
+    return schema
+
+
 class Pecan(DataSet):
 
     def __init__(self):
@@ -88,12 +167,18 @@ class Pecan(DataSet):
                      '-university-researchers/']
         }
 
-    def load(self, root_directory):
-        """Load entire dataset into memory"""
-        building_names = self.load_building_names(root_directory)
-        print (building_names)
-        for building_name in building_names:
-            self.load_building(root_directory, building_name)
+    def load(self, root_directory, n_jobs=1, **args):
+        """Load entire dataset into memory
+
+        Parameters
+        ----------
+        root_directory : string
+        n_jobs : int, optional
+            Number of worker processes.  See `DataSet.load`.
+        **args : key word arguments, optional
+            passed to load_building
+        """
+        super(Pecan, self).load(root_directory, n_jobs=n_jobs, **args)
 
     def add_mains(self, building, df):
         # Find columns containing mains in them
@@ -122,104 +207,20 @@ class Pecan(DataSet):
         return building
 
     def standardize(self, df, building):
-
-        # Converting power from kW to W
-        # Note some homes contain Voltage as well, need to multiply that
-        # back with 1e3
-        df = df * 1e3
-
-        # Convert to standard appliance names
-        # 1. Mains is use [kW]; replace space with mains_0_active
-        # 2. If voltage is present, rename the column and divide it by 1e3
-        # 3. If 'gen' is present, delete the column; TODO think about where
-        # to put this column
-        # 4. Delete 'Grid' column; TODO same as #3
-        # 5. Lower case all appliance names
-        # 6 Replace " " with "_" in appliance name
-        # 7. Appliance names should have separate active and apparent fields
-        # (have a *)
-
-        # 1
-        df = df.rename(columns={'use [kW]': Measurement('power', 'active')})
-        print df.columns
-
-        # Adding Mains Power
-        building.utility.electric.mains = {}
-        building.utility.electric.mains[
-            MainsName(1, 1)] = df[[Measurement('power', 'active')]]
-        df = df.drop(Measurement('power', 'active'), 1)
-
-        # 2
-        if "LEG1V [V]" in df.columns:
-            df = df.rename(columns={"LEG1V [V]": Measurement('voltage', '')})
-
-            # Adding voltage if it exists
-            building.utility.electric.mains[
-                MainsName(1, 1)][Measurement('voltage', '')] = df[Measurement('voltage', '')] / 1e3
-            df = df.drop(Measurement('voltage', ''), 1)
-            '''For now delete leg2
-            df = df.rename(columns=lambda x: x.replace("LEG2V [V]",
-                                                       "mains_2_voltage"))            
-            df['mains_2_voltage'] = df['mains_2_voltage'] / 1e3'''
-
-            # TODO: See what to do with this bit of information
-            df = df.drop('LEG2V [V]', 1)
-
-        # 3
-        if "gen [kW]" in df.columns:
-            df = df.drop('gen [kW]', 1)
-
-        # 4
-        if 'Grid [kW]' in df.columns:
-            df = df.drop('Grid [kW]', 1)
-        if "Grid* [kVA]" in df.columns:
-            df = df.drop('Grid* [kVA]', 1)
-
-        # 5
-        df = df.rename(columns=lambda x: x.lower())
-
-        # 6
-        df = df.rename(columns=lambda x: x.replace(" ", "_"))
-
-        # 7
-        df = df.rename(columns=lambda x: x.replace("[kw]", "active"))
-        df = df.rename(columns=lambda x: x.replace("[kva]", "apparent"))
-        df = df.rename(columns=lambda x: x.replace("*", ""))
-
-        # List of appliance names
-        appliance_names = list(set([a.split("_")[0] for a in df.columns
-                                    if type(a) != type(Measurement('power', 'active'))]))
-
-        # Adding appliances
-        building.utility.electric.appliances = {}
-        building_appliance_count = defaultdict(int)
-        for appliance in appliance_names:
-            # Finding headers corresponding to the appliance
-            names = [x for x in df.columns if x.split("_")[0] == appliance]
-
-            names_modified = [Measurement('power', x.split("_")[1])
-                              for x in names]
-            name_modification = {names[i]: names_modified[i] for i in range(len(names))}
-
-            # TODO: Replace column names and remove the appliance name from
-            # them
-            if appliance[:-1] in appliance_name_mapping.keys():
-                appliance_name = appliance_name_mapping[appliance[:-1]]
-                building_appliance_count[appliance_name] += 1
-                appliance_instance = building_appliance_count[appliance_name]
-                building.utility.electric.appliances[
-                    ApplianceName(appliance_name, appliance_instance)] = df[names]
-                building.utility.electric.appliances[
-                    ApplianceName(appliance_name, appliance_instance)] = building.utility.electric.appliances[
-                    ApplianceName(appliance_name, appliance_instance)].rename(columns=name_modification)
-
-                building.utility.electric.appliances[
-                    ApplianceName(appliance_name, appliance_instance)] = building.utility.electric.appliances[
-                    ApplianceName(appliance_name, appliance_instance)].astype('float32')
-            building.utility.electric.mains[
-                MainsName(1, 1)] = building.utility.electric.mains[
-                MainsName(1, 1)].astype('float32')
-
+        """Splits `df` into mains and appliance channels using
+        `schema_map`.  Values are converted to float32 once and each
+        channel is then built, scaled in place, from its own columns."""
+        values = np.asarray(df.values, dtype=np.float32)
+        electric = building.utility.electric
+        electric.mains = {}
+        electric.appliances = {}
+        for (dict_name, channel_name, positions, measurements,
+             scales) in schema_map(df.columns):
+            channel_values = values[:, positions]
+            channel_values *= np.asarray(scales, dtype=np.float32)
+            getattr(electric, dict_name)[channel_name] = pd.DataFrame(
+                channel_values, index=df.index, columns=measurements,
+                copy=False)
         return building
 
 
@@ -258,9 +259,15 @@ class Pecan_1min(Pecan):
             'urls': ['http://www.pecanstreet.org/']
         }
 
-    def load_building(self, root_directory, building_name):
-        ''' Loads electrical data for specified building
-        '''
+    def load_building(self, root_directory, building_name, max_workers=None):
+        """Loads electrical data for specified building
+
+        Parameters
+        ----------
+        max_workers : int, optional
+            Number of threads used to parse day files concurrently.
+            Defaults to None (parse one file at a time).
+        """
 
         # Each building has a week worth data
         # Files are named as follows:
@@ -268,13 +275,24 @@ class Pecan_1min(Pecan):
         # Pattern building_name + "_1min_2012-09" + ['03'-'09'].xlsx
 
         building_folder = os.path.join(root_directory, '1_min', building_name)
-        df = pd.DataFrame()
-        for day in ["03", "04", "05", "06", "07", "08", "09"]:
-            spreadsheet = pd.ExcelFile(os.path.join(building_folder,
-                                                    "%s_1min_2012-09%s.xlsx" % (building_name, day)))
-            temp_df = spreadsheet.parse(
-                'Sheet1', index_col=0, date_parser=True)
-            df = df.append(temp_df)
+        filenames = [os.path.join(building_folder,
+                                  "%s_1min_2012-09%s.xlsx" % (building_name, day))
+                     for day in ["03", "04", "05", "06", "07", "08", "09"]]
+
+        def parse(filename):
+            spreadsheet = pd.ExcelFile(filename)
+            return spreadsheet.parse('Sheet1', index_col=0, date_parser=True)
+
+        if max_workers is None or max_workers <= 1:
+            dfs = [parse(filename) for filename in filenames]
+        else:
+            pool = ThreadPool(max_workers)
+            try:
+                dfs = pool.map(parse, filenames)
+            finally:
+                pool.close()
+                pool.join()
+        df = pd.concat(dfs)
 
         building = Building()
 
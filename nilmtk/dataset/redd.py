@@ -2,11 +2,15 @@ from __future__ import print_function, division
 import re
 import os
 import datetime
+import io
 import sys
+import shutil
 import pandas as pd
 import numpy as np
 from collections import namedtuple
+from multiprocessing.pool import ThreadPool
 from nilmtk.dataset import DataSet
+from nilmtk.dataset import native
 from nilmtk.utils import get_immediate_subdirectories
 from nilmtk.building import Building
 from nilmtk.sensors.electricity import MainsName, Measurement, ApplianceName, DualSupply
@@ -29,11 +33,65 @@ APPLIANCE_NAME_MAP = {
 # TODO: 
 # Check that these dualsupply==True appliances really are dualsupply!
 
+# When loading a time range, load_chan also loads this many seconds
+# either side of the range
+TIME_RANGE_MARGIN = 60 * 60 * 24
+
+# load_chan caches each parsed file in a directory named <filename> + SIDECAR_SUFFIX
+SIDECAR_SUFFIX = '.nilmtk'
+
 # maps from house number to a list of dud REDD channel numbers
 DUD_CHANNELS = {1: [19]}
 
+def _sidecar_path(filename, usecols):
+    """Returns the directory used to cache `filename` in nilmtk's native
+    format, e.g. 'channel_1.dat.nilmtk/all_columns'."""
+    if usecols:
+        subdirectory = 'usecols_' + '_'.join(str(col) for col in usecols)
+    else:
+        subdirectory = 'all_columns'
+    return os.path.join(filename + SIDECAR_SUFFIX, subdirectory)
+
+
+def _sidecar_key(filename, usecols, sep):
+    """Describes the source file.  The sidecar is only valid if this
+    has not changed."""
+    stat = os.stat(filename)
+    return {'source_size': stat.st_size,
+            'source_mtime': stat.st_mtime,
+            'usecols': list(usecols) if usecols else None,
+            'sep': sep}
+
+
+def _load_sidecar(filename, usecols, sep):
+    """Returns the cached DataFrame for `filename` or None if there is no
+    valid cache."""
+    path = _sidecar_path(filename, usecols)
+    try:
+        metadata = native.read_channel_metadata(path)
+    except (IOError, OSError, ValueError):
+        return None
+    key = _sidecar_key(filename, usecols, sep)
+    if any(metadata.get(field) != value for field, value in key.iteritems()):
+        return None
+    return native.read_channel(path)
+
+
+def _write_sidecar(filename, usecols, sep, df):
+    """Caches `df` next to `filename`.  Failing to write the cache (e.g.
+    because the dataset is on a read-only file system) is not an error."""
+    path = _sidecar_path(filename, usecols)
+    try:
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        native.write_channel(path, df,
+                             extra_metadata=_sidecar_key(filename, usecols, sep))
+    except (IOError, OSError) as e:
+        print('Could not write cache', path, ':', str(e), '...', end='')
+
+
 def load_chan(building_dir, chan=None, filename=None, colnames=None, 
-              usecols=None, sep=' '):
+              usecols=None, sep=' ', cache=True, start=None, end=None):
     """Loads CSV files where the first column is a UNIX timestamp, 
     like REDD or UKPD CSV files.
 
@@ -54,6 +112,23 @@ def load_chan(building_dir, chan=None, filename=None, colnames=None,
         will run `usecols.insert(0,0)` to load the index column.
     sep : character, optional
         Defaults to ' '
+    cache : boolean, optional
+        Defaults to True.  If True then, after parsing the file, save a
+        binary copy in nilmtk's native format in a sidecar directory
+        named `<filename>.nilmtk`.  Later calls memory-map the sidecar
+        instead of parsing the file again, as long as the size and
+        modification time of the file haven't changed.
+        See `nilmtk.dataset.native`.
+    start, end : string or datetime, optional
+        Only load (roughly) this time range.  The file must be sorted
+        (roughly) by timestamp.  Instead of parsing the whole file,
+        binary search the file for the byte offsets of the first and
+        last lines in the range and only parse the lines in between.
+        Naive times are treated as UTC.  To allow for timezones and
+        for files which are not perfectly sorted, up to
+        `TIME_RANGE_MARGIN` seconds either side of the range are also
+        loaded, so crop the DataFrame to the exact range afterwards.
+        The sidecar cache is only written if the whole file is loaded.
 
     Returns 
     -------
@@ -76,25 +151,204 @@ def load_chan(building_dir, chan=None, filename=None, colnames=None,
             colnames.insert(0, 'index')
         print("Only using columns", usecols, '...', end='')
     sys.stdout.flush()
+
+    lower_bound = None if start is None else _to_epoch(start) - TIME_RANGE_MARGIN
+    upper_bound = None if end is None else _to_epoch(end) + TIME_RANGE_MARGIN
+    whole_file = start is None and end is None
+    # The names of the columns of the returned DataFrame.  If there are
+    # more `colnames` than `usecols` then `colnames` names every column
+    # in the file and `usecols` picks some of them.
+    if usecols and len(colnames) > len(usecols):
+        columns = [colnames[i] for i in sorted(usecols)]
+    else:
+        columns = list(colnames)
+    columns = [colname for colname in columns if colname != 'index']
+
+    if cache:
+        df = _load_sidecar(filename, usecols, sep)
+        if df is not None:
+            print('done (from cache).')
+            df.columns = columns
+            if not whole_file:
+                timestamps = df.index.asi8 / 1E9
+                mask = np.ones(len(df), dtype=bool)
+                if lower_bound is not None:
+                    mask &= timestamps >= lower_bound
+                if upper_bound is not None:
+                    mask &= timestamps <= upper_bound
+                df = df[mask]
+            return df
+
     # Don't use date_parser with pd.read_csv.  Instead load it all
     # and then convert to datetime.  Thanks to Nipun for linking to
     # this discussion where jreback gives this tip:
     # https://github.com/pydata/pandas/issues/3757
+    dtype = {colname:np.float32 for colname in columns}
     try:
-        df = pd.read_csv(filename, sep=sep, header=None, index_col=0,
-                         parse_dates=False, names=colnames, usecols=usecols,
-                         dtype={colname:np.float32 for colname in colnames
-                                if colname != 'index'},
-                         tupleize_cols=True)
+        if whole_file:
+            source = filename
+        else:
+            source = _read_byte_range(filename, lower_bound, upper_bound, sep)
+        if source is None:
+            # No lines in the requested time range
+            df = pd.DataFrame(np.empty((0, len(columns)), dtype=np.float32),
+                              columns=columns,
+                              index=pd.Index([], dtype=np.float64))
+        else:
+            df = pd.read_csv(source, sep=sep, header=None, index_col=0,
+                             parse_dates=False, names=colnames, usecols=usecols,
+                             dtype=dtype, tupleize_cols=True)
     except Exception as e:
         print('failed:', str(e))
         raise
     else:
-        print('done.')
         df.index = pd.to_datetime((df.index.values*1E9).astype(int), utc=True)
+        if cache and whole_file:
+            _write_sidecar(filename, usecols, sep, df)
+        print('done.')
     return df
 
 
+def _to_epoch(timestamp):
+    """Converts anything `pd.Timestamp` understands into UNIX seconds.
+    Naive times are treated as UTC."""
+    return pd.Timestamp(timestamp).value / 1E9
+
+
+def _line_at_or_after(fh, offset, sep):
+    """Returns (byte offset, timestamp) of the first line which starts
+    at or after `offset` or (None, None) at the end of the file."""
+    fh.seek(offset)
+    if offset > 0:
+        # Skip to the start of the next line.  If `offset` is already
+        # at the start of a line then the previous byte is a newline.
+        fh.seek(offset - 1)
+        fh.readline()
+    line_offset = fh.tell()
+    line = fh.readline()
+    while line and not line.strip():
+        # skip blank lines
+        line_offset = fh.tell()
+        line = fh.readline()
+    if not line:
+        return None, None
+    return line_offset, float(line.split(sep, 1)[0])
+
+
+def find_byte_offset(fh, timestamp, sep=' ', block_size=2**16):
+    """Binary searches a file of lines sorted by timestamp (in the first
+    column) for the first line whose timestamp is >= `timestamp`.
+
+    Parameters
+    ----------
+    fh : file opened in binary mode
+    timestamp : float
+        UNIX seconds
+    sep : character, optional
+    block_size : int, optional
+        Stop the binary search and scan lines once the range of
+        candidate offsets is smaller than this.
+
+    Returns
+    -------
+    int: byte offset of the start of that line, or the size of the file
+    if there is no such line.
+    """
+    fh.seek(0, os.SEEK_END)
+    file_size = fh.tell()
+
+    # Invariants: `low` is 0 or the start of a line before `timestamp`.
+    # The first line at or after `high` is at or after `timestamp`
+    # (or `high` is the end of the file).
+    low, high = 0, file_size
+    while high - low > block_size:
+        middle = (low + high) // 2
+        line_offset, line_timestamp = _line_at_or_after(fh, middle, sep)
+        if line_offset is None or line_offset >= high:
+            high = middle
+        elif line_timestamp < timestamp:
+            low = line_offset
+        else:
+            high = middle
+
+    offset = low
+    while True:
+        line_offset, line_timestamp = _line_at_or_after(fh, offset, sep)
+        if line_offset is None:
+            return file_size
+        if line_timestamp >= timestamp:
+            return line_offset
+        fh.seek(line_offset)
+        fh.readline()
+        offset = fh.tell()
+
+
+def _read_byte_range(filename, lower_bound, upper_bound, sep):
+    """Returns a file-like object holding the lines of `filename` with
+    timestamps between `lower_bound` and `upper_bound` (UNIX seconds,
+    either can be None), or None if there are no such lines."""
+    with open(filename, 'rb') as fh:
+        if lower_bound is None:
+            start_offset = 0
+        else:
+            start_offset = find_byte_offset(fh, lower_bound, sep)
+        if upper_bound is None:
+            fh.seek(0, os.SEEK_END)
+            end_offset = fh.tell()
+        else:
+            # Include lines with timestamps == upper_bound
+            end_offset = find_byte_offset(fh, np.nextafter(upper_bound, np.inf),
+                                          sep)
+        if end_offset <= start_offset:
+            return None
+        fh.seek(start_offset)
+        return io.BytesIO(fh.read(end_offset - start_offset))
+
+
+def load_chans(building_dir, chans, max_workers=None, process=None):
+    """Loads several channels, optionally in parallel.
+
+    Parameters
+    ----------
+    building_dir : string
+        The base path
+    chans : list of dicts
+        Each dict holds keyword arguments for `load_chan`, e.g.
+        [{'chan': 1}, {'filename': 'mains.dat', 'usecols': [1, 2]}]
+    max_workers : int, optional
+        Number of threads used to parse channels concurrently.  The
+        pandas CSV parser spends most of its time outside the GIL so
+        threads scale with the number of cores.  Defaults to None,
+        which loads channels one at a time.
+    process : function, optional
+        Applied to each DataFrame (e.g. to crop it) as soon as it has
+        been loaded, so that only the processed DataFrames are kept in
+        memory until every channel has been loaded.
+
+    Returns
+    -------
+    list of DataFrames, in the same order as `chans`.
+    """
+    def load(kwargs):
+        # load_chan modifies `colnames` and `usecols` in place so give
+        # each call its own copy
+        kwargs = dict(kwargs)
+        for key in ['colnames', 'usecols']:
+            if kwargs.get(key) is not None:
+                kwargs[key] = list(kwargs[key])
+        df = load_chan(building_dir, **kwargs)
+        return df if process is None else process(df)
+
+    if max_workers is None or max_workers <= 1:
+        return [load(kwargs) for kwargs in chans]
+    pool = ThreadPool(max_workers)
+    try:
+        return pool.map(load, chans)
+    finally:
+        pool.close()
+        pool.join()
+
+
 def load_labels(data_dir):
     """Loads data from labels.dat file.
 
@@ -142,7 +396,14 @@ class REDD(DataSet):
         df = df.tz_convert(self.metadata['timezone'])
         return df
 
-    def load_building(self, root_directory, building_name):
+    def load_building(self, root_directory, building_name, max_workers=None):
+        """
+        Parameters
+        ----------
+        max_workers : int, optional
+            Number of threads used to load channels concurrently.
+            Defaults to None (load channels one at a time).
+        """
         # Construct new Building and set known attributes
         building = Building()
         building.metadata['original_name'] = building_name
@@ -180,14 +441,12 @@ class REDD(DataSet):
             else:
                 appliance_chans.append(chan)
 
-        # Load mains chans
-        for mains_chan in mains_chans:
-            mainsname = MainsName(split=mains_chan, meter=1)
-            df = load_chan(building_dir, mains_chan, colnames=[Measurement('power', 'apparent')])
-            df = self._pre_process_dataframe(df)
-            building.utility.electric.mains[mainsname] = df
-
-        # Load sub metered channels
+        # Work out the name and column of every channel
+        mains_names = [MainsName(split=mains_chan, meter=1)
+                       for mains_chan in mains_chans]
+        mains_colname = Measurement('power', 'apparent')
+        appliance_names = []
+        appliance_colnames = []
         instances = {} 
         # instances is a dict which maps:
         # {<'appliance name'>: 
@@ -197,29 +456,46 @@ class REDD(DataSet):
             # Get appliance label and instance
             label = labels[appliance_chan]
             instance, supply = instances.get(label, (1,1))
-            appliancename = ApplianceName(name=label, instance=instance)
+            appliance_names.append(ApplianceName(name=label, instance=instance))
             metadata = appliance_metadata.get(label)
             is_dualsupply = metadata and metadata.get('dualsupply')
             if is_dualsupply:
-                colname = DualSupply(measurement, supply)
-                df = load_chan(building_dir, appliance_chan, colname)
-                df = self._pre_process_dataframe(df)
-                df[colname].name = appliancename
+                appliance_colnames.append(DualSupply(measurement, supply))
                 if supply == 1:
-                    building.utility.electric.appliances[appliancename] = df
                     instances[label] = (instance, supply + 1)
                 else:
-                    building.utility.electric.appliances[appliancename] = \
-                     building.utility.electric.appliances[appliancename].join(df)
                     instances[label] = (instance + 1, 1)
             else:
                 # This is not a DualSupply appliance
                 instances[label] = (instance + 1, 1)
-                colname = measurement
-                df = load_chan(building_dir, appliance_chan, colnames=[colname])
-                df = self._pre_process_dataframe(df)
-                df[colname].name = appliancename
-                building.utility.electric.appliances[appliancename] = df
+                appliance_colnames.append(measurement)
+
+        # Load all channels
+        chans = ([{'chan': mains_chan, 'colnames': [mains_colname]}
+                  for mains_chan in mains_chans] +
+                 [{'chan': appliance_chan, 'colnames': [colname]}
+                  for appliance_chan, colname
+                  in zip(appliance_chans, appliance_colnames)])
+        dfs = load_chans(building_dir, chans, max_workers=max_workers,
+                         process=self._pre_process_dataframe)
+        mains_dfs = dfs[:len(mains_chans)]
+        appliance_dfs = dfs[len(mains_chans):]
+
+        # Assemble mains chans
+        for mainsname, df in zip(mains_names, mains_dfs):
+            building.utility.electric.mains[mainsname] = df
+
+        # Assemble sub metered channels, in the original order so that
+        # the two supplies of DualSupply appliances are joined
+        appliances = building.utility.electric.appliances
+        for appliancename, colname, df in zip(appliance_names,
+                                              appliance_colnames,
+                                              appliance_dfs):
+            df[colname].name = appliancename
+            if isinstance(colname, DualSupply) and colname.supply != 1:
+                appliances[appliancename] = appliances[appliancename].join(df)
+            else:
+                appliances[appliancename] = df
 
 
         # Now go through all DualSupply appliances to make sure there are two chans
@@ -3,6 +3,7 @@ import re
 import pandas as pd
 import glob
 import os
+from collections import defaultdict
 
 
 from nilmtk.sensors.electricity import CircuitName, ApplianceName, Measurement, MainsName
@@ -84,6 +85,51 @@ building_name_mapping = {
 }
 
 
+def load_csvs_grouped(list_csv, names, index_col, group_column,
+                      drop_columns):
+    """Loads CSV files one at a time and splits each file by channel.
+
+    Each file is split into groups as soon as it is loaded and only the
+    numeric columns of each group are kept, so peak memory is bounded
+    by the size of the largest single file (plus the loaded channels)
+    rather than by the size of all the raw files put together.
+
+    Parameters
+    ----------
+    list_csv : list of strings
+        Filenames.
+    names : list of strings
+        Column names of the CSV files.
+    index_col : int
+        Column holding UNIX timestamps.
+    group_column : string
+        Column which names the channel of each row.
+    drop_columns : list of strings
+        Columns to remove from each group (e.g. `group_column`).
+
+    Returns
+    -------
+    dict mapping each value of `group_column` to a DataFrame whose index
+    is a DatetimeIndex in UTC.  Rows are in file order.
+    """
+    # Maps each value of `group_column` to a list of DataFrames
+    channel_chunks = defaultdict(list)
+    for csv in list_csv:
+        df = pd.read_csv(csv, header=None, names=names, index_col=index_col)
+        # Converting the index to DatetimeIndex
+        df.index = pd.to_datetime(
+            (df.index.values * 1E9).astype(int), utc=True)
+        for name, group in df.groupby(group_column):
+            channel_chunks[name].append(group.drop(drop_columns, axis=1))
+        del df
+
+    # Concatenate one channel at a time, releasing its chunks as we go
+    channels = {}
+    for name in list(channel_chunks.keys()):
+        channels[name] = pd.concat(channel_chunks.pop(name))
+    return channels
+
+
 def load_labels(data_dir):
     """
         Uses unique entries in one of csv file to obtain labels
@@ -158,58 +204,30 @@ class Smart(DataSet):
 
         # Finding all CSVs
         list_csv = glob.glob(building_dir + '/*-circuit/*.csv')
-        # List of dataframes
-        df_list = []
-        # Iterating over all CSVs and appending to list of dataframes
-        for csv in list_csv:
-            df = pd.read_csv(csv, header=None,
-                             names=names_circuits, index_col=2)
-            # Converting the index to DatetimeIndex
-            df.index = pd.to_datetime(
-                (df.index.values * 1E9).astype(int), utc=True)
-            # Append to list of dfs
-            df_list.append(df)
-
-        # Merging all dfs
-        combined_df = pd.concat(df_list)
-
-        # Getting all the mains data
-        mains_df = combined_df[combined_df["CircuitName"] == "Grid"]
-        mains_df = self._pre_process_dataframe(mains_df)
-        building.utility.electric.mains[MainsName(1, 1)] = mains_df
-
-        # Dropping data from combined_df which contained information about
-        # mains
-        combined_df = combined_df[combined_df["CircuitName"] != "Grid"]
-
-        # Grouping circuits data
-        circuit_df_groups = combined_df.groupby('CircuitName')
-        for name, df in circuit_df_groups:
+        circuit_dfs = load_csvs_grouped(list_csv, names_circuits, 2,
+                                        'CircuitName',
+                                        ['CircuitName', 'CircuitNumber'])
+
+        # Getting all the mains data, if the building has any
+        mains_df = circuit_dfs.pop('Grid', None)
+        if mains_df is not None:
+            mains_df = self._pre_process_dataframe(mains_df)
+            building.utility.electric.mains[MainsName(1, 1)] = mains_df
+
+        # All other circuits
+        for name, df in circuit_dfs.iteritems():
             # Getting nilmtk name
             circuit_name = circuit_name_mapping(name)
             df = self._pre_process_dataframe(df)
             building.utility.electric.circuits[circuit_name] = df
+        del circuit_dfs
 
         # --------Loading data from meter------#
         list_csv = glob.glob(building_dir + '/*-meter/*.csv')
-        # List of dataframes
-        df_list = []
-        # Iterating over all CSVs and appending to list of dataframes
-        for csv in list_csv:
-            df = pd.read_csv(csv, header=None,
-                             names=names_meter, index_col=1)
-            # Converting the index to DatetimeIndex
-            df.index = pd.to_datetime(
-                (df.index.values * 1E9).astype(int), utc=True)
-            # Append to list of dfs
-            df_list.append(df)
-
-        # Merging all dfs
-        combined_df = pd.concat(df_list)
-
-        # Grouping appliance data
-        appliance_df_groups = combined_df.groupby('MeterName')
-        for name, df in appliance_df_groups:
+        appliance_dfs = load_csvs_grouped(list_csv, names_meter, 1,
+                                          'MeterName',
+                                          ['MeterName', 'CircuitNumber'])
+        for name, df in appliance_dfs.iteritems():
             print(name)
             # Getting nilmtk name
             appliance_name = find_appliance_nilmtk_name(name)
@@ -8,6 +8,7 @@ import os
 from nilmtk.sensors.electricity import ApplianceName, Measurement, MainsName
 from nilmtk.building import Building
 from nilmtk.dataset import DataSet
+from nilmtk.dataset.smart import load_csvs_grouped
 from nilmtk.utils import get_immediate_subdirectories
 
 # Get all the CSVs in that folder
@@ -110,8 +111,9 @@ class Smart(DataSet):
 
     def _drop_circuit_number(self, df):
         """Drops circuit number and name from columns"""
-        df = df.drop("CircuitNumber", 1)
-        df = df.drop("CircuitName", 1)
+        if "CircuitName" in df.columns:
+            df = df.drop("CircuitNumber", 1)
+            df = df.drop("CircuitName", 1)
         return df
 
     def load_building(self, root_directory, building_name):
@@ -124,32 +126,17 @@ class Smart(DataSet):
 
         # Finding all CSVs
         list_csv = glob.glob(building_dir + '/*-circuit/*.csv')
-        # List of dataframes
-        df_list = []
-        # Iterating over all CSVs and appending to list of dataframes
-        for csv in list_csv:
-            df = pd.read_csv(csv, header=None, names=names, index_col=2)
-            # Converting the index to DatetimeIndex
-            df.index = pd.to_datetime(
-                (df.index.values * 1E9).astype(int), utc=True)
-            # Append to list of dfs
-            df_list.append(df)
-
-        # Merging all dfs
-        combined_df = pd.concat(df_list)
-
-        # Getting all the mains data
-        mains_df = combined_df[combined_df["CircuitName"] == "Grid"]
-        mains_df = self._pre_process_dataframe(mains_df)
-        building.utility.electric.mains[MainsName(1, 1)] = mains_df
-
-        # Dropping data from combined_df which contained information about
-        # mains
-        combined_df = combined_df[combined_df["CircuitName"] != "Grid"]
-
-        # Grouping appliances data
-        appliance_df_groups = combined_df.groupby('CircuitName')
-        for name, df in appliance_df_groups:
+        dfs = load_csvs_grouped(list_csv, names, 2, 'CircuitName',
+                                ['CircuitName', 'CircuitNumber'])
+
+        # Getting all the mains data, if the building has any
+        mains_df = dfs.pop('Grid', None)
+        if mains_df is not None:
+            mains_df = self._pre_process_dataframe(mains_df)
+            building.utility.electric.mains[MainsName(1, 1)] = mains_df
+
+        # All other circuits are appliances
+        for name, df in dfs.iteritems():
             # Getting nilmtk name
             appliance_name = APPLIANCE_NAME_MAP[name]
             df = self._pre_process_dataframe(df)
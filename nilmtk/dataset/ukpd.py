@@ -10,7 +10,7 @@ from nilmtk.utils import get_immediate_subdirectories
 from nilmtk.building import Building
 from nilmtk.sensors.electricity import MainsName, Measurement, ApplianceName, DualSupply
 from nilmtk.sensors.electricity import get_dual_supply_columns
-from nilmtk.dataset.redd import load_chan, load_labels, ApplianceMetadata
+from nilmtk.dataset.redd import load_chan, load_chans, load_labels, ApplianceMetadata
 
 """
 MANUAL:
@@ -91,7 +91,8 @@ class UKPD(DataSet):
     def load_building(self, root_directory, building_name, 
                       periods_to_load=None, 
                       one_sec_mains_params_to_load=None, 
-                      downsample_one_sec_mains_rule=None):
+                      downsample_one_sec_mains_rule=None,
+                      max_workers=None):
         """
         Parameters
         ----------
@@ -107,6 +108,9 @@ class UKPD(DataSet):
             How to download the 1-second mains data, if available.
             e.g. '6S'
             if None then no downsampling will be done on the 1-sec mains data.
+        max_workers : int, optional
+            Number of threads used to load channels concurrently.
+            Defaults to None (load channels one at a time).
         """
 
         if one_sec_mains_params_to_load is None:
@@ -154,11 +158,23 @@ class UKPD(DataSet):
                     appliance_metadata[
                         nilmtk_appliance.name] = nilmtk_appliance.metadata
 
+        # load_chan only parses the part of each file around start and
+        # end.  Crop to exactly start and end in the local timezone here.
         def _pre_process_dataframe(df):
             df = df.tz_convert(self.metadata['timezone'])
             return df[start:end]
 
-        # Load 1-second mains, if available
+        # Split channels into mains and appliances
+        mains_chan = None
+        appliance_chans = []
+        for chan, label in labels.iteritems():
+            if label == 'aggregate':
+                mains_chan = chan
+            else:
+                appliance_chans.append(chan)
+
+        # Load 1-second mains, if available, and all sub metered
+        # channels, possibly in parallel
         usecols = []
         # columns in mains.dat are: index, active, apparent, voltage
         # usecols counts the index column as col 0
@@ -168,51 +184,49 @@ class UKPD(DataSet):
             usecols.append(2)
         if 'voltage' in one_sec_mains_params_to_load:
             usecols.append(3)
-        try:
-            df = load_chan(building_dir, filename='mains.dat', usecols=usecols,
-                           colnames=[Measurement('power', 'active'),
-                                     Measurement('power', 'apparent'),
-                                     Measurement('voltage', '')])
-        except IOError:
-            # some houses don't have 1-second mains
-            pass
-        else:
-            df = _pre_process_dataframe(df)
+        # some houses don't have 1-second mains
+        one_sec_mains_available = os.path.isfile(
+            os.path.join(building_dir, 'mains.dat'))
+        chans = []
+        if one_sec_mains_available:
+            chans.append({'filename': 'mains.dat', 'usecols': usecols,
+                          'colnames': [Measurement('power', 'active'),
+                                       Measurement('power', 'apparent'),
+                                       Measurement('voltage', '')],
+                          'start': start, 'end': end})
+        measurement = Measurement('power', 'active')
+        chans.extend([{'chan': appliance_chan, 'colnames': [measurement],
+                       'start': start, 'end': end}
+                      for appliance_chan in appliance_chans])
+        dfs = load_chans(building_dir, chans, max_workers=max_workers,
+                         process=_pre_process_dataframe)
+
+        if one_sec_mains_available:
+            df = dfs.pop(0)
             if downsample_one_sec_mains_rule:
                 df = df.resample(rule=downsample_one_sec_mains_rule, how='mean')
             if len(df) > MIN_SAMPLES_TO_LOAD:
                 electric.mains[MainsName(split=1, meter=1)] = df
 
-        # Split channels into mains and appliances
-        mains_chan = None
-        appliance_chans = []
-        for chan, label in labels.iteritems():
-            if label == 'aggregate':
-                mains_chan = chan
-            else:
-                appliance_chans.append(chan)
-
         # Load Current Cost mains chans (only if we haven't loaded 1sec mains)
         if mains_chan and electric.mains.get(MainsName(1,1)) is None:
             mainsname = MainsName(split=1, meter=1)
             df = load_chan(building_dir, mains_chan,
-                           colnames=[Measurement('power', 'apparent')])
+                           colnames=[Measurement('power', 'apparent')],
+                           start=start, end=end)
             df = _pre_process_dataframe(df)
             electric.mains[mainsname] = df
 
-        # Load sub metered channels
+        # Assemble sub metered channels
         instances = {}
         # instances is a dict which maps:
         # {<'appliance name'>: <index of next appliance instance>}
-        measurement = Measurement('power', 'active')
-        for appliance_chan in appliance_chans:
+        for appliance_chan, df in zip(appliance_chans, dfs):
             # Get appliance label and instance
             label = labels[appliance_chan]
             instance = instances.get(label, 1)
             appliancename = ApplianceName(name=label, instance=instance)
             instances[label] = instance + 1
-            df = load_chan(building_dir, appliance_chan, colnames=[measurement])
-            df = _pre_process_dataframe(df)
             df[measurement].name = appliancename
             if len(df) > MIN_SAMPLES_TO_LOAD:
                 electric.appliances[appliancename] = df
@@ -12,14 +12,15 @@ from nilmtk.preprocessing.electricity.single import remove_implausible_entries
 from nilmtk.preprocessing.electricity.single import filter_datetime_single
 from nilmtk.preprocessing.electricity import single
 
-from nilmtk.utils import apply_func_to_values_of_dicts
-
-from copy import deepcopy
+from nilmtk.utils import apply_func_to_values_of_dicts, copy_dicts
+from nilmtk.utils import recursive_resolve, intersect_sorted, union_sorted
 
 # Define all the dicts to which we want to apply functions within Buildings
 BUILDING_ELECTRICITY_DICTS = ['utility.electric.appliances',
                               'utility.electric.mains',
                               'utility.electric.circuits']
+APPLIANCES_AND_MAINS = ['utility.electric.appliances',
+                        'utility.electric.mains']
 
 
 def filter_contribution_less_than_x(building, x=5):
@@ -37,7 +38,7 @@ def filter_contribution_less_than_x(building, x=5):
     electricity = building.utility.electric
     contribution_df = find_appliances_contribution(electricity)
     more_than_x_df = contribution_df[contribution_df > (x * 1.0 / 100)]
-    building_copy = deepcopy(building)
+    building_copy = copy_dicts(building, ['utility.electric.appliances'])
     appliances_dict = building.utility.electric.appliances
     appliances_filtered = {appliance_name: appliance_df
                            for appliance_name, appliance_df in appliances_dict.iteritems()
@@ -61,7 +62,7 @@ def filter_top_k_appliances(building, k=5):
     """
 
     top_k = top_k_appliances(building.utility.electric, k=k).index
-    building_copy = deepcopy(building)
+    building_copy = copy_dicts(building, ['utility.electric.appliances'])
     appliances_dict = building.utility.electric.appliances
     appliances_filtered = {appliance_name: appliance_df
                            for appliance_name, appliance_df in appliances_dict.iteritems()
@@ -118,8 +119,7 @@ def prepend_append_zeros(building, start_datetime, end_datetime, freq, timezone)
     idx = idx.tz_localize('GMT').tz_convert(timezone)
 
     def reindex_fill_na(df):
-        df_copy = deepcopy(df)
-        df_copy = df_copy.reindex(idx)
+        df_copy = df.reindex(idx)
 
         power_columns = [
             x for x in df.columns if x.physical_quantity in ['power']]
@@ -139,7 +139,7 @@ def prepend_append_zeros(building, start_datetime, end_datetime, freq, timezone)
 
 
 def filter_channels_with_less_than_x_samples(building, threshold=100):
-    building_copy = deepcopy(building)
+    building_copy = copy_dicts(building, ['utility.electric.appliances'])
     for appliance_name, appliance_df in building.utility.electric.appliances.items():
         print(appliance_name, len(appliance_df.index))
         if len(appliance_df.index) < threshold:
@@ -213,7 +213,7 @@ def filter_datetime(building, start_datetime=None, end_datetime=None, copy=False
     building_copy : nilmtk.Building
     """
     if copy:
-        building_copy = deepcopy(building)
+        building_copy = copy_dicts(building, APPLIANCES_AND_MAINS)
     else:
         building_copy = building
     # Filtering appliances
@@ -264,7 +264,7 @@ def filter_out_implausible_values(building, measurement,
     ---------
     nilmtk.preprocessing.electricity.single.remove_implausible_entries"""
 
-    building_copy = deepcopy(building)
+    building_copy = copy_dicts(building, APPLIANCES_AND_MAINS)
     # Filtering appliances
     for appliance_name, appliance_df in building.utility.electric.appliances.iteritems():
         if measurement in appliance_df.columns:
@@ -289,19 +289,63 @@ def filter_out_implausible_values(building, measurement,
     return building_copy
 
 
-def make_common_index(building):
-    building_copy = deepcopy(building)
-    appliances_index = building.utility.electric.appliances.values()[0].index
+def _take_timestamps(df, timestamps, index):
+    """Returns the rows of `df` at `timestamps` (sorted int64 UTC
+    nanoseconds), re-indexed with `index`.  Rows which `df` doesn't have
+    are NaN."""
+    positions = np.searchsorted(df.index.asi8, timestamps)
+    found = df.index.asi8.take(positions, mode='clip') == timestamps
+    if found.all():
+        taken = df.take(positions)
+        taken.index = index
+        return taken
+    dtype = np.promote_types(df.values.dtype, np.float32)
+    values = np.empty((len(timestamps), len(df.columns)), dtype=dtype)
+    values.fill(np.NaN)
+    values[found] = df.values.take(positions[found], axis=0)
+    return pd.DataFrame(values, index=index, columns=df.columns, copy=False)
+
+
+def make_common_index(building, how='intersection'):
+    """Re-indexes every mains, circuit and appliance channel onto a common
+    index.
+
+    Parameters
+    ----------
+    building : nilmtk.Building
+    how : {'intersection', 'union'}, optional
+        'intersection' (the default) keeps only timestamps present in
+        every channel.  'union' keeps timestamps present in any channel;
+        missing samples become NaN.
+
+    Returns
+    -------
+    building_copy : nilmtk.Building
+    """
+    channels = [df for dict_name in BUILDING_ELECTRICITY_DICTS
+                for df in recursive_resolve(building, dict_name).values()]
+    timestamps = [df.index.asi8 for df in channels]
+    if how == 'intersection':
+        common_timestamps = intersect_sorted(timestamps)
+    elif how == 'union':
+        common_timestamps = union_sorted(timestamps)
+    else:
+        raise ValueError("how must be 'intersection' or 'union'")
+
     mains_index = building.utility.electric.mains.values()[0].index
-    freq = building.utility.electric.mains.values()[0].index.freq
-    # TODO: can the line below be replace with
-    # common_index = mains_index & appliances_index
-    # This might be a lot faster and as far as I can tell gives the same
-    # answer.
-    common_index = pd.DatetimeIndex(
-        np.sort(list(set(mains_index).intersection(set(appliances_index)))),
-        freq=freq)
-    take_common_index = lambda df: df.ix[common_index]
+    common_index = pd.DatetimeIndex(common_timestamps.view('M8[ns]'))
+    if mains_index.tz is not None:
+        common_index = common_index.tz_localize('UTC').tz_convert(
+            mains_index.tz)
+    if mains_index.freq is not None:
+        try:
+            common_index = pd.DatetimeIndex(common_index,
+                                            freq=mains_index.freq)
+        except ValueError:
+            pass  # the common index doesn't conform to the frequency
+
+    take_common_index = lambda df: _take_timestamps(df, common_timestamps,
+                                                    common_index)
     return apply_func_to_values_of_dicts(building, take_common_index,
                                          BUILDING_ELECTRICITY_DICTS)
 
@@ -350,6 +394,8 @@ def mask_appliances_with_mains(electricity, sample_period_multiplier=4):
         """
         print(".", end='')
         sys.stdout.flush()
+        # Don't modify the DataFrame shared with `electricity`
+        appliance_df = appliance_df.copy()
         for gap_start, gap_end in zip(gap_starts, gap_ends):
             index = appliance_df.index
             try:
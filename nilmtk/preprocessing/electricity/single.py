@@ -3,7 +3,6 @@
 from __future__ import print_function, division
 import numpy as np
 import pandas as pd
-from copy import deepcopy
 
 from nilmtk.stats.electricity.single import get_sample_period
 from nilmtk.sensors.electricity import Measurement
@@ -86,37 +85,39 @@ def insert_zeros(single_appliance_dataframe,
         sample_period = int(round(sample_period))
 
     max_sample_period = sample_period * sample_period_multiplier
+    sample_period_ns = np.int64(sample_period * 1E9)
 
-    # Drop NaNs (because we want those to be gaps in the index)
-    df = single_appliance_dataframe.dropna()
+    original = single_appliance_dataframe
+    if not original.index.is_monotonic:
+        original = original.sort_index()
+    original_timestamps = original.index.asi8
+    original_values = original.values
 
-    # Get the length of time between each pair of consecutive samples. Seconds.
-    timedeltas = np.diff(df.index.values) / np.timedelta64(1, 's')
-    gaps_mask = timedeltas > max_sample_period
-    readings_before_gaps = df[:-1][gaps_mask]
-    readings_after_gaps = df[1:][gaps_mask]
+    # Ignore rows with NaNs (because we want those to be gaps in the index)
+    valid_rows = np.flatnonzero(~pd.isnull(original_values).any(axis=1))
+    valid_timestamps = original_timestamps[valid_rows]
 
-    # we only add a 0 if the recorded value just before the gap is > 0
-    readings_before_gaps = readings_before_gaps[
-        readings_before_gaps.sum(axis=1) > 0]
+    # Find gaps between consecutive valid samples
+    gaps = np.flatnonzero(np.diff(valid_timestamps) >
+                          max_sample_period * 1E9)
+    rows_before_gaps = valid_rows[gaps]
+    rows_after_gaps = valid_rows[gaps + 1]
 
-    readings_after_gaps = readings_after_gaps[
-        readings_after_gaps.sum(axis=1) > 0]
+    # we only add a 0 if the recorded value just before the gap is > 0
+    rows_before_gaps = rows_before_gaps[
+        original_values[rows_before_gaps].sum(axis=1) > 0]
+    rows_after_gaps = rows_after_gaps[
+        original_values[rows_after_gaps].sum(axis=1) > 0]
 
     # Find dates to insert zeros
-    dates_to_insert_zeros_before_gaps = (
-        readings_before_gaps.index + pd.DateOffset(seconds=sample_period))
-
-    dates_to_insert_zeros_after_gaps = (
-        readings_after_gaps.index - pd.DateOffset(seconds=sample_period))
-
-    dates_to_insert_zeros = dates_to_insert_zeros_before_gaps.append(
-        dates_to_insert_zeros_after_gaps)
+    zero_timestamps = np.sort(np.concatenate(
+        [original_timestamps[rows_before_gaps] + sample_period_ns,
+         original_timestamps[rows_after_gaps] - sample_period_ns]))
 
     # Columns containing power
     power_columns = []
     non_power_columns = []
-    for col in df.columns:
+    for col in original.columns:
         if col.physical_quantity == 'power':
             power_columns.append(col)
         else:
@@ -124,38 +125,77 @@ def insert_zeros(single_appliance_dataframe,
 
     # Don't insert duplicate indicies
     # TODO: remove this assert when we're confident the code is correct
-    assert((dates_to_insert_zeros & df.index).size == 0)
-
-    # Create new dataframe of zeros at new indicies ready for insertion
-    zeros = pd.DataFrame(data=0,
-                         index=dates_to_insert_zeros,
-                         columns=power_columns,
-                         dtype=np.float32)
+    positions = np.searchsorted(valid_timestamps, zero_timestamps)
+    positions = positions[positions < len(valid_timestamps)]
+    assert(not np.in1d(valid_timestamps[positions], zero_timestamps).any())
 
     # Check no zeros are closer than sample_period
     # TODO: remove this assert when we're confident the code is correct
-    # also remove the sort_index().
-    if len(zeros) > 1:
-        zeros = zeros.sort_index()
-        assert(timedelta64_to_secs(np.diff(zeros.index.values).min()) > 
-               sample_period)
-
-    # Now, take median of non-power columns (like voltage)
-    for measurement in non_power_columns:
-        zeros[measurement] = single_appliance_dataframe[measurement].median()
-
-    # Insert the dataframe of zeros into the data.
-    df_with_zeros = deepcopy(single_appliance_dataframe)
-    df_with_zeros = df_with_zeros.append(zeros)
-    df_with_zeros = df_with_zeros.sort_index()
-
-    # If input data had a regular frequency then resample
-    # because appending turns off the regular frequency.
-    original_freq = single_appliance_dataframe.index.freq
-    if original_freq is not None:
-        df_with_zeros = df_with_zeros.resample(rule=original_freq)
-
-    return df_with_zeros
+    if len(zero_timestamps) > 1:
+        assert(np.diff(zero_timestamps).min() > sample_period_ns)
+
+    # Power columns get zeros; take median of non-power columns (like voltage)
+    fill_values = [0 if col in power_columns else original[col].median()
+                   for col in original.columns]
+
+    if len(zero_timestamps) == 0:
+        return original.copy()
+
+    # If input data had a regular frequency then zeros land on existing
+    # (NaN) rows, so just average them in, as resampling would.
+    if original.index.freq is not None:
+        positions = np.searchsorted(original_timestamps, zero_timestamps)
+        positions = positions[positions < len(original_timestamps)]
+        if (len(positions) == len(zero_timestamps) and
+                (original_timestamps[positions] == zero_timestamps).all()):
+            df_with_zeros = original.copy()
+            for col, fill_value in zip(original.columns, fill_values):
+                values = df_with_zeros[col].values
+                values = values.astype(np.promote_types(values.dtype,
+                                                        np.float32))
+                existing = values[positions]
+                values[positions] = np.where(np.isnan(existing), fill_value,
+                                             (existing + fill_value) / 2)
+                df_with_zeros[col] = values
+            return df_with_zeros
+
+    # Merge the zeros into the sorted index in one pass, writing straight
+    # into preallocated arrays.  Zeros go after any existing rows with the
+    # same timestamp.
+    n_rows = len(original_timestamps) + len(zero_timestamps)
+    zero_rows = (np.searchsorted(original_timestamps, zero_timestamps,
+                                 side='right') +
+                 np.arange(len(zero_timestamps)))
+    original_rows = np.ones(n_rows, dtype=bool)
+    original_rows[zero_rows] = False
+
+    timestamps = np.empty(n_rows, dtype=np.int64)
+    timestamps[original_rows] = original_timestamps
+    timestamps[zero_rows] = zero_timestamps
+    index = pd.DatetimeIndex(timestamps.view('M8[ns]'))
+    if original.index.tz is not None:
+        index = index.tz_localize('UTC').tz_convert(original.index.tz)
+
+    # Each column gets the dtype it would get by appending a float32
+    # DataFrame of zeros (and float64 medians).  Columns are merged one
+    # dtype block at a time so that, say, float32 power isn't upcast to
+    # match float64 voltage.
+    dtypes = [np.promote_types(dtype, np.float32 if col in power_columns
+                               else np.float64)
+              for col, dtype in zip(original.columns, original.dtypes)]
+    blocks = []
+    for dtype in sorted(set(dtypes), key=str):
+        positions = [i for i, column_dtype in enumerate(dtypes)
+                     if column_dtype == dtype]
+        values = np.empty((n_rows, len(positions)), dtype=dtype)
+        values[original_rows] = original.iloc[:, positions].values
+        values[zero_rows] = [fill_values[i] for i in positions]
+        blocks.append(pd.DataFrame(values, index=index,
+                                   columns=original.columns[positions],
+                                   copy=False))
+    if len(blocks) == 1:
+        return blocks[0]
+    return pd.concat(blocks, axis=1).reindex(columns=original.columns)
 
 
 def normalise_power(power, voltage, nominal_voltage):
@@ -313,3 +353,176 @@ def contiguous_blocks(datetimeindex):
         contiguous_time_tuples.append(
             (datetimeindex[start], datetimeindex[-1]))
     return contiguous_time_tuples
+
+
+def _run_starts(values, tolerance=0):
+    """Returns the positions of the first sample of each run of
+    (near-)constant values.  `values` is a 2D numpy array.  A new run
+    starts when any column differs from the first sample of the current
+    run by more than `tolerance`.  NaNs always start a new run."""
+    n_samples = len(values)
+    if n_samples == 0:
+        return np.array([], dtype=np.int64)
+
+    if tolerance == 0:
+        changed = (values[1:] != values[:-1]).any(axis=1)
+        return np.concatenate([[0], np.where(changed)[0] + 1])
+
+    # Search forwards from the start of each run in exponentially
+    # growing windows, so the cost is linear in the number of samples
+    # and not in (number of samples x number of runs).
+    starts = [0]
+    run_start = 0
+    while True:
+        next_start = None
+        i = run_start + 1
+        window = 64
+        while i < n_samples:
+            block = values[i:i + window]
+            outside = ~(np.abs(block - values[run_start]) <= tolerance)
+            outside = outside.any(axis=1)
+            if outside.any():
+                next_start = i + outside.argmax()
+                break
+            i += window
+            window *= 2
+        if next_start is None:
+            break
+        starts.append(next_start)
+        run_start = next_start
+    return np.array(starts, dtype=np.int64)
+
+
+def change_points(df, tolerance=0):
+    """Compacts `df` by only keeping the first sample of each run of
+    constant values (plus the very last sample, so that the end of the
+    data is preserved).
+
+    The result describes the same step function as `df`, using the
+    assumption used throughout nilmtk that the power drawn between
+    reading[i] and reading[i+1] is held constant at reading[i].  Hence
+    `energy`, `hours_on`, `on` and `on_off_events` give the same answers
+    for the compacted data as for the original data (provided
+    `tolerance` is 0).
+
+    Gaps in the data are not preserved, and nor are the timestamps of
+    irregularly sampled data: `expand_change_points` can only recover
+    `df` exactly if `df` is sampled every `sample_period` seconds with
+    no gaps and `tolerance` is 0.  If the data has gaps then pre-process
+    it with `insert_zeros` first.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+
+    tolerance : float, optional
+        Default = 0.  A sample is dropped if every column is within
+        `tolerance` of the first sample of the current run.
+
+    Returns
+    -------
+    pandas.DataFrame
+
+    See Also
+    --------
+    expand_change_points
+    """
+    starts = _run_starts(df.values, tolerance)
+    if len(df) > 1 and starts[-1] != len(df) - 1:
+        starts = np.append(starts, len(df) - 1)
+    return df.iloc[starts]
+
+
+def _regular_index(origin, start, end, sample_period, tz=None,
+                   include_start=True):
+    """Returns a DatetimeIndex of every multiple of `sample_period` after
+    `origin` between `start` and `end`.  All times are int nanoseconds."""
+    step = int(round(sample_period * 1E9))
+    first = -((origin - start) // step)  # ceil((start - origin) / step)
+    if not include_start and origin + first * step == start:
+        first += 1
+    last = (end - origin) // step
+    index = pd.DatetimeIndex(origin + step * np.arange(first, last + 1))
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    return index
+
+
+def expand_change_points(df, sample_period, end=None):
+    """Expands data compacted by `change_points` back onto a regular
+    grid of samples `sample_period` seconds apart, starting from the
+    first sample of `df`.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+
+    sample_period : float or int
+        Seconds.
+
+    end : pd.Timestamp, optional
+        If given then expand up to and including `end` instead of the
+        last sample of `df`.  Useful if `df` was cropped before the end
+        of a run.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    if len(df) == 0:
+        return df
+    origin = df.index.asi8[0]
+    end = df.index.asi8[-1] if end is None else pd.Timestamp(end).value
+    index = _regular_index(origin, origin, end, sample_period,
+                           tz=df.index.tz)
+    return df.reindex(index, method='ffill')
+
+
+def expand_change_point_chunks(chunks, sample_period, end=None):
+    """Lazily expands chunks of compacted data, one chunk at a time.
+
+    Parameters
+    ----------
+    chunks : iterable of pd.DataFrames
+        With `previous_timestamp` and `previous_sample` attributes, e.g.
+        from `nilmtk.utils.chunks_with_boundaries`.
+
+    sample_period : float or int
+        Seconds.
+
+    end : pd.Timestamp, optional
+        If given then expand the last run up to and including `end`.
+
+    Returns
+    -------
+    generator of pd.DataFrames.  The concatenation of all chunks is equal
+    to `expand_change_points` applied to the whole channel.
+    """
+    origin = None
+    last_row = None
+    for chunk in chunks:
+        previous_timestamp = getattr(chunk, 'previous_timestamp', None)
+        if origin is None:
+            origin = chunk.index.asi8[0]
+        if previous_timestamp is None:
+            index = _regular_index(origin, origin, chunk.index.asi8[-1],
+                                   sample_period, tz=chunk.index.tz)
+            expanded = chunk.reindex(index, method='ffill')
+        else:
+            index = _regular_index(origin, previous_timestamp.value,
+                                   chunk.index.asi8[-1], sample_period,
+                                   tz=chunk.index.tz, include_start=False)
+            previous = pd.DataFrame([chunk.previous_sample.values],
+                                    index=pd.DatetimeIndex([previous_timestamp]),
+                                    columns=chunk.columns)
+            expanded = previous.append(chunk).reindex(index, method='ffill')
+        last_row = chunk.iloc[-1:]
+        if len(expanded) > 0:
+            yield expanded
+
+    if end is not None and last_row is not None:
+        index = _regular_index(origin, last_row.index.asi8[0],
+                               pd.Timestamp(end).value, sample_period,
+                               tz=last_row.index.tz, include_start=False)
+        if len(index) > 0:
+            yield last_row.reindex(index, method='ffill')
@@ -0,0 +1,333 @@
+"""Declarative, fused and cached preprocessing of buildings.
+
+A `Pipeline` is a list of steps, for example:
+
+>>> pipeline = Pipeline([SumSplitSupplies(),
+                         Downsample(rule='1T'),
+                         FillApplianceGaps(),
+                         DropMissingMains(),
+                         MakeCommonIndex()],
+                        cache_directory='/data/nilmtk_cache', n_jobs=4)
+>>> building = pipeline.run(dataset.buildings[1])
+
+Consecutive per-channel steps (like `Downsample`, `FillApplianceGaps`
+and `DropMissingMains`) are fused: each channel goes through all of them
+in one pass, optionally in parallel with other channels, and the building
+is only rebuilt once.  Steps which need the whole building (like
+`MakeCommonIndex`) separate the fused stages.
+
+If `cache_directory` is given then the result is stored there under a
+hash of the input data, the steps and `CACHE_VERSION`.  Float32 channels
+are stored in nilmtk's native format and everything else in the building
+(metadata, other channels, other utilities) is pickled.  Running the same
+pipeline on the same data again maps the stored result into memory
+instead of recomputing it.  The first run returns the stored result too,
+so every run returns an identical building.
+"""
+
+from __future__ import print_function, division
+import os
+import shutil
+import hashlib
+import inspect
+import tempfile
+import cPickle as pickle
+from multiprocessing import Pool
+import numpy as np
+import pandas as pd
+from nilmtk.utils import copy_dicts, effective_n_jobs
+from nilmtk.dataset import native
+from nilmtk.preprocessing.electricity import single
+from nilmtk.preprocessing.electricity.building import (
+    BUILDING_ELECTRICITY_DICTS, make_common_index)
+
+# Included in every cache key.  Increment it whenever the output of the
+# built-in steps, or the layout of cache entries, changes.
+CACHE_VERSION = 1
+BUILDING_FILENAME = 'building.pickle'
+
+
+class Step(object):
+
+    """A preprocessing step.
+
+    Per-channel steps implement `__call__(df)`, which must return a new
+    DataFrame without modifying `df`.  Steps which need the whole building
+    set `per_channel = False` and implement `apply_to_building`.
+
+    Attributes
+    ----------
+    per_channel : bool
+    dict_names : list of strings
+        The Electricity dicts a per-channel step applies to.
+    params : dict
+        The step's parameters.  Used, with the class name, to identify
+        the step in cache keys, so must have a stable repr.
+    """
+
+    per_channel = True
+    dict_names = native.ELECTRICITY_DICTS
+
+    def __init__(self, **params):
+        self.params = params
+
+    def __call__(self, df):
+        raise NotImplementedError
+
+    def apply_to_building(self, building):
+        """Returns a preprocessed copy of `building`."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        params = ', '.join('{}={!r}'.format(key, value)
+                           for key, value in sorted(self.params.items()))
+        return '{}({})'.format(self.__class__.__name__, params)
+
+
+class Downsample(Step):
+
+    """See `nilmtk.preprocessing.electricity.building.downsample`"""
+
+    def __init__(self, rule='1T', how='mean', dropna=False):
+        super(Downsample, self).__init__(rule=rule, how=how, dropna=dropna)
+
+    def __call__(self, df):
+        df = df.resample(rule=self.params['rule'], how=self.params['how'])
+        return df.dropna() if self.params['dropna'] else df
+
+
+class FillApplianceGaps(Step):
+
+    """See `nilmtk.preprocessing.electricity.building.fill_appliance_gaps`"""
+
+    dict_names = ['appliances']
+
+    def __init__(self, sample_period_multiplier=4):
+        super(FillApplianceGaps, self).__init__(
+            sample_period_multiplier=sample_period_multiplier)
+
+    def __call__(self, df):
+        df = single.insert_zeros(
+            df, sample_period_multiplier=self.params['sample_period_multiplier'])
+        return df.fillna(method='ffill')
+
+
+class DropMissingMains(Step):
+
+    """See `nilmtk.preprocessing.electricity.building.drop_missing_mains`"""
+
+    dict_names = ['mains']
+
+    def __call__(self, df):
+        return df.dropna()
+
+
+class SumSplitSupplies(Step):
+
+    """See `nilmtk.sensors.electricity.Electricity.sum_split_supplies`"""
+
+    per_channel = False
+
+    def apply_to_building(self, building):
+        building_copy = copy_dicts(building, BUILDING_ELECTRICITY_DICTS)
+        building_copy.utility.electric = (
+            building.utility.electric.sum_split_supplies())
+        return building_copy
+
+
+class MakeCommonIndex(Step):
+
+    """See `nilmtk.preprocessing.electricity.building.make_common_index`"""
+
+    per_channel = False
+
+    def __init__(self, how='intersection'):
+        super(MakeCommonIndex, self).__init__(how=how)
+
+    def apply_to_building(self, building):
+        return make_common_index(building, how=self.params['how'])
+
+
+def _apply_steps(args):
+    """Runs every step in `steps` on one channel.  Module-level so that
+    it can be pickled for multiprocessing."""
+    steps, df = args
+    for step in steps:
+        df = step(df)
+    return df
+
+
+def hash_building(building, hash_):
+    """Updates `hash_` (e.g. a `hashlib.sha1()` object) with the names,
+    columns, indicies and values of every electricity channel in
+    `building`."""
+    electric = building.utility.electric
+    for dict_name in native.ELECTRICITY_DICTS:
+        channels = getattr(electric, dict_name)
+        for name in sorted(channels, key=repr):
+            df = channels[name]
+            hash_.update(repr((dict_name, name, list(df.columns),
+                               str(df.index.tz))))
+            hash_.update(np.ascontiguousarray(df.index.asi8).data)
+            for column in df.columns:
+                hash_.update(np.ascontiguousarray(df[column].values).data)
+
+
+def _is_native(df):
+    return (isinstance(df, pd.DataFrame) and
+            isinstance(df.index, pd.DatetimeIndex) and native.is_native(df))
+
+
+def _dump(building, path):
+    """Writes the float32 channels of `building` to `path` in nilmtk's
+    native format and pickles the rest of the building."""
+    electric = building.utility.electric
+    channels = [(dict_name, name)
+                for dict_name in native.ELECTRICITY_DICTS
+                for name, df in getattr(electric, dict_name).iteritems()
+                if _is_native(df)]
+    native.export_electricity(electric, path, channels)
+    rest = copy_dicts(building, BUILDING_ELECTRICITY_DICTS)
+    for dict_name, name in channels:
+        del getattr(rest.utility.electric, dict_name)[name]
+    with open(os.path.join(path, BUILDING_FILENAME), 'wb') as fh:
+        pickle.dump(rest, fh, pickle.HIGHEST_PROTOCOL)
+
+
+def _load(path):
+    """The inverse of `_dump`.  Native channels are memory-mapped."""
+    with open(os.path.join(path, BUILDING_FILENAME), 'rb') as fh:
+        building = pickle.load(fh)
+    native.load_electricity(path, building.utility.electric)
+    return building
+
+
+class Pipeline(object):
+
+    """A sequence of preprocessing steps.  See the module docstring.
+
+    Parameters
+    ----------
+    steps : list of Steps
+    cache_directory : string, optional
+        If given then results are cached in this directory.
+    n_jobs : int, optional
+        Number of worker processes used to preprocess channels.
+        See `nilmtk.utils.effective_n_jobs`.  Defaults to 1.
+    """
+
+    def __init__(self, steps, cache_directory=None, n_jobs=1):
+        self.steps = list(steps)
+        self.cache_directory = cache_directory
+        self.n_jobs = n_jobs
+
+    def __repr__(self):
+        return 'Pipeline({!r})'.format(self.steps)
+
+    def stages(self):
+        """Groups consecutive per-channel steps together.
+
+        Returns
+        -------
+        list where each element is either a list of per-channel Steps
+        (which are run in a single pass) or a single building Step.
+        """
+        stages = []
+        for step in self.steps:
+            if not step.per_channel:
+                stages.append(step)
+            elif stages and isinstance(stages[-1], list):
+                stages[-1].append(step)
+            else:
+                stages.append([step])
+        return stages
+
+    def cache_key(self, building):
+        """Hex digest of `CACHE_VERSION`, the steps (including the source
+        code of each step's class, where available) and the electricity
+        data in `building`."""
+        hash_ = hashlib.sha1(repr((CACHE_VERSION, self)))
+        for step in self.steps:
+            try:
+                hash_.update(inspect.getsource(type(step)))
+            except (IOError, TypeError):
+                pass
+        hash_building(building, hash_)
+        return hash_.hexdigest()
+
+    def run(self, building):
+        """Preprocesses `building`, which is not modified.
+
+        Returns
+        -------
+        nilmtk.building.Building
+        """
+        building = copy_dicts(building, BUILDING_ELECTRICITY_DICTS)
+        building.utility.electric.load_channels()
+
+        if self.cache_directory is not None:
+            path = os.path.join(self.cache_directory,
+                                self.cache_key(building))
+            if os.path.isdir(path):
+                print("Loading preprocessed building from", path)
+                return _load(path)
+
+        for stage in self.stages():
+            if isinstance(stage, list):
+                building = self._run_channel_steps(building, stage)
+            else:
+                building = stage.apply_to_building(building)
+
+        if self.cache_directory is not None:
+            self._store(building, path)
+            return _load(path)
+        return building
+
+    def _run_channel_steps(self, building, steps):
+        """Runs all `steps` on each channel in one pass, in parallel if
+        `n_jobs` > 1."""
+        building = copy_dicts(building, BUILDING_ELECTRICITY_DICTS)
+        electric = building.utility.electric
+        tasks = []
+        names = []
+        for dict_name in native.ELECTRICITY_DICTS:
+            dict_steps = [step for step in steps
+                          if dict_name in step.dict_names]
+            if not dict_steps:
+                continue
+            for name, df in getattr(electric, dict_name).iteritems():
+                tasks.append((dict_steps, df))
+                names.append((dict_name, name))
+
+        n_jobs = effective_n_jobs(self.n_jobs)
+        if n_jobs == 1 or len(tasks) <= 1:
+            results = [_apply_steps(task) for task in tasks]
+        else:
+            pool = Pool(n_jobs)
+            try:
+                results = pool.map(_apply_steps, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+
+        new_values = dict((dict_name, {})
+                          for dict_name in native.ELECTRICITY_DICTS)
+        for (dict_name, name), df in zip(names, results):
+            new_values[dict_name][name] = df
+        for dict_name, channels in new_values.iteritems():
+            getattr(electric, dict_name).update(channels)
+        return building
+
+    def _store(self, building, path):
+        """Writes `building` to `path` via a temporary directory so that
+        an interrupted write never leaves a partial cache entry."""
+        if not os.path.isdir(self.cache_directory):
+            os.makedirs(self.cache_directory)
+        temp_directory = tempfile.mkdtemp(dir=self.cache_directory)
+        try:
+            _dump(building, temp_directory)
+            os.rename(temp_directory, path)
+        except:
+            shutil.rmtree(temp_directory, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
@@ -0,0 +1,409 @@
+"""Containers for electricity channels.
+
+`ChannelDict` is a dict which counts its modifications, so that views
+computed from its channels (like `Electricity.get_dataframe_of_mains`)
+can be cached until the dict changes.
+
+`ChannelStore` is a dict-like alternative to the plain dicts used for
+`Electricity.mains`, `Electricity.circuits` and `Electricity.appliances`.
+Channels which share a sample grid (i.e. which have identical
+DatetimeIndexes) share one int64 timestamp array and one contiguous 2D
+float32 block, which has one column per measurement per channel.
+Cross-channel operations like summing, masking and alignment are then
+single NumPy calls on the block instead of one pandas alignment per
+channel.
+
+Channels whose index is not a DatetimeIndex, or whose columns are not all
+float32 (e.g. float64 or 'state' columns), are kept as ordinary
+DataFrames, so storing a channel never changes its values.  Pass
+`downcast=True` to convert floating point channels of any precision to
+float32 so they can share blocks too.
+
+ChannelStore never modifies its arrays in place: adding or removing
+channels allocates new blocks.  The DataFrames returned by `store[name]`
+are views onto the block, so modifying one in place modifies the store;
+assign a new DataFrame with `store[name] = df` instead.
+"""
+
+from __future__ import print_function, division
+from collections import MutableMapping, OrderedDict
+import numpy as np
+import pandas as pd
+
+
+class ChannelDict(dict):
+
+    """A dict which increments `version` whenever it is modified.
+
+    Modifying a DataFrame inside the dict in place is not detected.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(ChannelDict, self).__init__(*args, **kwargs)
+        self.version = 0
+
+    def __reduce__(self):
+        # By default pickle restores items through __setitem__ before
+        # restoring `version`, so pass the items to __init__ instead
+        return (ChannelDict, (dict(self),), {'version': self.version})
+
+    def __setitem__(self, name, df):
+        super(ChannelDict, self).__setitem__(name, df)
+        self.version += 1
+
+    def __delitem__(self, name):
+        super(ChannelDict, self).__delitem__(name)
+        self.version += 1
+
+    def clear(self):
+        super(ChannelDict, self).clear()
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super(ChannelDict, self).pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super(ChannelDict, self).popitem()
+
+    def setdefault(self, name, df=None):
+        self.version += 1
+        return super(ChannelDict, self).setdefault(name, df)
+
+    def update(self, *args, **kwargs):
+        super(ChannelDict, self).update(*args, **kwargs)
+        self.version += 1
+
+
+class _Grid(object):
+
+    """Channels sharing one sample grid.
+
+    Attributes
+    ----------
+    index : pd.DatetimeIndex
+    timestamps : np.ndarray of int64 UTC nanoseconds
+    values : np.ndarray of float32, shape (n_rows, n_columns)
+    """
+
+    def __init__(self, index, values=None):
+        self.index = index
+        self.timestamps = index.asi8
+        if values is None:
+            values = np.empty((len(index), 0), dtype=np.float32)
+        self.values = values
+
+    def matches(self, index):
+        return (index is self.index or
+                (str(index.tz) == str(self.index.tz) and
+                 np.array_equal(index.asi8, self.timestamps)))
+
+
+def _rows_in_periods(timestamps, starts, ends):
+    """Returns a boolean array which is True for each of the sorted
+    `timestamps` which falls within any [start, end] period."""
+    n_rows = len(timestamps)
+    first = np.searchsorted(timestamps, starts, side='left')
+    last = np.searchsorted(timestamps, ends, side='right')
+    depth = (np.bincount(first, minlength=n_rows + 1) -
+             np.bincount(last, minlength=n_rows + 1)).cumsum()
+    return depth[:n_rows] > 0
+
+
+def is_columnar(df, downcast=False):
+    """True if `df` can be stored in a ChannelStore's float32 blocks:
+    i.e. if every column is float32 or, if `downcast` is True, any
+    floating point type."""
+    if downcast:
+        is_float = lambda dtype: dtype.kind == 'f'
+    else:
+        is_float = lambda dtype: dtype == np.float32
+    return (isinstance(df, pd.DataFrame) and
+            isinstance(df.index, pd.DatetimeIndex) and
+            len(df.columns) > 0 and
+            all(is_float(dtype) for dtype in df.dtypes))
+
+
+class ChannelStore(MutableMapping):
+
+    """Dict-like mapping of channel names to DataFrames, stored
+    column-wise.  See the module docstring.
+
+    Parameters
+    ----------
+    channels : dict of DataFrames, optional
+    downcast : boolean, optional
+        Defaults to False.  If True then float64 channels are converted
+        to float32 and stored in blocks.  Otherwise they are stored
+        unchanged, as ordinary DataFrames.
+
+    Attributes
+    ----------
+    version : int
+        Incremented whenever channels are added or removed.
+    """
+
+    def __init__(self, channels=None, downcast=False):
+        self.version = 0
+        self.downcast = downcast
+        self._grids = []
+        # Maps each channel name to (grid, start column, stop column,
+        # column names), or to None if the channel is in `_frames`
+        self._locations = OrderedDict()
+        self._frames = {}
+        if channels is not None:
+            self.update(channels)
+
+    # Dict interface
+
+    def __getitem__(self, name):
+        location = self._locations[name]
+        if location is None:
+            return self._frames[name]
+        grid, start, stop, columns = location
+        return pd.DataFrame(grid.values[:, start:stop], index=grid.index,
+                            columns=columns, copy=False)
+
+    def __setitem__(self, name, df):
+        self.update({name: df})
+
+    def __delitem__(self, name):
+        location = self._locations.pop(name)
+        self.version += 1
+        if location is None:
+            del self._frames[name]
+            return
+
+        grid, start, stop, columns = location
+        grid.values = np.delete(grid.values, np.s_[start:stop], axis=1)
+        if grid.values.shape[1] == 0:
+            self._grids.remove(grid)
+            return
+        width = stop - start
+        for other_name, other in self._locations.iteritems():
+            if other is not None and other[0] is grid and other[1] >= stop:
+                self._locations[other_name] = (grid, other[1] - width,
+                                               other[2] - width, other[3])
+
+    def __contains__(self, name):
+        return name in self._locations
+
+    def __iter__(self):
+        return iter(self._locations)
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __repr__(self):
+        return 'ChannelStore({} channels, {} grids)'.format(
+            len(self), len(self._grids))
+
+    def update(self, *args, **kwargs):
+        """Adds or replaces channels.  New channels are appended to each
+        grid with a single allocation, so adding many channels at once is
+        much cheaper than adding them one at a time."""
+        channels = dict(*args, **kwargs)
+        self.version += 1
+        for name in channels:
+            if name in self._locations:
+                del self[name]
+
+        new_columns = OrderedDict()
+        for name, df in channels.iteritems():
+            if not is_columnar(df, self.downcast):
+                self._locations[name] = None
+                self._frames[name] = df
+                continue
+            for grid in self._grids:
+                if grid.matches(df.index):
+                    break
+            else:
+                grid = _Grid(df.index)
+                self._grids.append(grid)
+            new_columns.setdefault(grid, []).append((name, df))
+
+        for grid, frames in new_columns.iteritems():
+            start = grid.values.shape[1]
+            blocks = [grid.values]
+            for name, df in frames:
+                stop = start + len(df.columns)
+                self._locations[name] = (grid, start, stop, list(df.columns))
+                blocks.append(np.asarray(df.values, dtype=np.float32))
+                start = stop
+            grid.values = np.hstack(blocks)
+
+    def copy(self):
+        """Returns a new ChannelStore which shares this store's arrays.
+        Adding or removing channels in either store does not affect the
+        other."""
+        new_store = ChannelStore(downcast=self.downcast)
+        new_store.version = self.version
+        grids = dict((id(grid), _Grid(grid.index, grid.values))
+                     for grid in self._grids)
+        new_store._grids = [grids[id(grid)] for grid in self._grids]
+        for name, location in self._locations.iteritems():
+            if location is not None:
+                location = (grids[id(location[0])],) + location[1:]
+            new_store._locations[name] = location
+        new_store._frames = dict(self._frames)
+        return new_store
+
+    # Cross-channel operations
+
+    def columns(self, name):
+        """Returns the column names of channel `name` without building a
+        DataFrame."""
+        location = self._locations[name]
+        if location is None:
+            return list(self._frames[name].columns)
+        return list(location[3])
+
+    @property
+    def n_grids(self):
+        """Number of distinct sample grids."""
+        return len(self._grids)
+
+    def _select(self, measurement, names):
+        """Selects one column per channel: the `measurement` column or, if
+        `measurement` is None, the first column.  Channels without
+        `measurement` are skipped.
+
+        Returns
+        -------
+        grids : OrderedDict mapping each _Grid to a list of
+            (channel name, column position) tuples
+        frames : list of (channel name, pd.Series) tuples for channels
+            not stored in a grid
+        skipped : list of the names of channels without `measurement`
+        """
+        if names is None:
+            names = list(self._locations)
+        grids = OrderedDict()
+        frames = []
+        skipped = []
+        for name in names:
+            location = self._locations[name]
+            if location is None:
+                df = self._frames[name]
+                if measurement is None:
+                    frames.append((name, df.icol(0)))
+                elif measurement in df.columns:
+                    frames.append((name, df[measurement]))
+                else:
+                    skipped.append(name)
+                continue
+            grid, start, stop, columns = location
+            if measurement is None:
+                position = start
+            elif measurement in columns:
+                position = start + columns.index(measurement)
+            else:
+                skipped.append(name)
+                continue
+            grids.setdefault(grid, []).append((name, position))
+        return grids, frames, skipped
+
+    def get_dataframe(self, measurement=None, names=None):
+        """Returns one column per channel, aligned on a common index.
+
+        Channels which share a grid are gathered with a single NumPy
+        take; pandas alignment is only needed across grids.
+
+        Parameters
+        ----------
+        measurement : Measurement, optional
+            If None then use the first column of each channel.
+            Channels without this measurement are skipped.
+        names : list of channel names, optional
+            Defaults to all channels.
+
+        Returns
+        -------
+        pandas.DataFrame whose column names are channel names.
+        """
+        grids, frames, skipped = self._select(measurement, names)
+        dfs = []
+        for grid, selected in grids.iteritems():
+            channel_names, positions = zip(*selected)
+            dfs.append(pd.DataFrame(grid.values.take(positions, axis=1),
+                                    index=grid.index,
+                                    columns=list(channel_names)))
+        if frames:
+            dfs.append(pd.DataFrame(dict(frames)))
+        if not dfs:
+            return pd.DataFrame()
+        if len(dfs) == 1:
+            return dfs[0]
+        return pd.concat(dfs, axis=1)
+
+    def sum(self, measurement, names=None):
+        """Sums `measurement` across channels.
+
+        Channels which share a grid are summed with a single NumPy call.
+        Sums from different grids are added with index alignment, so the
+        result is NaN wherever any grid lacks a sample.  Channels without
+        `measurement` are left out of the sum, with a warning.
+
+        Parameters
+        ----------
+        measurement : Measurement
+        names : list of channel names, optional
+            Defaults to all channels.
+
+        Returns
+        -------
+        pandas.DataFrame with a single `measurement` column.
+
+        Raises
+        ------
+        KeyError if no channel has `measurement`.
+        """
+        grids, frames, skipped = self._select(measurement, names)
+        if skipped and (grids or frames):
+            print("Warning,", measurement, "is missing from", skipped,
+                  "so they are not included in the sum")
+        sums = [pd.Series(grid.values.take([position for name, position
+                                            in selected], axis=1).sum(axis=1),
+                          index=grid.index)
+                for grid, selected in grids.iteritems()]
+        sums.extend(series for name, series in frames)
+        if not sums:
+            raise KeyError(measurement)
+        total = sums[0]
+        for series in sums[1:]:
+            total = total.add(series)
+        return pd.DataFrame(total.values, index=total.index,
+                            columns=[measurement])
+
+    def mask_periods(self, starts, ends):
+        """Returns a copy in which every sample inside any of the
+        [start, end] periods is NaN.
+
+        Parameters
+        ----------
+        starts, ends : sorted pd.DatetimeIndex (or lists of pd.Timestamps)
+            `starts[i]` and `ends[i]` delimit the i-th period.
+
+        Returns
+        -------
+        ChannelStore
+        """
+        starts = pd.DatetimeIndex(starts).asi8
+        ends = pd.DatetimeIndex(ends).asi8
+        masked = self.copy()
+        for grid in masked._grids:
+            rows = _rows_in_periods(grid.timestamps, starts, ends)
+            if rows.any():
+                grid.values = grid.values.copy()
+                grid.values[rows] = np.NaN
+        for name, df in masked._frames.iteritems():
+            if not isinstance(df.index, pd.DatetimeIndex):
+                continue
+            rows = _rows_in_periods(df.index.asi8, starts, ends)
+            if rows.any():
+                # int columns can't hold NaNs
+                df = df.astype(np.float32)
+                df[rows] = np.NaN
+                masked._frames[name] = df
+        return masked
@@ -6,7 +6,9 @@ import json
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from nilmtk.utils import is_namedtuple
+from nilmtk.utils import is_namedtuple, DEFAULT_CHUNKSIZE
+from nilmtk.utils import chunks_with_boundaries
+from nilmtk.sensors.channel_store import ChannelStore, ChannelDict
 
 Measurement = namedtuple('Measurement', ['physical_quantity', 'type'])
 """
@@ -92,6 +94,24 @@ def sum_dual_supply(dict_of_appliances):
     return new_dict_of_appliances
 
 
+def _channels_property(dict_name):
+    """Property for `Electricity.mains`, `circuits` and `appliances`.
+    Plain dicts are copied into ChannelDicts when assigned, so that
+    modifications can be detected, and assigning clears cached views."""
+    attribute = '_' + dict_name
+
+    def get_channels(self):
+        return getattr(self, attribute)
+
+    def set_channels(self, channels):
+        if not isinstance(channels, (ChannelDict, ChannelStore)):
+            channels = ChannelDict(channels)
+        setattr(self, attribute, channels)
+        self.clear_cache()
+
+    return property(get_channels, set_channels)
+
+
 class Electricity(object):
 
     """Store and process electricity for a building.
@@ -314,9 +334,20 @@ class Electricity(object):
         Has the same structure as `metadata` but contains information which has
         been automatically inferred from the data.
 
+    Notes
+    -----
+    `get_dataframe_of_mains` and `get_dataframe_of_appliances` are cached
+    per measurement until `mains` or `appliances` are modified or
+    re-assigned.  Do not modify the DataFrames they return in place.
+    If you modify a channel's DataFrame in place then call `clear_cache`.
     """
 
+    mains = _channels_property('mains')
+    circuits = _channels_property('circuits')
+    appliances = _channels_property('appliances')
+
     def __init__(self):
+        self._views = {}
         self.mains = {}
         self.circuits = {}
         self.appliances = {}
@@ -324,9 +355,73 @@ class Electricity(object):
         self.metadata = {}
         self.inferred_metadata = {}
 
+    def consolidate(self, dict_names=None, downcast=False):
+        """Converts the `mains`, `circuits` and `appliances` dicts into
+        ChannelStores, in place.  float32 channels with identical indexes
+        then share a single float32 block, so cross-channel operations
+        like `get_dataframe_of_mains` become single NumPy calls.
+
+        Parameters
+        ----------
+        dict_names : list of strings, optional
+            Defaults to ['mains', 'circuits', 'appliances'].
+        downcast : boolean, optional
+            Defaults to False, in which case channels of other dtypes
+            are stored unchanged (and don't benefit).  If True then
+            float64 channels are converted to float32, which loses
+            precision, so that they share blocks too.
+
+        See Also
+        --------
+        nilmtk.sensors.channel_store.ChannelStore
+        """
+        if dict_names is None:
+            dict_names = ['mains', 'circuits', 'appliances']
+        for dict_name in dict_names:
+            channels = getattr(self, dict_name)
+            if not isinstance(channels, ChannelStore):
+                setattr(self, dict_name,
+                        ChannelStore(channels, downcast=downcast))
+
+    def __getstate__(self):
+        # Don't copy or pickle cached views
+        state = self.__dict__.copy()
+        state['_views'] = {}
+        return state
+
+    def clear_cache(self):
+        """Forgets all cached views of mains and appliances."""
+        self._views = {}
+
+    def _cached_view(self, dict_name, view, measurement):
+        """Returns `view(measurement)`, recomputing it only if the
+        `dict_name` dict has been modified since it was last computed."""
+        version = getattr(self, dict_name).version
+        key = (view.__name__, measurement)
+        if key in self._views and self._views[key][0] == version:
+            return self._views[key][1]
+        result = view(measurement)
+        self._views[key] = (version, result)
+        return result
+
     def get_dataframe_of_mains(self, measurement=Measurement('power', 'active')):
-        """Get a pandas.DataFrame of all mains data
+        """Get a pandas.DataFrame of all mains data.
+
+        The result is cached until `mains` is modified.
         """
+        return self._cached_view('mains', self._get_dataframe_of_mains,
+                                 measurement)
+
+    def _get_dataframe_of_mains(self, measurement):
+        if isinstance(self.mains, ChannelStore):
+            try:
+                return self.mains.sum(measurement)
+            except KeyError:
+                fallback_measurement = Measurement('power', 'apparent')
+                print("Warning, couldn't get", measurement,
+                      "from mains, so trying", fallback_measurement)
+                return self.mains.sum(fallback_measurement)
+
         first_mains = self.mains.values()[0]
         shape = first_mains.shape
         columns = first_mains.columns
@@ -363,13 +458,25 @@ class Electricity(object):
         pandas.DataFrame
             Index is the same as the index used in the appliances DataFrames.
             Each column name is an ApplianceName namedtuple.
+            The result is cached until `appliances` is modified.
         """
+        return self._cached_view('appliances',
+                                 self._get_dataframe_of_appliances,
+                                 measurement)
+
+    def _get_dataframe_of_appliances(self, measurement):
         # TODO: I think we should modify the behaviour so that it will always try
         # to return a 'power' column per appliance if power data is available,
         # even if the exact parameter isn't available.  ATM this function will
         # silently remove some appliances if they don't include the correct
         # measurements.
 
+        if isinstance(self.appliances, ChannelStore) and not any(
+                is_namedtuple(column, DualSupply)
+                for name in self.appliances
+                for column in self.appliances.columns(name)):
+            return self.appliances.get_dataframe(measurement)
+
         if measurement is None:
             appliance_dict = {
                 appliance_name: appliance_df.icol(0)
@@ -457,6 +564,93 @@ class Electricity(object):
             for name in dict_.keys():
                 dict_[name] = dict_[name].ix[start_datetime:end_datetime]
 
+    def load_channels(self, columns=None, start=None, end=None):
+        """Loads any lazy channels in appliances, circuits and mains (e.g.
+        the `HDF5Channel` proxies created by `DataSet.load_hdf5(lazy=True)`)
+        into memory, in place.  Column and time-range selections are
+        pushed down into the store so only the requested data is read.
+        Channels which are already DataFrames are left untouched.
+
+        Parameters
+        ----------
+        columns : list of Measurements, optional
+            Only load these columns.  If None then load all columns.
+        start, end : strings or datetime objects, optional
+            Only load data within this time range.
+        """
+        for dict_ in [self.appliances, self.circuits, self.mains]:
+            for name, channel in dict_.items():
+                if not isinstance(channel, pd.DataFrame):
+                    dict_[name] = channel.load(columns=columns,
+                                               start=start, end=end)
+
+    def iter_chunks(self, channel, measurement=None,
+                    chunksize=DEFAULT_CHUNKSIZE, start=None, end=None):
+        """Iterate over a single channel in bounded-size chunks.
+
+        Works on lazy channels (which are read chunk-by-chunk from disk,
+        so the channel never has to fit into memory) and on in-memory
+        DataFrames.
+
+        Parameters
+        ----------
+        channel : MainsName, CircuitName or ApplianceName
+            A key into `mains`, `circuits` or `appliances`.
+
+        measurement : Measurement, optional
+            If provided then each chunk only contains this column.
+
+        chunksize : int, optional
+            Maximum number of rows per chunk.
+
+        start, end : strings or datetime objects, optional
+            Only return data strictly between `start` and `end`.
+
+        Returns
+        -------
+        generator of pandas.DataFrames.  Each chunk has a
+        `previous_timestamp` and `previous_sample` attribute which
+        describe the last row of the previous chunk (or None for the
+        first chunk).
+
+        Raises
+        ------
+        KeyError if `channel` is not in mains, circuits or appliances.
+
+        See Also
+        --------
+        nilmtk.utils.chunks_with_boundaries
+        nilmtk.stats.electricity.single.energy_from_chunks
+        """
+        for dict_ in [self.appliances, self.circuits, self.mains]:
+            if channel in dict_:
+                data = dict_[channel]
+                break
+        else:
+            raise KeyError(channel)
+
+        columns = None if measurement is None else [measurement]
+        if not isinstance(data, pd.DataFrame):
+            # Lazy channel, e.g. an HDF5Channel
+            return data.iter_chunks(columns=columns, chunksize=chunksize,
+                                    start=start, end=end)
+
+        if start is not None or end is not None:
+            # Exclude both ends, like the query used for HDF5 channels
+            timestamps = data.index.asi8
+            in_range = np.ones(len(data), dtype=bool)
+            if start is not None:
+                in_range &= timestamps > pd.Timestamp(start).value
+            if end is not None:
+                in_range &= timestamps < pd.Timestamp(end).value
+            data = data[in_range]
+        if columns is not None:
+            data = data[columns]
+        # pandas 0.13 raises if a slice runs past the end of the frame
+        chunks = (data.iloc[i:min(i + chunksize, len(data))]
+                  for i in range(0, len(data), chunksize))
+        return chunks_with_boundaries(chunks)
+
     def get_start_and_end_dates(self):
         """Returns the start and end dates covering the data in
         appliances, circuits and mains.
@@ -469,11 +663,16 @@ class Electricity(object):
         end = None
         for dict_of_dfs in [self.appliances, self.circuits, self.mains]:
             for df in dict_of_dfs.values():
-                df_start = df.index[0]
+                if isinstance(df, pd.DataFrame):
+                    df_start, df_end = df.index[0], df.index[-1]
+                else:
+                    # Lazy channel, which may know its start and end
+                    # without reading any data
+                    df_start, df_end = df.get_start_and_end()
+
                 if start is None or df_start < start:
                     start = df_start
 
-                df_end = df.index[-1]
                 if end is None or df_end > end:
                     end = df_end
 
@@ -575,4 +774,5 @@ class Electricity(object):
                 for col in df.columns:
                     if col.physical_quantity == 'voltage':
                         del df[col]
+        self.clear_cache()
                 
@@ -210,7 +210,7 @@ def energy_per_dataframe(electricity, sample_period_multiplier=20, unit='kwh'):
 
 def get_total_energy_per_dict(electricity, dict_='mains',  unit='kwh'):
     total_energy = 0.0
-    for df in electricity.__dict__[dict_].values():
+    for df in getattr(electricity, dict_).values():
         energy_for_df = single.energy(df, unit)
         total_energy += energy_for_df
     return total_energy
@@ -264,15 +264,6 @@ def find_appliances_contribution(electricity, how=np.mean):
     -------
     series_contribution: pandas.DataFrame
     """
-    # Finding number of mains
-    num_mains = len(electricity.mains.keys())
-
-    # If more than 1 mains exists, add them up
-    combined_mains = electricity.mains.values()[0]
-    if num_mains > 1:
-        for i in xrange(1, num_mains):
-            combined_mains += electricity.mains.values()[i]
-
     # Finding common measurements
     common_measurements = find_common_measurements(electricity)
     if len(common_measurements) == 0:
@@ -286,15 +277,13 @@ def find_appliances_contribution(electricity, how=np.mean):
 
     print("Common Measurement: ", common_measurement)
 
-    # Applying function over all appliances
-    series_appliances = {}
-    for appliance in electricity.appliances:
-        series_appliances[appliance] = electricity.appliances[
-            appliance][common_measurement].mean()
-
-    series_appliances = pd.Series(series_appliances)
+    # Applying function over all appliances.  NaNs introduced by aligning
+    # appliances with different indicies are ignored by mean().
+    series_appliances = electricity.get_dataframe_of_appliances(
+        common_measurement).mean()
 
     # Applying function over all mains summed up
+    combined_mains = electricity.get_dataframe_of_mains(common_measurement)
     series_mains = combined_mains[common_measurement].mean()
 
     # Contribution per appliance
@@ -482,7 +471,7 @@ def get_dropout_rates(electricity, ignore_gaps=False):
                     else single.get_dropout_rate)
     dropout_rates = []
     for attribute in ['appliances', 'circuits', 'mains']:
-        for name, df in electricity.__dict__[attribute].iteritems():
+        for name, df in getattr(electricity, attribute).iteritems():
             print(name)
             try:
                 dropout_rates.append(dropout_func(df.index))
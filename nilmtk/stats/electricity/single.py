@@ -37,6 +37,11 @@ def get_sample_period(data):
     ------
     TooFewSamplesError
     """
+    # Lazy channels may already know their sample period from the catalog
+    catalog_sample_period = getattr(data, 'sample_period', None)
+    if catalog_sample_period is not None:
+        return catalog_sample_period
+
     N_SAMPLES = 90
     if len(data) < N_SAMPLES:
         try:
@@ -257,6 +262,46 @@ def get_gap_starts_and_gap_ends(data, max_sample_period,
     return gap_starts, gap_ends
 
 
+def get_gap_starts_and_gap_ends_from_chunks(chunks, max_sample_period):
+    """Like `get_gap_starts_and_gap_ends` but for a channel which is 
+    processed one chunk at a time.  Gaps which span chunk edges are 
+    detected.
+
+    Parameters
+    ---------
+    chunks : iterable of pd.DataFrames
+        e.g. from `nilmtk.sensors.electricity.Electricity.iter_chunks`
+
+    max_sample_period : int or float
+        Maximum allowed sample period in seconds.  This defines what
+        counts as a 'gap'.
+
+    Returns
+    -------
+    gap_starts, gap_ends: DatetimeIndex
+    """
+    gap_starts = []
+    gap_ends = []
+    # The last non-NaN timestamp seen so far.  We track this ourselves
+    # rather than using `chunk.previous_timestamp` because the previous
+    # sample may be NaN.
+    last_timestamp = None
+    for chunk in chunks:
+        index = chunk.dropna().index
+        if len(index) == 0:
+            continue
+        if (last_timestamp is not None and 
+            (index[0] - last_timestamp).total_seconds() > max_sample_period):
+            gap_starts.append(last_timestamp)
+            gap_ends.append(index[0])
+        starts, ends = get_gap_starts_and_gap_ends(index, max_sample_period)
+        gap_starts.extend(starts)
+        gap_ends.extend(ends)
+        last_timestamp = index[-1]
+
+    return pd.DatetimeIndex(gap_starts), pd.DatetimeIndex(gap_ends)
+
+
 def get_good_section_starts_and_ends(data, max_sample_period):
     """
     Parameters
@@ -502,7 +547,44 @@ def energy(series, unit='kwh'):
     timedelta = np.diff(series.index.values)
     timedelta_secs = timedelta64_to_secs(timedelta)
     joules = (timedelta_secs * series.values[:-1]).sum()
+    return _joules_to_unit(joules, unit)
+
+
+def energy_from_chunks(chunks, unit='kwh'):
+    """Returns a float representing the quantity of energy consumed
+    by a channel which is processed one chunk at a time.
+
+    The energy between the last sample of one chunk and the first
+    sample of the next chunk is integrated using each chunk's
+    `previous_timestamp` and `previous_sample` attributes, so the
+    answer is the same as calling `energy` on the whole channel.
+
+    Parameters
+    ----------
+    chunks : iterable of pd.DataFrames
+        e.g. from `nilmtk.sensors.electricity.Electricity.iter_chunks`
+
+    unit : {'kwh', 'joules'}
+
+    Returns
+    -------
+    _energy : float
+
+    See Also
+    --------
+    energy
+    """
+    joules = 0.0
+    for chunk in chunks:
+        previous_timestamp = getattr(chunk, 'previous_timestamp', None)
+        if previous_timestamp is not None:
+            boundary_secs = (chunk.index[0] - previous_timestamp).total_seconds()
+            joules += boundary_secs * chunk.previous_sample.iloc[0]
+        joules += energy(chunk, unit='joules')
+    return _joules_to_unit(joules, unit)
+
 
+def _joules_to_unit(joules, unit):
     if unit == 'kwh':
         JOULES_PER_KWH = 3600000
         _energy = joules / JOULES_PER_KWH
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+
+"""
+   Copyright 2013 nilmtk authors.
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import print_function, division
+import unittest
+import cPickle as pickle
+import numpy as np
+import pandas as pd
+from nilmtk.sensors.channel_store import ChannelStore, ChannelDict
+from nilmtk.sensors.electricity import (Electricity, ApplianceName,
+                                        MainsName, Measurement)
+
+POWER = Measurement('power', 'active')
+VOLTAGE = Measurement('voltage', '')
+
+
+def make_df(values, index, columns=None):
+    return pd.DataFrame(np.array(values, dtype=np.float32), index=index,
+                        columns=[POWER] if columns is None else columns)
+
+
+class TestChannelStore(unittest.TestCase):
+    def setUp(self):
+        self.index = pd.date_range('2013/1/1', freq='6S', periods=4, tz='UTC')
+        self.other_index = pd.date_range('2013/1/1', freq='6S', periods=2,
+                                         tz='UTC')
+        self.channels = {
+            ApplianceName('fridge', 1): make_df([1, 2, 3, 4], self.index),
+            ApplianceName('kettle', 1): make_df(
+                [[10, 240], [20, 241], [30, 242], [40, 243]], self.index,
+                [POWER, VOLTAGE]),
+            ApplianceName('toaster', 1): make_df([5, 6], self.other_index)}
+
+    def test_dict_interface(self):
+        store = ChannelStore(self.channels)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.n_grids, 2)
+        for name, df in self.channels.iteritems():
+            self.assertIn(name, store)
+            self.assertTrue((store[name] == df).all().all())
+
+        del store[ApplianceName('fridge', 1)]
+        self.assertEqual(len(store), 2)
+        kettle = store[ApplianceName('kettle', 1)]
+        self.assertEqual(list(kettle[VOLTAGE]), [240, 241, 242, 243])
+
+        # A copy shares arrays but not structure
+        store_copy = store.copy()
+        del store_copy[ApplianceName('kettle', 1)]
+        self.assertIn(ApplianceName('kettle', 1), store)
+
+    def test_downcast(self):
+        name = ApplianceName('kettle', 2)
+        df = pd.DataFrame(np.arange(4, dtype=np.float64) + 0.1,
+                          index=self.index, columns=[POWER])
+        store = ChannelStore({name: df})
+        self.assertEqual(store.n_grids, 0)
+        self.assertIs(store[name], df)
+
+        store = ChannelStore({name: df}, downcast=True)
+        self.assertEqual(store.n_grids, 1)
+        self.assertEqual(store[name][POWER].dtype, np.float32)
+
+    def test_cross_channel(self):
+        store = ChannelStore(self.channels)
+        total = store.sum(POWER, names=[ApplianceName('fridge', 1),
+                                        ApplianceName('kettle', 1)])
+        self.assertEqual(list(total[POWER]), [11, 22, 33, 44])
+        self.assertRaises(KeyError, store.sum, Measurement('power', 'reactive'))
+        # Channels without the measurement are left out
+        voltage = store.sum(VOLTAGE)
+        self.assertEqual(list(voltage[VOLTAGE]), [240, 241, 242, 243])
+
+        df = store.get_dataframe(POWER)
+        self.assertEqual(df.shape, (4, 3))
+        self.assertTrue(np.isnan(df[ApplianceName('toaster', 1)].iloc[-1]))
+
+        masked = store.mask_periods([self.index[1]], [self.index[2]])
+        fridge = masked[ApplianceName('fridge', 1)][POWER]
+        self.assertTrue(np.isnan(fridge.iloc[1:3]).all())
+        self.assertEqual(fridge.iloc[0], 1)
+        # The original store is untouched
+        self.assertFalse(
+            store[ApplianceName('fridge', 1)].isnull().any().any())
+
+    def test_electricity(self):
+        electric = Electricity()
+        electric.mains = {MainsName(1, 1): make_df([1, 2, 3, 4], self.index),
+                          MainsName(2, 1): make_df([1, 1, 1, 1], self.index)}
+        electric.appliances = dict(self.channels)
+        expected_mains = electric.get_dataframe_of_mains()
+        electric.consolidate()
+        self.assertIsInstance(electric.mains, ChannelStore)
+        mains = electric.get_dataframe_of_mains()
+        self.assertTrue((mains == expected_mains).all().all())
+        appliances = electric.get_dataframe_of_appliances()
+        self.assertEqual(set(appliances.columns), set(self.channels.keys()))
+
+    def test_pickle(self):
+        channels = ChannelDict(self.channels)
+        channels[ApplianceName('kettle', 2)] = self.channels[
+            ApplianceName('kettle', 1)]
+        unpickled = pickle.loads(pickle.dumps(channels,
+                                              pickle.HIGHEST_PROTOCOL))
+        self.assertIsInstance(unpickled, ChannelDict)
+        self.assertEqual(unpickled.version, channels.version)
+        self.assertEqual(set(unpickled), set(channels))
+
+        electric = Electricity()
+        electric.appliances = dict(self.channels)
+        unpickled = pickle.loads(pickle.dumps(electric,
+                                              pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(set(unpickled.appliances), set(self.channels))
+
+    def test_cached_views(self):
+        electric = Electricity()
+        electric.mains = {MainsName(1, 1): make_df([1, 2, 3, 4], self.index)}
+        mains = electric.get_dataframe_of_mains()
+        self.assertIs(electric.get_dataframe_of_mains(), mains)
+
+        # Modifying mains invalidates the cached view
+        electric.mains[MainsName(2, 1)] = make_df([2, 2, 2, 2], self.index)
+        mains = electric.get_dataframe_of_mains()
+        self.assertEqual(list(mains[POWER]), [3, 4, 5, 6])
+        electric.consolidate()
+        self.assertIsNot(electric.get_dataframe_of_mains(), mains)
+
+if __name__ == '__main__':
+    unittest.main()
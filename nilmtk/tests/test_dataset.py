@@ -0,0 +1,158 @@
+#!/usr/bin/python
+
+"""
+   Copyright 2013 nilmtk authors.
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import print_function, division
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.util.testing import assert_frame_equal
+from nilmtk.building import Building
+from nilmtk.dataset import DataSet
+from nilmtk.sensors.electricity import ApplianceName, MainsName, Measurement
+
+POWER = Measurement('power', 'active')
+FRIDGE = ApplianceName('fridge', 1)
+KETTLE = ApplianceName('kettle', 1)
+
+
+def make_building(building_number):
+    index = pd.date_range('2013/1/1', freq='6S', periods=100, tz='UTC')
+    building = Building()
+    electric = building.utility.electric
+    electric.mains = {MainsName(1, 1): pd.DataFrame(
+        np.arange(100, dtype=np.float32) * building_number,
+        index=index, columns=[POWER])}
+    # float64, so sent back to the parent process in the pickle
+    electric.appliances = {KETTLE: pd.DataFrame(
+        np.ones(100) * building_number, index=index, columns=[POWER])}
+    return building
+
+
+class FakeDataSet(DataSet):
+    # Module level, so that load(n_jobs > 1) can pickle it
+    def load_building_names(self, root_directory):
+        return ['house_1', 'house_2']
+
+    def load_building(self, root_directory, building_name):
+        building_number = int(building_name[-1])
+        self.buildings[building_number] = make_building(building_number)
+
+
+class TestCompactExport(unittest.TestCase):
+    def setUp(self):
+        index = pd.date_range('2013/1/1', freq='6S', periods=200, tz='UTC')
+        fridge = np.zeros(200, dtype=np.float32)
+        fridge[10:50] = 100
+        fridge[120:125] = 90
+        # Irregularly sampled, so can't be compacted
+        kettle_index = index[np.r_[0:50, 60:200]]
+        building = Building()
+        electric = building.utility.electric
+        electric.mains = {MainsName(1, 1): pd.DataFrame(
+            np.arange(200, dtype=np.float32), index=index, columns=[POWER])}
+        electric.appliances = {
+            FRIDGE: pd.DataFrame(fridge, index=index, columns=[POWER]),
+            KETTLE: pd.DataFrame(np.ones(190, dtype=np.float32),
+                                 index=kettle_index, columns=[POWER])}
+        self.dataset = DataSet()
+        self.dataset.buildings[1] = building
+        self.directory = tempfile.mkdtemp()
+        self.dataset.export(self.directory, compact=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_catalog(self):
+        catalog = self.dataset.catalog.set_index('name')
+        self.assertTrue(catalog['compact']['fridge'])
+        self.assertFalse(catalog['compact']['kettle'])
+
+    def test_round_trip(self):
+        electric = self.dataset.buildings[1].utility.electric
+        loaded = DataSet()
+        loaded.load_hdf5(self.directory)
+        loaded_electric = loaded.buildings[1].utility.electric
+        for name, df in electric.appliances.iteritems():
+            assert_frame_equal(loaded_electric.appliances[name], df)
+        for name, df in electric.mains.iteritems():
+            assert_frame_equal(loaded_electric.mains[name], df)
+
+    def test_time_range(self):
+        fridge = self.dataset.buildings[1].utility.electric.appliances[FRIDGE]
+        start, end = fridge.index[20], fridge.index[40]
+        expected = fridge[(fridge.index > start) & (fridge.index < end)]
+
+        loaded = DataSet()
+        loaded.load_hdf5(self.directory, time_map={1: (start, end)})
+        assert_frame_equal(
+            loaded.buildings[1].utility.electric.appliances[FRIDGE], expected)
+
+        loaded.load_hdf5(self.directory, lazy=True)
+        channel = loaded.buildings[1].utility.electric.appliances[FRIDGE]
+        chunks = list(channel.iter_chunks(chunksize=2, start=start, end=end))
+        assert_frame_equal(pd.concat(chunks), expected)
+
+
+class TestParallelLoad(unittest.TestCase):
+    def test_load(self):
+        dataset = FakeDataSet()
+        dataset.load('', n_jobs=2)
+        self.assertEqual(set(dataset.buildings), set([1, 2]))
+        for building_number, building in dataset.buildings.iteritems():
+            expected = make_building(building_number).utility.electric
+            electric = building.utility.electric
+            for dict_name in ['mains', 'appliances']:
+                expected_dict = getattr(expected, dict_name)
+                loaded_dict = getattr(electric, dict_name)
+                self.assertEqual(set(loaded_dict), set(expected_dict))
+                for name, df in expected_dict.iteritems():
+                    assert_frame_equal(loaded_dict[name], df)
+
+class TestIterChunks(unittest.TestCase):
+    def setUp(self):
+        self.dataset = DataSet()
+        self.dataset.buildings[1] = make_building(1)
+        self.directory = tempfile.mkdtemp()
+        self.dataset.export(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_in_memory_matches_hdf5(self):
+        electric = self.dataset.buildings[1].utility.electric
+        loaded = DataSet()
+        loaded.load_hdf5(self.directory, lazy=True)
+        lazy_electric = loaded.buildings[1].utility.electric
+        index = electric.mains[MainsName(1, 1)].index
+        for start, end in [(index[10], index[50]), (None, index[50]),
+                           (index[10], None)]:
+            for channel in [MainsName(1, 1), KETTLE]:
+                expected = pd.concat(list(lazy_electric.iter_chunks(
+                    channel, chunksize=7, start=start, end=end)))
+                result = pd.concat(list(electric.iter_chunks(
+                    channel, chunksize=7, start=start, end=end)))
+                assert_frame_equal(result, expected)
+            if start is not None:
+                self.assertEqual(result.index[0], start + start.freq)
+            if end is not None:
+                self.assertEqual(result.index[-1], end - end.freq)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+
+"""
+   Copyright 2013 nilmtk authors.
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import print_function, division
+import os
+import shutil
+import tempfile
+import unittest
+from nilmtk.dataset import DataSet
+from nilmtk.dataset.catalog import write_catalog, CATALOG_FILENAME
+from nilmtk.dataset.hes import HES, FILENAMES
+from nilmtk.sensors.electricity import (MainsName, CircuitName,
+                                        ApplianceName)
+
+HOUSE_ID = 202116
+
+
+class TestHES(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.output_directory = tempfile.mkdtemp()
+        with open(os.path.join(self.data_dir,
+                               'ipsos-anonymised-corrected 310713.csv'),
+                  'w') as fp:
+            fp.write('Household_id\n%d\n' % HOUSE_ID)
+        with open(os.path.join(self.data_dir, FILENAMES[0]), 'w') as fp:
+            for minute in range(0, 20, 2):
+                for appliance_code in [240, 208, 1]:
+                    fp.write('1,%d,%d,2010-05-01,%d,00:%02d:00\n' %
+                             (HOUSE_ID, appliance_code, minute, minute))
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+        shutil.rmtree(self.output_directory)
+
+    def test_load_to_hdf5(self):
+        # Left over from an earlier export to the same directory
+        write_catalog(self.output_directory, [])
+
+        HES().load(self.data_dir, output_directory=self.output_directory)
+        self.assertFalse(os.path.isfile(
+            os.path.join(self.output_directory, CATALOG_FILENAME)))
+
+        dataset = DataSet()
+        dataset.load_hdf5(self.output_directory)
+        electric = dataset.buildings[HOUSE_ID].utility.electric
+        self.assertEqual(electric.mains.keys(), [MainsName(1, 1)])
+        self.assertEqual(electric.circuits.keys(),
+                         [CircuitName('sockets', 1, 1)])
+        self.assertEqual(electric.appliances.keys(), [ApplianceName('1', 1)])
+        for dict_ in [electric.mains, electric.circuits, electric.appliances]:
+            self.assertEqual(len(dict_.values()[0]), 10)
+
+if __name__ == '__main__':
+    unittest.main()
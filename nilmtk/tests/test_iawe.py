@@ -0,0 +1,81 @@
+#!/usr/bin/python
+
+"""
+   Copyright 2013 nilmtk authors.
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import print_function, division
+import unittest
+import sqlite3
+import numpy as np
+import pandas as pd
+from nilmtk.dataset.iawe import load_jplugs
+from nilmtk.sensors.electricity import ApplianceName, Measurement
+
+TZ = 'Asia/Kolkata'
+MAPPING = {'A': ApplianceName('fridge', 1),
+           'B': ApplianceName('entertainment unit', 1),
+           'C': ApplianceName('entertainment unit', 1)}
+
+
+def epoch(timestamp):
+    return pd.Timestamp(timestamp, tz=TZ).value // 10 ** 9
+
+
+class TestIAWE(unittest.TestCase):
+    def setUp(self):
+        t = epoch('2013-07-01')
+        rows = [('A', t, 100.0, 230.0),
+                ('A', t + 1, None, 230.0),       # NaN: dropped
+                ('A', t + 2, 120.0, 229.0),
+                ('A', epoch('2013-06-01'), 1.0, 1.0),  # before start
+                ('B', t + 10, 50.0, 230.0),
+                ('C', t + 5, 60.0, 230.0),
+                ('D', t + 3, 70.0, 230.0)]       # not in mapping
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute(
+            'create table jplug_data (mac text, timestamp real,'
+            ' active_power real, voltage real)')
+        # Insert in reverse so the loader has to sort
+        self.connection.executemany(
+            'insert into jplug_data values (?, ?, ?, ?)', rows[::-1])
+        # Duplicate timestamp: the row inserted last is kept
+        self.connection.execute(
+            'insert into jplug_data values (?, ?, ?, ?)',
+            ('A', t, 150.0, 231.0))
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_load_jplugs(self):
+        # chunksize=2 so that rows span several fetches
+        appliances = load_jplugs(self.connection, TZ, mapping=MAPPING,
+                                 chunksize=2)
+        self.assertEqual(set(appliances.keys()), set(MAPPING.values()))
+
+        fridge = appliances[ApplianceName('fridge', 1)]
+        power = Measurement('power', 'active')
+        self.assertEqual(list(fridge[power]), [150, 120])
+        self.assertEqual(fridge.index[0], pd.Timestamp('2013-07-01', tz=TZ))
+        self.assertEqual(str(fridge.index.tz), TZ)
+        self.assertTrue(all(dtype == np.float32 for dtype in fridge.dtypes))
+
+        # Two jPlugs measured the same appliance
+        entertainment = appliances[ApplianceName('entertainment unit', 1)]
+        self.assertEqual(list(entertainment[power]), [60, 50])
+        self.assertTrue(entertainment.index.is_monotonic)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/python
+
+"""
+   Copyright 2013 nilmtk authors.
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import print_function, division
+import os
+import shutil
+import tempfile
+import unittest
+import cPickle as pickle
+import numpy as np
+import pandas as pd
+from pandas.util.testing import assert_frame_equal
+from nilmtk.building import Building
+from nilmtk.sensors.electricity import ApplianceName, MainsName, Measurement
+from nilmtk.preprocessing.pipeline import (Pipeline, Downsample,
+                                           DropMissingMains, MakeCommonIndex,
+                                           BUILDING_FILENAME)
+import nilmtk.preprocessing.electricity.building as prepb
+
+POWER = Measurement('power', 'active')
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        index = pd.date_range('2013/1/1', freq='6S', periods=100, tz='UTC')
+        values = np.arange(100, dtype=np.float32)
+        mains = values.copy()
+        mains[20:40] = np.NaN
+        self.building = Building()
+        electric = self.building.utility.electric
+        electric.mains = {MainsName(1, 1): pd.DataFrame(
+            mains, index=index, columns=[POWER])}
+        electric.appliances = {ApplianceName('fridge', 1): pd.DataFrame(
+            values, index=index, columns=[POWER])}
+        self.cache_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_directory)
+
+    def test_matches_building_functions(self):
+        pipeline = Pipeline([Downsample(rule='1T'), DropMissingMains(),
+                             MakeCommonIndex()])
+        self.assertEqual(len(pipeline.stages()), 2)
+        result = pipeline.run(self.building)
+
+        expected = prepb.downsample(self.building, rule='1T')
+        expected = prepb.drop_missing_mains(expected)
+        expected = prepb.make_common_index(expected)
+        for dict_name in ['mains', 'appliances']:
+            result_dict = getattr(result.utility.electric, dict_name)
+            expected_dict = getattr(expected.utility.electric, dict_name)
+            for name, df in expected_dict.iteritems():
+                np.testing.assert_allclose(result_dict[name].values,
+                                           df.values)
+
+    def test_cache(self):
+        electric = self.building.utility.electric
+        kettle = ApplianceName('kettle', 1)
+        electric.appliances[kettle] = pd.DataFrame(
+            np.ones(100), index=electric.mains[MainsName(1, 1)].index,
+            columns=[POWER])
+        self.building.metadata['original_name'] = 'house_1'
+        electric.metadata['nominal_voltage'] = 230
+        electric.inferred_metadata['n_fridges'] = 1
+
+        pipeline = Pipeline([Downsample(rule='1T')],
+                            cache_directory=self.cache_directory)
+        result = pipeline.run(self.building)
+        key = pipeline.cache_key(self.building)
+        self.assertTrue(os.path.isdir(os.path.join(self.cache_directory, key)))
+
+        # Only the float64 kettle goes through the pickle
+        pickle_filename = os.path.join(self.cache_directory, key,
+                                       BUILDING_FILENAME)
+        with open(pickle_filename, 'rb') as fh:
+            rest = pickle.load(fh)
+        self.assertEqual(set(rest.utility.electric.appliances), set([kettle]))
+        self.assertEqual(rest.utility.electric.mains, {})
+
+        cached = pipeline.run(self.building)
+        for building in [result, cached]:
+            self.assertEqual(building.metadata, self.building.metadata)
+            for attribute in ['metadata', 'inferred_metadata']:
+                self.assertEqual(getattr(building.utility.electric, attribute),
+                                 getattr(electric, attribute))
+        for dict_name in ['mains', 'appliances']:
+            result_dict = getattr(result.utility.electric, dict_name)
+            cached_dict = getattr(cached.utility.electric, dict_name)
+            self.assertEqual(set(result_dict), set(cached_dict))
+            for name, df in result_dict.iteritems():
+                assert_frame_equal(cached_dict[name], df)
+        self.assertEqual(
+            cached.utility.electric.appliances[kettle][POWER].dtype,
+            np.float64)
+
+        # Different parameters give a different key
+        other = Pipeline([Downsample(rule='2T')])
+        self.assertNotEqual(other.cache_key(self.building), key)
+
+if __name__ == '__main__':
+    unittest.main()
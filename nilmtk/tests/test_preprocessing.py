@@ -0,0 +1,90 @@
+#!/usr/bin/python
+
+"""
+   Copyright 2013 nilmtk authors.
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import print_function, division
+import unittest
+import numpy as np
+import pandas as pd
+from nilmtk.sensors.electricity import Measurement
+from nilmtk.preprocessing.electricity.single import insert_zeros
+
+POWER = Measurement('power', 'active')
+
+
+class TestInsertZeros(unittest.TestCase):
+    def test_insert_zeros(self):
+        # 6 second samples with two gaps: one after an on-segment
+        # (zeros at both ends) and one after a zero reading (no zero
+        # inserted before the gap)
+        seconds = np.concatenate([np.arange(0, 240, 6),
+                                  np.arange(1000, 1240, 6),
+                                  np.arange(2000, 2240, 6)])
+        index = pd.DatetimeIndex(
+            (seconds * 1E9).astype(np.int64)).tz_localize('UTC')
+        power = np.ones(len(seconds), dtype=np.float32) * 100
+        power[79] = 0
+        df = pd.DataFrame(power, index=index, columns=[POWER])
+
+        with_zeros = insert_zeros(df)
+        self.assertEqual(len(with_zeros), len(df) + 3)
+        self.assertTrue(with_zeros.index.is_monotonic)
+        zeros = with_zeros[with_zeros[POWER] == 0]
+        expected_seconds = [240, 994, 1994]
+        expected_index = pd.DatetimeIndex(
+            (np.array(expected_seconds) * 1E9).astype(np.int64)
+        ).tz_localize('UTC')
+        self.assertTrue((zeros.index[[0, 1, 3]] == expected_index).all())
+        self.assertEqual(with_zeros[POWER].dtype, np.float32)
+        # The input is not modified
+        self.assertEqual(len(df), len(seconds))
+
+    def test_mixed_columns(self):
+        seconds = np.concatenate([np.arange(0, 300, 6),
+                                  np.arange(1000, 1300, 6)])
+        index = pd.DatetimeIndex(
+            (seconds * 1E9).astype(np.int64)).tz_localize('UTC')
+        voltage = Measurement('voltage', '')
+        df = pd.concat(
+            [pd.DataFrame(np.linspace(230, 240, len(seconds)), index=index,
+                          columns=[voltage]),
+             pd.DataFrame(np.ones(len(seconds), dtype=np.float32),
+                          index=index, columns=[POWER])], axis=1)
+        with_zeros = insert_zeros(df)
+        self.assertEqual(list(with_zeros.columns), [voltage, POWER])
+        self.assertEqual(with_zeros[POWER].dtype, np.float32)
+        self.assertEqual(with_zeros[voltage].dtype, np.float64)
+        inserted = ~with_zeros.index.isin(df.index)
+        self.assertEqual(inserted.sum(), 2)
+        self.assertTrue((with_zeros[POWER][inserted] == 0).all())
+        self.assertTrue((with_zeros[voltage][inserted] ==
+                         df[voltage].median()).all())
+        self.assertTrue((with_zeros[~inserted] == df).all().all())
+
+    def test_regular_index(self):
+        index = pd.date_range('2013/1/1', freq='6S', periods=100, tz='UTC')
+        power = np.ones(100, dtype=np.float32) * 100
+        power[10:50] = np.NaN
+        df = pd.DataFrame(power, index=index, columns=[POWER])
+        with_zeros = insert_zeros(df)
+        self.assertTrue((with_zeros.index == index).all())
+        self.assertEqual(with_zeros[POWER].iloc[10], 0)
+        self.assertEqual(with_zeros[POWER].iloc[49], 0)
+        self.assertEqual(with_zeros[POWER].isnull().sum(), 38)
+
+if __name__ == '__main__':
+    unittest.main()
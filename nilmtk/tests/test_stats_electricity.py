@@ -19,6 +19,9 @@
 from __future__ import print_function, division
 import unittest
 import nilmtk.stats.electricity.single as single
+from nilmtk.sensors.electricity import Electricity, ApplianceName, Measurement
+from nilmtk.preprocessing.electricity.single import change_points
+from nilmtk.preprocessing.electricity.single import expand_change_points
 import numpy as np
 import pandas as pd
 
@@ -39,5 +42,29 @@ class TestSingle(unittest.TestCase):
         for tz in tzs:
             test_dti(tz)
 
+    def test_energy_from_chunks(self):
+        index = pd.date_range('2010/1/1', freq='6S', periods=100, tz='UTC')
+        df = pd.DataFrame(np.arange(100, dtype=np.float32), index=index,
+                          columns=[Measurement('power', 'active')])
+        electric = Electricity()
+        electric.appliances[ApplianceName('fridge', 1)] = df
+        chunks = electric.iter_chunks(ApplianceName('fridge', 1), chunksize=7)
+        self.assertAlmostEqual(single.energy_from_chunks(chunks),
+                               single.energy(df))
+
+    def test_stats_of_change_points(self):
+        index = pd.date_range('2010/1/1', freq='6S', periods=100, tz='UTC')
+        values = np.zeros(100, dtype=np.float32)
+        values[10:30] = 100
+        values[60:65] = 2000
+        df = pd.DataFrame(values, index=index,
+                          columns=[Measurement('power', 'active')])
+        compact = change_points(df)
+        self.assertEqual(len(compact), 6)
+        self.assertAlmostEqual(single.energy(compact), single.energy(df))
+        self.assertAlmostEqual(single.hours_on(compact.icol(0)),
+                               single.hours_on(df.icol(0)))
+        self.assertTrue((expand_change_points(compact, 6) == df).all().all())
+
 if __name__ == '__main__':
     unittest.main()
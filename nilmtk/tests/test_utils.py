@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+"""
+   Copyright 2013 nilmtk authors.
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+"""
+
+from __future__ import print_function, division
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from nilmtk.building import Building
+from nilmtk.sensors.electricity import ApplianceName, MainsName, Measurement
+from nilmtk.utils import copy_dicts, apply_func_to_values_of_dicts
+from nilmtk.utils import intersect_sorted, union_sorted
+from nilmtk.utils import offset_after_lines, line_aligned_byte_ranges
+
+DICT_NAMES = ['utility.electric.appliances', 'utility.electric.mains']
+
+
+class TestUtils(unittest.TestCase):
+    def setUp(self):
+        index = pd.date_range('2013/1/1', freq='6S', periods=4, tz='UTC')
+        df = lambda: pd.DataFrame(np.ones(4, dtype=np.float32), index=index,
+                                  columns=[Measurement('power', 'active')])
+        self.building = Building()
+        electric = self.building.utility.electric
+        electric.mains = {MainsName(1, 1): df()}
+        electric.appliances = {ApplianceName('fridge', 1): df(),
+                               ApplianceName('kettle', 1): df()}
+
+    def test_copy_dicts(self):
+        building_copy = copy_dicts(self.building, DICT_NAMES)
+        electric = self.building.utility.electric
+        electric_copy = building_copy.utility.electric
+        self.assertIsNot(electric_copy, electric)
+        self.assertIs(building_copy.metadata, self.building.metadata)
+        fridge = ApplianceName('fridge', 1)
+        self.assertIs(electric_copy.appliances[fridge],
+                      electric.appliances[fridge])
+
+        del electric_copy.appliances[fridge]
+        self.assertIn(fridge, electric.appliances)
+
+    def test_apply_func_to_values_of_dicts(self):
+        double = lambda df: df * 2
+        building_copy = apply_func_to_values_of_dicts(self.building, double,
+                                                      DICT_NAMES)
+        for dict_name in ['appliances', 'mains']:
+            original = getattr(self.building.utility.electric, dict_name)
+            doubled = getattr(building_copy.utility.electric, dict_name)
+            for name, df in original.iteritems():
+                self.assertTrue((df == 1).all().all())
+                self.assertTrue((doubled[name] == 2).all().all())
+
+    def test_intersect_and_union_sorted(self):
+        arrays = [np.array([1, 3, 5, 7, 9], dtype=np.int64),
+                  np.array([3, 4, 5, 9, 11], dtype=np.int64),
+                  np.array([0, 3, 9, 12], dtype=np.int64)]
+        self.assertEqual(list(intersect_sorted(arrays)), [3, 9])
+        self.assertEqual(list(union_sorted(arrays)),
+                         [0, 1, 3, 4, 5, 7, 9, 11, 12])
+        self.assertEqual(len(intersect_sorted(
+            [arrays[0], np.array([2, 4], dtype=np.int64)])), 0)
+
+    def test_offset_after_lines(self):
+        fd, filename = tempfile.mkstemp()
+        try:
+            os.write(fd, b'a,1\nbb,2\nccc,3\n')
+            os.close(fd)
+            self.assertEqual(offset_after_lines(filename, 0), 0)
+            self.assertEqual(offset_after_lines(filename, 2), 9)
+            self.assertEqual(offset_after_lines(filename, 2, block_size=2), 9)
+            self.assertEqual(offset_after_lines(filename, 10), 15)
+            self.assertEqual(line_aligned_byte_ranges(filename, 2, 9),
+                             [(0, 4), (4, 9)])
+        finally:
+            os.remove(filename)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,14 @@
 from __future__ import print_function, division
 import os, copy, sys
+import io
+import multiprocessing
 import numpy as np
 import pandas as pd
 from scipy import stats
 
+# Default number of rows per chunk when processing channels out-of-core
+DEFAULT_CHUNKSIZE = 1000000
+
 def get_immediate_subdirectories(dir):
     # From Richie Hindle's StackOverflow answer:
     # http://stackoverflow.com/a/800201/732596
@@ -15,6 +20,26 @@ def get_immediate_subdirectories(dir):
     return subdirs
 
 
+def effective_n_jobs(n_jobs):
+    """Converts an `n_jobs` parameter into a number of worker processes.
+
+    Parameters
+    ----------
+    n_jobs : int or None
+        None means 1.  Negative values count back from the number of
+        CPUs, so -1 means use all CPUs, -2 means all CPUs but one etc.
+
+    Returns
+    -------
+    int >= 1
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        n_jobs = multiprocessing.cpu_count() + 1 + n_jobs
+    return max(n_jobs, 1)
+
+
 def find_nearest_index(array, value):
     idx = (np.abs(array - value)).argmin()
     return idx
@@ -61,6 +86,53 @@ def find_nearest_searchsorted(known_array, test_array):
     return [indices, residual]
 
 
+def intersect_sorted(arrays):
+    """k-way intersection of sorted arrays of unique values (e.g. the
+    int64 timestamps of several DatetimeIndexes).
+
+    Starts from the shortest array and, for each other array, keeps the
+    values found by a binary search, so each step costs
+    O(len(result) x log(len(array))) and no Python objects are created.
+
+    Parameters
+    ----------
+    arrays : list of sorted np.ndarrays
+
+    Returns
+    -------
+    np.ndarray
+    """
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for array in arrays[1:]:
+        if len(result) == 0 or len(array) == 0:
+            return result[:0]
+        positions = np.searchsorted(array, result)
+        result = result[array.take(positions, mode='clip') == result]
+    return result
+
+
+def union_sorted(arrays):
+    """k-way union of sorted arrays (e.g. the int64 timestamps of several
+    DatetimeIndexes).
+
+    Parameters
+    ----------
+    arrays : list of sorted np.ndarrays
+
+    Returns
+    -------
+    sorted np.ndarray of unique values
+    """
+    # Merge sort is fast on input made of sorted runs
+    merged = np.sort(np.concatenate(arrays), kind='mergesort')
+    if len(merged) == 0:
+        return merged
+    unique = np.ones(len(merged), dtype=bool)
+    unique[1:] = merged[1:] != merged[:-1]
+    return merged[unique]
+
+
 def secs_per_period_alias(alias):
     """Seconds for each Pandas period alias."""
     dr = pd.date_range('00:00', periods=2, freq=alias)
@@ -109,10 +181,49 @@ def recursive_resolve(obj, dict_name):
         return
     elif not partitions[2]:
         # e.g. partitions = ('electric', '', '')
-        return obj.__dict__[dict_name]
+        return getattr(obj, dict_name)
     else:
-        return recursive_resolve(obj.__dict__[partitions[0]], partitions[2])
+        return recursive_resolve(getattr(obj, partitions[0]), partitions[2])
+
+
+
+def copy_dicts(obj, dict_names):
+    """Returns a copy of `obj` which only duplicates the containers along
+    each of the `dict_names` paths (e.g. the Building, its Utility, its
+    Electricity and the `appliances` dict itself).  Everything else,
+    including every DataFrame, is shared with `obj`.
 
+    Replacing or removing values in the copy's dicts does not affect
+    `obj`, but modifying a shared DataFrame in place does.
+
+    Parameters
+    ----------
+    obj : object
+    dict_names : list of strings
+        e.g. ['utility.electric.appliances', 'utility.electric.mains']
+
+    Returns
+    -------
+    obj_copy
+    """
+    obj_copy = copy.copy(obj)
+    copied = set([id(obj_copy)])
+    for dict_name in dict_names:
+        path = dict_name.split('.')
+        parent = obj_copy
+        for attribute in path:
+            child = getattr(parent, attribute)
+            if id(child) not in copied:
+                if attribute == path[-1]:
+                    # The dict itself; its values are shared
+                    child = child.copy()
+                else:
+                    child = copy.copy(child)
+                setattr(parent, attribute, child)
+                child = getattr(parent, attribute)
+                copied.add(id(child))
+            parent = child
+    return obj_copy
 
 
 def apply_func_to_values_of_dicts(obj, func, dict_names):
@@ -124,13 +235,15 @@ def apply_func_to_values_of_dicts(obj, func, dict_names):
     obj : object
         any object which has one or more dicts as attributes
     func : function
-        the function to apply to each dict value
+        the function to apply to each dict value.  Must not modify
+        its argument in place.
     dict_names : list of strings
         the attribute names of the dicts in `obj`
 
     Returns
     -------
-    obj_copy : a deepcopy of `obj` with `func` applied to all `obj.<dict_names>`
+    obj_copy : a copy of `obj` (see `copy_dicts`) with `func` applied to
+        all `obj.<dict_names>`.  DataFrames are not copied.
 
     Examples
     --------
@@ -146,19 +259,54 @@ def apply_func_to_values_of_dicts(obj, func, dict_names):
     # TODO: a lot of functions in nilmtk.preprocessing.electricity.buildling
     # could be simplified using `apply_to_values_of_dicts`
 
-    obj_copy = copy.deepcopy(obj)
+    obj_copy = copy_dicts(obj, dict_names)
     for attribute in dict_names:
         dict_ = recursive_resolve(obj_copy, attribute)
+        new_values = {}
         for key, value in dict_.iteritems():
             try:
-                dict_[key] = func(value)
+                new_values[key] = func(value)
             except:
                 print("Exception occurred while processing attribute={}, key={}"
                       .format(attribute, key), file=sys.stderr)
                 raise
+        dict_.update(new_values)
     return obj_copy
 
 
+def chunks_with_boundaries(chunks):
+    """Attach boundary context to each chunk in `chunks`.
+
+    Each chunk yielded is given two extra attributes describing the
+    sample immediately preceding the chunk (i.e. the last row of the
+    previous chunk) so that calculations which span chunk edges (like
+    energy integration and gap detection) can stay correct:
+
+    * `previous_timestamp` : pd.Timestamp or None
+    * `previous_sample` : pd.Series or None
+
+    Both are None for the first chunk.  Empty chunks are skipped.
+
+    Parameters
+    ----------
+    chunks : iterable of pandas.DataFrames
+
+    Returns
+    -------
+    generator of pandas.DataFrames
+    """
+    previous_timestamp = None
+    previous_sample = None
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        chunk.previous_timestamp = previous_timestamp
+        chunk.previous_sample = previous_sample
+        yield chunk
+        previous_timestamp = chunk.index[-1]
+        previous_sample = chunk.iloc[-1]
+
+
 def timedelta64_to_secs(timedelta):
     """Convert `timedelta` to seconds.
 
@@ -202,3 +350,68 @@ def summary_stats_string(data, fmt='{:>6.2f}', sep='\n', stat_strings=None,
             s += sep
     
     return s
+
+
+def line_aligned_byte_ranges(filename, bytes_per_range, file_size=None):
+    """Splits a text file into consecutive byte ranges of roughly
+    `bytes_per_range` bytes, each of which starts at the start of a line
+    and ends at the end of a line.
+
+    Parameters
+    ----------
+    filename : string
+    bytes_per_range : int
+    file_size : int, optional
+        Only split the first `file_size` bytes, which must end at the
+        end of a line.  Defaults to the whole file.
+
+    Returns
+    -------
+    list of (start, end) byte offsets.  `end` is exclusive.
+    """
+    if file_size is None:
+        file_size = os.path.getsize(filename)
+    ranges = []
+    start = 0
+    with open(filename, 'rb') as fh:
+        while start < file_size:
+            end = start + bytes_per_range
+            if end >= file_size:
+                end = file_size
+            else:
+                # Move `end` to the start of the next line
+                fh.seek(end)
+                fh.readline()
+                end = fh.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def offset_after_lines(filename, n_lines, block_size=2**20):
+    """Returns the byte offset of the end of the first `n_lines` lines of
+    `filename`, or the size of the file if it has fewer lines."""
+    offset = 0
+    with open(filename, 'rb') as fh:
+        while n_lines > 0:
+            block = fh.read(block_size)
+            if not block:
+                break
+            n_newlines = block.count(b'\n')
+            if n_newlines < n_lines:
+                n_lines -= n_newlines
+                offset += len(block)
+                continue
+            position = -1
+            for _ in range(n_lines):
+                position = block.index(b'\n', position + 1)
+            return offset + position + 1
+    return offset
+
+
+def read_byte_range(filename, start, end):
+    """Returns a file-like object holding bytes [start, end) of `filename`,
+    ready to be passed to `pd.read_csv`."""
+    with open(filename, 'rb') as fh:
+        fh.seek(start)
+        return io.BytesIO(fh.read(end - start))